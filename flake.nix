@@ -25,6 +25,7 @@
         ps.pathspec
         ps.fastapi
         ps.smart-open
+        ps.httpx
 
         ps.langchain-core
         ps.pyutil
@@ -53,7 +54,6 @@
         ps.pytest
         ps.pytest-cov
         ps.pytest-asyncio
-        ps.httpx
 
       ]);
 
@@ -12,8 +12,26 @@ if __name__ == "__main__":
     args = [
         "tests/test_vanity_gateway.py",
         "tests/test_vg_io_rqs.py",
+        "tests/test_vg_io_arqs.py",
         "tests/test_vg_io_oai.py",
+        "tests/test_vg_io_cfg.py",
+        "tests/test_vg_io_reslv.py",
         "tests/test_vg_io_aws.py",
+        "tests/test_vg_io_keys.py",
+        "tests/test_vg_io_usage.py",
+        "tests/test_vg_io_codec.py",
+        "tests/test_vg_io_batch.py",
+        "tests/test_vg_io_catalog.py",
+        "tests/test_vg_io_drain.py",
+        "tests/test_vg_io_dnsc.py",
+        "tests/test_vg_io_converse.py",
+        "tests/test_vg_io_route.py",
+        "tests/test_vg_io_cascade.py",
+        "tests/test_vg_io_shadow.py",
+        "tests/test_vg_io_replay.py",
+        "tests/test_vg_io_schema.py",
+        "tests/test_vg_io_pcache.py",
+        "tests/test_vg_io_rcache.py",
         "-v",
         "--tb=short",
     ]
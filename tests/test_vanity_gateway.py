@@ -10,12 +10,24 @@ import os
 from unittest.mock import Mock, patch, mock_open
 from fastapi.testclient import TestClient
 import types
+import asyncio
+import concurrent.futures
+import time
 
 # Import the app
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# The gateway reads its static test key at import: give it a throwaway one
+import atexit, secrets, tempfile
+TEST_KEY = secrets.token_hex(32)
+TEST_KEY_FILE = tempfile.NamedTemporaryFile("w", suffix=".key", delete=False)
+TEST_KEY_FILE.write(TEST_KEY)
+TEST_KEY_FILE.close()
+atexit.register(os.unlink, TEST_KEY_FILE.name)
+os.environ["VG_TEST_KEY_PATH"] = TEST_KEY_FILE.name
+
 # Import with underscore since the filename has a hyphen
 import importlib.util
 spec = importlib.util.spec_from_file_location("vanity_gateway", os.path.join(os.path.dirname(os.path.dirname(__file__)), "vanity-gateway.py"))
@@ -28,7 +40,6 @@ load_cfg_from_path = vanity_gateway.load_cfg_from_path
 client = TestClient(app)
 
 # Test fixtures
-TEST_KEY = "d4adfc04387b63baf75b46544beb0476cfcbcedbb88f21e339d7d29d095d8db6"
 MOCK_PROVIDER_KEY = "provider-key-67890"
 
 MOCK_VG_CFG = {
@@ -110,6 +121,40 @@ class TestChatCompletionsAuth:
             )
             assert response.status_code == 200
 
+    
+    def test_caller_nickname_restriction(self):
+        caller_key = "team-a-key"
+        vanity_gateway.CALLERS.static["team-a"] = {"key": caller_key, "nicknames": ["groq-llama8"]}
+        vanity_gateway.CALLERS.load()
+        try:
+            response = client.post(
+                "/chat/completions?nickname=groq-gpt-20b",
+                json=MOCK_CHAT_PAYLOAD,
+                headers={"Authorization": f"Bearer {caller_key}"}
+            )
+            assert response.status_code == 403
+        finally:
+            del vanity_gateway.CALLERS.static["team-a"]
+            vanity_gateway.CALLERS.load()
+    
+    def test_rate_limited_caller_gets_retry_after(self):
+        import time
+        vanity_gateway.CALLERS.static["team-r"] = {"key": "team-r-key", "requests_per_minute": 1}
+        vanity_gateway.CALLERS.load()
+        vanity_gateway.CALLERS.windows["team-r"] = (int(time.time() // 60), 1)
+        try:
+            response = client.post(
+                "/chat/completions?nickname=groq-llama8",
+                json=MOCK_CHAT_PAYLOAD,
+                headers={"Authorization": "Bearer team-r-key"}
+            )
+            assert response.status_code == 429
+            assert 1 <= int(response.headers["Retry-After"]) <= 60
+        finally:
+            del vanity_gateway.CALLERS.static["team-r"]
+            vanity_gateway.CALLERS.windows.pop("team-r", None)
+            vanity_gateway.CALLERS.load()
+
 
 class TestChatCompletionsRouting:
     """Test provider routing logic"""
@@ -347,5 +392,620 @@ class TestLangchainOpenAIProvider:
                 assert response.status_code == 200
 
 
+class TestUsageEndpoint:
+    """Test usage accounting endpoint"""
+    
+    def test_requires_auth(self):
+        assert client.get("/usage").status_code == 401
+    
+    def test_returns_totals(self):
+        vanity_gateway.USAGE.record("test", "groq-llama8", usage={"prompt_tokens": 1, "completion_tokens": 2})
+        response = client.get("/usage?group_by=caller", headers={"Authorization": f"Bearer {TEST_KEY}"})
+        assert response.status_code == 200
+        assert response.json()["usage"]["test"]["total_tokens"] >= 3
+    
+    def test_invalid_group_by(self):
+        response = client.get("/usage?group_by=model", headers={"Authorization": f"Bearer {TEST_KEY}"})
+        assert response.status_code == 400
+
+
+class TestUpstreamBody:
+    """Test upstream request compression"""
+    
+    def test_plain_json_by_default(self):
+        provider = types.SimpleNamespace(api="requests")
+        headers = {}
+        assert vanity_gateway.upstream_body(provider, {"a": 1}, headers) == {"json": {"a": 1}}
+        assert "Content-Encoding" not in headers
+    
+    def test_compresses_large_body(self):
+        import gzip
+        provider = types.SimpleNamespace(api="requests", request_encoding="gzip")
+        payload = {"messages": [{"role": "user", "content": "x" * 5000}]}
+        headers = {}
+        body = vanity_gateway.upstream_body(provider, payload, headers)
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body["data"])) == payload
+
+
+class TestEmbeddings:
+    """Test the embeddings endpoint"""
+    
+    def test_embeddings_url_from_chat_url(self):
+        provider = types.SimpleNamespace(url="https://api.groq.com/openai/v1/chat/completions")
+        assert vanity_gateway.embeddings_url(provider) == "https://api.groq.com/openai/v1/embeddings"
+        provider = types.SimpleNamespace(url="https://api.openai.com/v1")
+        assert vanity_gateway.embeddings_url(provider) == "https://api.openai.com/v1/embeddings"
+    
+    def test_rejects_bedrock(self):
+        response = client.post(
+            "/embeddings?nickname=aws-nova-micro",
+            json={"input": "hello"},
+            headers={"Authorization": f"Bearer {TEST_KEY}"}
+        )
+        assert response.status_code == 400
+    
+    def test_forwards_and_splits(self):
+        upstream = {
+            "data": [{"index": 1, "embedding": [0.2]}, {"index": 0, "embedding": [0.1]}],
+            "usage": {"prompt_tokens": 4, "total_tokens": 4},
+        }
+        with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post, \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY):
+            mock_post.return_value.json.return_value = upstream
+            mock_post.return_value.status_code = 200
+            response = client.post(
+                "/embeddings?nickname=openai-embed-small",
+                json={"input": ["ab", "cd"]},
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 200
+        assert [row["embedding"] for row in response.json()["data"]] == [[0.1], [0.2]]
+        assert mock_post.call_args[0][0] == "https://api.openai.com/v1/embeddings"
+        assert mock_post.call_args[1]["json"]["input"] == ["ab", "cd"]
+        assert mock_post.call_args[1]["headers"]["Authorization"] == f"Bearer {MOCK_PROVIDER_KEY}"
+    
+    def test_token_array_is_one_input(self):
+        upstream = {"data": [{"index": 0, "embedding": [0.5]}], "usage": {"prompt_tokens": 3}}
+        with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post, \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY):
+            mock_post.return_value.json.return_value = upstream
+            mock_post.return_value.status_code = 200
+            response = client.post(
+                "/embeddings?nickname=openai-embed-small",
+                json={"input": [1, 2, 3]},
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 200
+        assert [row["embedding"] for row in response.json()["data"]] == [[0.5]]
+        assert mock_post.call_args[1]["json"]["input"] == [[1, 2, 3]]
+    
+    def test_invalid_inputs(self):
+        headers = {"Authorization": f"Bearer {TEST_KEY}", "Content-Type": "application/json"}
+        response = client.post("/embeddings?nickname=openai-embed-small", content=b"{not json", headers=headers)
+        assert response.status_code == 400
+        for bad in ([], ["a", 1], [1, "a"], [True], {"text": "a"}):
+            response = client.post("/embeddings?nickname=openai-embed-small", json={"input": bad}, headers=headers)
+            assert response.status_code == 400, bad
+    
+    def test_mismatched_upstream_is_bad_gateway(self):
+        upstream = {"data": [{"index": 0, "embedding": [0.1]}], "usage": {"prompt_tokens": 2}}
+        with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post, \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY):
+            mock_post.return_value.json.return_value = upstream
+            mock_post.return_value.status_code = 200
+            response = client.post(
+                "/embeddings?nickname=openai-embed-small",
+                json={"input": ["a", "b"]},
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 502
+
+
+class TestModels:
+    """Test the models listing endpoint"""
+    
+    def test_lists_configured_nicknames(self):
+        response = client.get("/models", headers={"Authorization": f"Bearer {TEST_KEY}"})
+        assert response.status_code == 200
+        ids = [m["id"] for m in response.json()["data"]]
+        assert "groq-llama8" in ids
+        assert "aws-nova-micro" in ids
+    
+    def test_etag_not_modified(self):
+        response = client.get("/models", headers={"Authorization": f"Bearer {TEST_KEY}"})
+        etag = response.headers["etag"]
+        response = client.get("/models", headers={"Authorization": f"Bearer {TEST_KEY}", "If-None-Match": etag})
+        assert response.status_code == 304
+
+
+class TestBedrockConverse:
+    """Test the native Bedrock adapter"""
+    
+    def test_chat_completion(self):
+        bedrock = Mock()
+        bedrock.converse.return_value = {
+            "output": {"message": {"role": "assistant", "content": [{"text": "Hi there"}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 3, "outputTokens": 2, "totalTokens": 5},
+        }
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            response = client.post(
+                "/chat/completions?nickname=aws-nova-micro",
+                json=MOCK_CHAT_PAYLOAD,
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 200
+        assert response.json()["choices"][0]["message"]["content"] == "Hi there"
+        assert bedrock.converse.call_args[1]["modelId"] == "amazon.nova-micro-v1:0"
+    
+    def test_streamed_chat_completion(self):
+        bedrock = Mock()
+        bedrock.converse_stream.return_value = {"stream": [
+            {"messageStart": {"role": "assistant"}},
+            {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": "Hi"}}},
+            {"messageStop": {"stopReason": "end_turn"}},
+            {"metadata": {"usage": {"inputTokens": 3, "outputTokens": 1, "totalTokens": 4}}},
+        ]}
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            response = client.post(
+                "/chat/completions?nickname=aws-nova-micro",
+                json=dict(MOCK_CHAT_PAYLOAD, stream=True),
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(e) for e in events[:-1]]
+        assert chunks[1]["choices"][0]["delta"]["content"] == "Hi"
+        # usage is only streamed when stream_options.include_usage is set
+        assert all(chunk["choices"] for chunk in chunks)
+    
+    def test_mid_stream_error_is_recorded_as_502(self):
+        bedrock = Mock()
+        bedrock.converse_stream.return_value = {"stream": [
+            {"messageStart": {"role": "assistant"}},
+            {"modelStreamErrorException": {"message": "model failed"}},
+        ]}
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock), \
+                patch.object(vanity_gateway.USAGE, "record") as record:
+            with pytest.raises(RuntimeError):
+                client.post(
+                    "/chat/completions?nickname=aws-nova-micro",
+                    json=dict(MOCK_CHAT_PAYLOAD, stream=True),
+                    headers={"Authorization": f"Bearer {TEST_KEY}"}
+                )
+        assert record.call_args[1]["status"] == 502
+    
+    def test_client_disconnect_closes_upstream_stream(self):
+        closed, finished = [], []
+        
+        def chunks():
+            try:
+                yield {"choices": [{"index": 0, "delta": {"content": "Hi"}}]}
+                yield {"choices": [{"index": 0, "delta": {"content": " there"}}]}
+            finally:
+                closed.append(True)
+        
+        events = vanity_gateway.sse_events(chunks(), lambda usage, status: finished.append(status))
+        next(events)
+        events.close()
+        assert closed == [True]
+        assert finished == [None]
+    
+    def test_throttled(self):
+        error = Exception("throttled")
+        error.response = {"Error": {"Code": "ThrottlingException", "Message": "Too many requests"},
+                          "ResponseMetadata": {"HTTPStatusCode": 429}}
+        bedrock = Mock()
+        bedrock.converse.side_effect = error
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            response = client.post(
+                "/chat/completions?nickname=aws-nova-micro",
+                json=MOCK_CHAT_PAYLOAD,
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 429
+        assert response.json()["error"]["type"] == "ThrottlingException"
+
+
+class TestVirtualNickname:
+    """Test routing of virtual nicknames"""
+    
+    def test_routes_to_cheapest_target(self):
+        with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post, \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY):
+            mock_post.return_value.json.return_value = MOCK_PROVIDER_RESPONSE
+            mock_post.return_value.status_code = 200
+            response = client.post(
+                "/chat/completions?nickname=auto-chat",
+                json=MOCK_CHAT_PAYLOAD,
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 200
+        assert mock_post.call_args[1]["json"]["model"] == "llama-3.1-8b-instant"
+        routes = client.get("/status").json()["routes"]
+        assert routes["groq-llama8"]["samples"] >= 1
+        assert routes["groq-llama8"]["inflight"] == 0
+    
+    def post_as(self, nicknames, nickname):
+        vanity_gateway.CALLERS.static["team-v"] = {"key": "team-v-key", "nicknames": nicknames}
+        vanity_gateway.CALLERS.load()
+        bedrock = Mock()
+        bedrock.converse.return_value = {
+            "output": {"message": {"role": "assistant", "content": [{"text": "From Bedrock"}]}},
+            "stopReason": "end_turn", "usage": {"inputTokens": 3, "outputTokens": 2, "totalTokens": 5},
+        }
+        try:
+            with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post, \
+                    patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+                response = client.post(
+                    f"/chat/completions?nickname={nickname}",
+                    json=MOCK_CHAT_PAYLOAD,
+                    headers={"Authorization": "Bearer team-v-key"}
+                )
+            return response, mock_post
+        finally:
+            del vanity_gateway.CALLERS.static["team-v"]
+            vanity_gateway.CALLERS.load()
+    
+    def test_routes_only_to_targets_the_caller_may_use(self):
+        response, mock_post = self.post_as(["auto-chat", "aws-nova-micro"], "auto-chat")
+        assert response.status_code == 200
+        assert response.headers["x-served-by"] == "aws-nova-micro"
+        assert not mock_post.called
+    
+    def test_router_without_usable_target_is_forbidden(self):
+        response, mock_post = self.post_as(["auto-chat"], "auto-chat")
+        assert response.status_code == 403
+        assert not mock_post.called
+    
+    def test_cascade_skips_steps_the_caller_may_not_use(self):
+        response, mock_post = self.post_as(["cascade-chat", "aws-claude-sonnet"], "cascade-chat")
+        assert response.status_code == 200
+        assert response.headers["x-served-by"] == "aws-claude-sonnet"
+        assert not mock_post.called
+        response, _ = self.post_as(["cascade-chat"], "cascade-chat")
+        assert response.status_code == 403
+
+
+class TestCascade:
+    """Test cheap-model-first cascades"""
+    
+    def post(self, first_answer, stream=False):
+        cheap = Mock()
+        cheap.json.return_value = {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": first_answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+        }
+        cheap.status_code = 200
+        bedrock = Mock()
+        bedrock.converse.return_value = {
+            "output": {"message": {"role": "assistant", "content": [{"text": "From Sonnet"}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 3, "outputTokens": 2, "totalTokens": 5},
+        }
+        with patch.object(vanity_gateway.UPSTREAM, "post", return_value=cheap), \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY), \
+                patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            response = client.post(
+                "/chat/completions?nickname=cascade-chat",
+                json=dict(MOCK_CHAT_PAYLOAD, stream=stream),
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        return response, bedrock
+    
+    def test_accepts_cheap_answer(self):
+        response, bedrock = self.post("From Llama")
+        assert response.status_code == 200
+        assert response.headers["x-served-by"] == "groq-llama8"
+        assert response.json()["choices"][0]["message"]["content"] == "From Llama"
+        assert not bedrock.converse.called
+    
+    def test_escalates_rejected_answer(self):
+        response, bedrock = self.post("")
+        assert response.status_code == 200
+        assert response.headers["x-served-by"] == "aws-claude-sonnet"
+        assert response.json()["choices"][0]["message"]["content"] == "From Sonnet"
+    
+    def test_streams_accepted_answer(self):
+        response, _ = self.post("From Llama", stream=True)
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "From Llama" in response.text
+        assert response.text.rstrip().endswith("data: [DONE]")
+    
+    def forward_logprob_cascade(self, body):
+        providers = types.SimpleNamespace(**{
+            "cheap": types.SimpleNamespace(api="requests", url="https://api.groq.com/openai/v1/chat/completions", model="a"),
+            "big": types.SimpleNamespace(api="bedrock", model="b"),
+        })
+        cascade = types.SimpleNamespace(api="cascade", steps=["cheap", "big"], accept={"min_logprob": -1.0})
+        request = Mock()
+        request.json = Mock(side_effect=lambda: asyncio.sleep(0, result=dict(body)))
+        sent = []
+        
+        async def fake_forward(provider, payload, caller=None):
+            sent.append(payload)
+            return {"choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop",
+                                 "logprobs": {"content": [{"token": "ok", "logprob": -0.2}]}}]}, 200
+        
+        async def fake_build(request, provider):
+            return dict(await request.json(), model=provider.model)
+        
+        with patch.object(vanity_gateway, "forward_chat", side_effect=fake_forward), \
+                patch.object(vanity_gateway, "build_payload", side_effect=fake_build):
+            content, status, step, _ = asyncio.run(vanity_gateway.forward_cascade(
+                "logprob-cascade", cascade, providers, request, types.SimpleNamespace(name="test", nicknames=None)))
+        assert step == "cheap"
+        assert sent[0]["logprobs"] is True
+        return content
+    
+    def test_injected_logprobs_are_stripped(self):
+        content = self.forward_logprob_cascade(MOCK_CHAT_PAYLOAD)
+        assert "logprobs" not in content["choices"][0]
+    
+    def test_requested_logprobs_are_kept(self):
+        content = self.forward_logprob_cascade(dict(MOCK_CHAT_PAYLOAD, logprobs=True))
+        assert content["choices"][0]["logprobs"]["content"][0]["token"] == "ok"
+
+
+class TestShadow:
+    """Test shadow traffic mirroring"""
+    
+    PROVIDERS = types.SimpleNamespace(**{
+        "groq-llama8": types.SimpleNamespace(
+            api="requests", url="https://api.groq.com/openai/v1/chat/completions", model="llama-3.1-8b-instant",
+            shadow=types.SimpleNamespace(target="aws-nova-micro", sample=1.0, max_concurrency=1),
+        ),
+        "aws-nova-micro": types.SimpleNamespace(api="bedrock", model="amazon.nova-micro-v1:0", region="us-east-1"),
+    })
+    
+    def test_mirrors_with_shadow_model(self):
+        async def fake_forward(provider, payload):
+            return dict(MOCK_PROVIDER_RESPONSE, model=payload["model"]), 200
+        
+        async def go():
+            payload = dict(MOCK_CHAT_PAYLOAD, model="llama-3.1-8b-instant")
+            primary = vanity_gateway.start_shadow("groq-llama8", self.PROVIDERS.__dict__["groq-llama8"], self.PROVIDERS, payload)
+            assert primary is not None
+            assert payload["model"] == "llama-3.1-8b-instant"
+            primary.set_result((MOCK_PROVIDER_RESPONSE, 200, 80.0))
+            await asyncio.gather(*vanity_gateway.SHADOW.tasks)
+        
+        with patch.object(vanity_gateway, "forward_chat", side_effect=fake_forward) as mock_forward:
+            asyncio.run(go())
+        assert mock_forward.call_args[0][1]["model"] == "amazon.nova-micro-v1:0"
+        assert vanity_gateway.SHADOW.records[-1]["shadow"] == "aws-nova-micro"
+        response = client.get("/shadow", headers={"Authorization": f"Bearer {TEST_KEY}"})
+        assert response.status_code == 200
+        assert response.json()["pairs"]["groq-llama8/aws-nova-micro"]["pairs"] >= 1
+    
+    def test_streamed_requests_are_not_mirrored(self):
+        payload = dict(MOCK_CHAT_PAYLOAD, stream=True)
+        assert vanity_gateway.start_shadow("groq-llama8", self.PROVIDERS.__dict__["groq-llama8"], self.PROVIDERS, payload) is None
+
+
+class TestStreamingAndCapture:
+    """Test SSE passthrough and traffic capture"""
+    
+    SSE_LINES = [
+        b'data: {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Hel"}}], "usage": null}',
+        b'',
+        b'data: {"choices": [{"index": 0, "delta": {"content": "lo"}, "finish_reason": "stop"}], "usage": null}',
+        b'',
+        b'data: [DONE]',
+    ]
+    
+    def stream(self):
+        upstream = Mock()
+        upstream.status_code = 200
+        upstream.iter_lines.return_value = iter(self.SSE_LINES)
+        with patch.object(vanity_gateway.UPSTREAM, "post", return_value=upstream) as mock_post, \
+                patch.object(vanity_gateway, "read_provider_key", return_value=MOCK_PROVIDER_KEY):
+            response = client.post(
+                "/chat/completions?nickname=groq-llama8",
+                json=dict(MOCK_CHAT_PAYLOAD, stream=True),
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert mock_post.call_args[1]["stream"] is True
+        upstream.close.assert_called()
+        return response
+    
+    def test_stream_passthrough(self):
+        response = self.stream()
+        assert response.status_code == 200
+        events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        assert "".join(json.loads(e)["choices"][0]["delta"]["content"] for e in events[:-1]) == "Hello"
+    
+    def test_capture_and_replay(self, tmp_path):
+        path = str(tmp_path / "capture.jsonl")
+        vanity_gateway.CAPTURE.configure(path=path)
+        try:
+            self.stream()
+            vanity_gateway.CAPTURE.flush()
+        finally:
+            vanity_gateway.CAPTURE.configure()
+        rows = vanity_gateway.vg_io.replay.read_log(path)
+        assert rows[-1]["nickname"] == "groq-llama8"
+        assert len(rows[-1]["chunks"]) == 2
+        provider = types.SimpleNamespace(api="replay", path=path, speed=0, model="llama-3.1-8b-instant")
+        chunks, status = asyncio.run(vanity_gateway.forward_chat(provider, dict(MOCK_CHAT_PAYLOAD, stream=True)))
+        assert status == 200
+        assert [c["choices"][0]["delta"]["content"] for c in chunks] == ["Hel", "lo"]
+    
+    def test_replay_provider_without_model(self):
+        async def body():
+            return dict(MOCK_CHAT_PAYLOAD, model="caller-model")
+        request = types.SimpleNamespace(json=body, query_params={})
+        provider = types.SimpleNamespace(api="replay", path="capture.jsonl", speed=0)
+        payload = asyncio.run(vanity_gateway.build_payload(request, provider))
+        assert payload["model"] == "caller-model"
+
+
+class TestRequestValidation:
+    """Test early rejection of malformed bodies"""
+    
+    def test_rejects_before_upstream(self):
+        with patch.object(vanity_gateway.UPSTREAM, "post") as mock_post:
+            response = client.post(
+                "/chat/completions?nickname=groq-llama8",
+                json={"messages": [{"role": "user", "content": 42}]},
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "messages[0] content must be a string or a list of parts"
+        assert not mock_post.called
+    
+    def test_rejects_invalid_json(self):
+        response = client.post(
+            "/chat/completions?nickname=groq-llama8",
+            content=b"{not json",
+            headers={"Authorization": f"Bearer {TEST_KEY}", "Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+    
+    def test_provider_capabilities(self):
+        bedrock = Mock()
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            response = client.post(
+                "/chat/completions?nickname=aws-nova-micro",
+                json={"messages": [{"role": "user", "content": [
+                    {"type": "image_url", "image_url": {"url": "https://example.com/cat.png"}},
+                ]}]},
+                headers={"Authorization": f"Bearer {TEST_KEY}"}
+            )
+        assert response.status_code == 400
+        assert not bedrock.converse.called
+
+
+class TestPromptCache:
+    """Test automatic Bedrock cache points"""
+    
+    def test_second_request_reads_cache(self):
+        bedrock = Mock()
+        bedrock.converse.return_value = {
+            "output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 5, "outputTokens": 1, "totalTokens": 2006,
+                      "cacheReadInputTokens": 2000, "cacheWriteInputTokens": 0},
+        }
+        body = {"messages": [
+            {"role": "system", "content": "You are a meticulous assistant. " * 200},
+            {"role": "user", "content": "Hello"},
+        ]}
+        with patch.object(vanity_gateway, "bedrock_client", return_value=bedrock):
+            for _ in range(2):
+                response = client.post(
+                    "/chat/completions?nickname=aws-claude-sonnet",
+                    json=body,
+                    headers={"Authorization": f"Bearer {TEST_KEY}"}
+                )
+        assert response.status_code == 200
+        system = bedrock.converse.call_args[1]["system"]
+        assert system[-1] == {"cachePoint": {"type": "default"}}
+        assert response.json()["usage"]["cache_read_input_tokens"] == 2000
+
+
+class TestWarmUp:
+    """Test provider warm-up and readiness"""
+    
+    PROVIDERS = types.SimpleNamespace(**{
+        "groq-gpt-20b": types.SimpleNamespace(api="requests", url="https://api.groq.com/openai/v1/chat/completions", model="a"),
+        "groq-llama8": types.SimpleNamespace(api="requests", url="https://api.groq.com/openai/v1/chat/completions", model="b"),
+        "aws-nova-micro": types.SimpleNamespace(api="langchain_aws", model="c", region="us-east-1"),
+        "lmstudio20b": types.SimpleNamespace(api="langchain_openai", url="http://localhost:1234/v1/chat/completions", model="d", warmup=False),
+    })
+    
+    def test_targets_are_deduplicated(self):
+        targets = vanity_gateway.warmup_targets(self.PROVIDERS)
+        assert targets == {
+            ("http", "https://api.groq.com"): ["groq-gpt-20b", "groq-llama8"],
+            ("bedrock", "us-east-1"): ["aws-nova-micro"],
+            ("import", "langchain_aws"): ["aws-nova-micro"],
+            ("import", "langchain_core.messages"): ["aws-nova-micro"],
+        }
+    
+    def test_warm_up_reports_each_target(self):
+        def fake_warm(target, connections, timeout):
+            if target[0] in ("bedrock", "import"):
+                raise RuntimeError("no credentials")
+            return 12.5
+        with patch.object(vanity_gateway, "warm_target", side_effect=fake_warm):
+            asyncio.run(vanity_gateway.warm_up(self.PROVIDERS))
+        targets = vanity_gateway.READINESS["targets"]
+        assert targets["http:https://api.groq.com"]["ok"]
+        assert not targets["bedrock:us-east-1"]["ok"]
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"]
+    
+    def test_not_ready_before_warm_up(self):
+        vanity_gateway.READINESS["ready"] = False
+        assert client.get("/ready").status_code == 503
+    
+    def test_warm_target_opens_pooled_connections(self):
+        with patch.object(vanity_gateway.DNS, "resolve") as mock_dns, patch.object(vanity_gateway.UPSTREAM, "head") as mock_head:
+            vanity_gateway.warm_target(("http", "https://api.groq.com"), 3, 1.0)
+        assert mock_dns.call_args[0] == ("api.groq.com", 443)
+        assert mock_head.call_count == 3
+    
+    def test_warm_target_imports_adapter(self):
+        with patch.object(vanity_gateway.importlib, "import_module") as mock_import:
+            vanity_gateway.warm_target(("import", "langchain_aws"), 2, 1.0)
+        mock_import.assert_called_once_with("langchain_aws")
+    
+    def test_warm_target_opens_a_bedrock_connection(self):
+        import botocore.exceptions
+        fake = Mock()
+        fake.list_async_invokes.side_effect = botocore.exceptions.ClientError(
+            {"Error": {"Code": "AccessDeniedException", "Message": "denied"}}, "ListAsyncInvokes")
+        with patch.dict(vanity_gateway.BEDROCK_CLIENTS, {"eu-west-1": fake}):
+            vanity_gateway.warm_target(("bedrock", "eu-west-1"), 2, 1.0)
+        fake.list_async_invokes.assert_called_once_with(maxResults=1)
+    
+    def test_bedrock_clients_built_once_from_own_session(self):
+        import boto3.session
+        session = Mock()
+        session.client.side_effect = lambda *a, **k: (time.sleep(0.01), object())[1]
+        with patch.dict(vanity_gateway.BEDROCK_CLIENTS, clear=True), \
+                patch.object(vanity_gateway, "BEDROCK_SESSION", session), \
+                patch.object(boto3, "client") as default_client:
+            with concurrent.futures.ThreadPoolExecutor(8) as pool:
+                clients = list(pool.map(lambda _: vanity_gateway.bedrock_client("ap-south-1"), range(8)))
+        assert len({id(c) for c in clients}) == 1
+        assert session.client.call_count == 1
+        default_client.assert_not_called()
+
+
+class TestRuntimeSelection:
+    """Test event loop / HTTP parser selection"""
+    
+    def test_auto_prefers_uvloop_and_httptools(self):
+        with patch.object(vanity_gateway, "module_available", return_value=True):
+            assert vanity_gateway.select_runtime("auto", "auto") == ("uvloop", "httptools")
+    
+    def test_auto_falls_back_when_missing(self):
+        with patch.object(vanity_gateway, "module_available", return_value=False):
+            assert vanity_gateway.select_runtime("auto", "auto") == ("asyncio", "h11")
+    
+    def test_explicit_request_falls_back_when_missing(self):
+        with patch.object(vanity_gateway, "module_available", return_value=False):
+            assert vanity_gateway.select_runtime("uvloop", "httptools") == ("asyncio", "h11")
+    
+    def test_explicit_asyncio_is_respected(self):
+        with patch.object(vanity_gateway, "module_available", return_value=True):
+            assert vanity_gateway.select_runtime("asyncio", "h11") == ("asyncio", "h11")
+    
+    def test_status_reports_runtime(self):
+        response = client.get("/status")
+        assert response.status_code == 200
+        assert response.json()["loop"] == vanity_gateway.RUNTIME["loop"]
+        assert response.json()["http"] == vanity_gateway.RUNTIME["http"]
+        assert response.json()["draining"] is False
+        assert "hits" in response.json()["dns"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.arqs module"""
+
+import pytest
+import asyncio
+import http.server
+import json
+import threading
+import time
+import types
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import arqs
+
+
+class SlowGateway:
+    """Local gateway that echoes the prompt after a delay and tracks requests in flight."""
+    
+    def __init__(self, delay=0.05, statuses=()):
+        gateway = self
+        self.delay = delay
+        self.statuses = list(statuses)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.requests = 0
+        self.sent = 0
+        self.finished = threading.Event()
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with gateway.lock:
+                    gateway.requests += 1
+                    gateway.in_flight += 1
+                    gateway.peak = max(gateway.peak, gateway.in_flight)
+                    status = gateway.statuses.pop(0) if gateway.statuses else 200
+                    status, extra = status if isinstance(status, tuple) else (status, {})
+                time.sleep(gateway.delay)
+                with gateway.lock:
+                    gateway.in_flight -= 1
+                content = "echo " + body["messages"][-1]["content"]
+                if body.get("stream"):
+                    return self.stream(content)
+                data = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    for name, value in extra.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out or was cancelled
+            def stream(self, content):
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for word in content.split(" "):
+                        chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        with gateway.lock:
+                            gateway.sent += 1
+                        time.sleep(gateway.delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    gateway.finished.set()
+            def log_message(self, *args):
+                pass
+        
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chat/completions"
+        self.cfg = types.SimpleNamespace(
+            projectConfig=types.SimpleNamespace(
+                gateway_url=self.url, nickname="groq-llama8", parameters=types.SimpleNamespace(),
+            ),
+            secret_k="test-key",
+        )
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def gateway():
+    fake = SlowGateway()
+    yield fake
+    fake.close()
+
+def builder(cfg, text="hello"):
+    return {"messages": [{"role": "user", "content": text}]}, False
+
+
+class TestGetResponse:
+    """Test single awaited requests"""
+    
+    def test_get_and_parse(self, gateway):
+        async def scenario():
+            data, err = await arqs.get_response(gateway.cfg, builder, "hi")
+            content = await arqs.parse_response(gateway.cfg, builder, "there")
+            return data, err, content
+        
+        data, err, content = asyncio.run(scenario())
+        assert not err
+        assert data["choices"][0]["message"]["content"] == "echo hi"
+        assert content == ("echo there", False)
+    
+    def test_builder_error_is_returned(self, gateway):
+        bad = lambda cfg: ("no messages", True)
+        assert asyncio.run(arqs.get_response(gateway.cfg, bad)) == ("no messages", True)
+        assert gateway.requests == 0
+    
+    def test_retries_unavailable(self):
+        fake = SlowGateway(delay=0, statuses=[(503, {"Retry-After": "0"})])
+        
+        async def scenario():
+            async with arqs.Client(backoff=0) as client:
+                return await arqs.parse_response(fake.cfg, builder, client=client)
+        
+        try:
+            assert asyncio.run(scenario()) == ("echo hello", False)
+        finally:
+            fake.close()
+        assert fake.requests == 2
+    
+    def test_post_not_retried_on_gateway_errors(self):
+        fake = SlowGateway(delay=0, statuses=[502, 503])
+        
+        async def scenario():
+            async with arqs.Client(backoff=0) as client:
+                return [await arqs.get_response(fake.cfg, builder, client=client) for _ in range(2)]
+        
+        try:
+            results = asyncio.run(scenario())
+        finally:
+            fake.close()
+        assert [err for _, err in results] == [True, True]
+        assert fake.requests == 2
+    
+    def test_timeout(self):
+        fake = SlowGateway(delay=0.5)
+        try:
+            content, err = asyncio.run(arqs.get_response(fake.cfg, builder, timeout=0.05))
+        finally:
+            fake.close()
+        assert err
+        assert "timed out" in content
+    
+    def test_cancellation_propagates(self):
+        fake = SlowGateway(delay=0.5)
+        
+        async def scenario():
+            task = asyncio.create_task(arqs.get_response(fake.cfg, builder))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        try:
+            asyncio.run(scenario())
+        finally:
+            fake.close()
+
+
+class TestGatherResponses:
+    """Test bounded concurrent fan-out"""
+    
+    def test_preserves_order(self, gateway):
+        builders = [(builder, f"p{i}") for i in range(20)]
+        results = asyncio.run(arqs.gather_responses(gateway.cfg, builders, concurrency=8))
+        assert results == [(f"echo p{i}", False) for i in range(20)]
+    
+    def test_bounds_concurrency(self, gateway):
+        builders = [(builder, str(i)) for i in range(12)]
+        asyncio.run(arqs.gather_responses(gateway.cfg, builders, concurrency=4))
+        assert gateway.requests == 12
+        assert 1 < gateway.peak <= 4
+    
+    def test_concurrency_beyond_shared_pool(self, gateway):
+        builders = [(builder, str(i)) for i in range(24)]
+        
+        async def scenario():
+            shared = arqs.client_for(gateway.cfg.projectConfig.gateway_url, pool_size=4)
+            results = await arqs.gather_responses(gateway.cfg, builders, concurrency=12)
+            assert arqs.client_for(gateway.cfg.projectConfig.gateway_url) is shared
+            await shared.close()
+            return results
+        
+        results = asyncio.run(scenario())
+        assert results == [(f"echo {i}", False) for i in range(24)]
+        assert gateway.peak > 4
+    
+    def test_runs_concurrently(self, gateway):
+        started = time.monotonic()
+        asyncio.run(arqs.gather_responses(gateway.cfg, [builder] * 10, concurrency=10))
+        assert time.monotonic() - started < 10 * gateway.delay
+    
+    def test_errors_stay_in_place(self, gateway):
+        bad = lambda cfg: ("bad payload", True)
+        results = asyncio.run(arqs.gather_responses(gateway.cfg, [builder, bad, (builder, "x")]))
+        assert results == [("echo hello", False), ("bad payload", True), ("echo x", False)]
+    
+    def test_raw_responses(self, gateway):
+        results = asyncio.run(arqs.gather_responses(gateway.cfg, [builder], parse=False))
+        data, err = results[0]
+        assert not err
+        assert data["choices"][0]["message"]["content"] == "echo hello"
+
+
+
+class TestStreamResponse:
+    """Test async iteration over streamed completions"""
+    
+    def test_yields_deltas_and_assembles(self):
+        fake = SlowGateway(delay=0)
+        
+        async def scenario():
+            stream, err = await arqs.stream_response(fake.cfg, builder, "a b")
+            assert not err
+            async with stream:
+                deltas = [delta async for delta in stream]
+            return deltas, await stream.result()
+        
+        try:
+            deltas, result = asyncio.run(scenario())
+        finally:
+            fake.close()
+        assert deltas == ["echo ", "a ", "b "]
+        assert result == ("echo a b", False)
+    
+    def test_early_close_drops_connection(self):
+        fake = SlowGateway(delay=0.02)
+        
+        async def scenario():
+            stream, err = await arqs.stream_response(fake.cfg, builder, " ".join(["w"] * 200))
+            async with stream:
+                async for delta in stream:
+                    if stream.text.count("w") == 2:
+                        break
+            return stream.text
+        
+        try:
+            assert asyncio.run(scenario()) == "echo w w "
+            assert fake.finished.wait(5)
+            assert fake.sent < 100
+        finally:
+            fake.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
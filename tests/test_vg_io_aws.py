@@ -7,6 +7,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
+import concurrent.futures
+import time
 from unittest.mock import Mock, patch
 from vg_io import aws
 
@@ -113,3 +115,65 @@ def test_parse_response_strips_code_blocks(mock_cfg, mock_payload_builder):
         
         assert not err
         assert result == "print('hello')"
+
+def test_parse_response_many(mock_cfg, mock_payload_builder):
+    progress = []
+    with patch('vg_io.aws.parse_response', side_effect=lambda cfg, builder, n, verify=True: (f"r{n}", False)):
+        results = aws.parse_response_many(
+            mock_cfg, mock_payload_builder, [(n,) for n in range(5)],
+            max_workers=3, progress=lambda done, total, index, result: progress.append(done),
+        )
+    
+    assert results == [(f"r{n}", False) for n in range(5)]
+    assert progress == [1, 2, 3, 4, 5]
+
+def test_reuses_model_instance(mock_cfg, mock_payload_builder):
+    with patch('vg_io.aws.ChatBedrock') as mock_bedrock:
+        mock_bedrock.return_value.invoke.return_value = Mock(content="ok", response_metadata={})
+        for _ in range(3):
+            result, err = aws.get_response(mock_cfg, mock_payload_builder)
+            assert not err
+        mock_cfg.aws_region = "eu-west-1"
+        aws.get_response(mock_cfg, mock_payload_builder)
+    
+    assert mock_bedrock.call_count == 2
+    assert mock_bedrock.return_value.invoke.call_count == 4
+
+def test_credentials_read_once_per_file_version(tmp_path):
+    key_file = tmp_path / "credentials"
+    key_file.write_text("[default]\naws_access_key_id = AKIA1\naws_secret_access_key = s1\n")
+    
+    with patch('vg_io.aws.configparser.ConfigParser', wraps=aws.configparser.ConfigParser) as parser:
+        assert aws.load_credentials(str(key_file)) == ("AKIA1", "s1")
+        assert aws.load_credentials(str(key_file)) == ("AKIA1", "s1")
+        assert parser.call_count == 1
+        
+        key_file.write_text("[default]\naws_access_key_id = AKIA2\naws_secret_access_key = s2\n")
+        os.utime(key_file, ns=(0, os.stat(key_file).st_mtime_ns + 1000))
+        assert aws.load_credentials(str(key_file)) == ("AKIA2", "s2")
+        assert parser.call_count == 2
+    
+    assert aws.load_credentials(None) == (None, None)
+
+def test_missing_credentials_file_falls_back_to_default_chain(tmp_path):
+    key_file = tmp_path / "credentials"
+    assert aws.load_credentials(str(key_file)) == (None, None)
+    
+    # The file showing up later is picked up
+    key_file.write_text("[default]\naws_access_key_id = AKIA3\naws_secret_access_key = s3\n")
+    assert aws.load_credentials(str(key_file)) == ("AKIA3", "s3")
+
+def test_concurrent_loads_parse_once(tmp_path):
+    key_file = tmp_path / "credentials"
+    key_file.write_text("[default]\naws_access_key_id = AKIA4\naws_secret_access_key = s4\n")
+    real_read = aws.configparser.ConfigParser.read
+    
+    def slow_read(self, *args, **kwargs):
+        time.sleep(0.02)
+        return real_read(self, *args, **kwargs)
+    
+    with patch.object(aws.configparser.ConfigParser, "read", autospec=True, side_effect=slow_read) as read:
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: aws.load_credentials(str(key_file)), range(8)))
+    assert results == [("AKIA4", "s4")] * 8
+    assert read.call_count == 1
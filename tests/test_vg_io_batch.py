@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.batch module"""
+
+import pytest
+import asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import batch
+
+
+def recording_call(calls):
+    async def call(key, items):
+        calls.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+    return call
+
+
+class TestMicroBatcher:
+    """Test coalescing and result splitting"""
+    
+    def test_coalesces_concurrent_submissions(self):
+        calls = []
+        batcher = batch.MicroBatcher(recording_call(calls), max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit("k", ["a"]),
+                batcher.submit("k", ["b", "c"]),
+                batcher.submit("k", ["d"]),
+            )
+        
+        results = asyncio.run(scenario())
+        assert calls == [("k", ["a", "b", "c", "d"])]
+        assert results == [["k:a"], ["k:b", "k:c"], ["k:d"]]
+    
+    def test_keys_are_batched_separately(self):
+        calls = []
+        batcher = batch.MicroBatcher(recording_call(calls), max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(batcher.submit("x", ["a"]), batcher.submit("y", ["b"]))
+        
+        assert asyncio.run(scenario()) == [["x:a"], ["y:b"]]
+        assert len(calls) == 2
+    
+    def test_flushes_when_full(self):
+        calls = []
+        batcher = batch.MicroBatcher(recording_call(calls), max_batch=2, max_wait=10)
+        
+        async def scenario():
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.submit("k", ["a"]), batcher.submit("k", ["b"])), timeout=1
+            )
+        
+        assert asyncio.run(scenario()) == [["k:a"], ["k:b"]]
+    
+    def test_oversized_submission_goes_alone(self):
+        calls = []
+        batcher = batch.MicroBatcher(recording_call(calls), max_batch=2, max_wait=10)
+        assert asyncio.run(batcher.submit("k", ["a", "b", "c"])) == ["k:a", "k:b", "k:c"]
+    
+    def test_errors_reach_every_caller(self):
+        async def failing(key, items):
+            raise RuntimeError("upstream down")
+        batcher = batch.MicroBatcher(failing, max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(batcher.submit("k", ["a"]), batcher.submit("k", ["b"]), return_exceptions=True)
+        
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
+
+
+class TestBatchLimits:
+    """Test batch size limits and failure isolation"""
+    
+    def test_never_exceeds_max_batch(self):
+        calls = []
+        batcher = batch.MicroBatcher(recording_call(calls), max_batch=4, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit("k", ["a", "b", "c"]),
+                batcher.submit("k", ["d", "e"]),
+                batcher.submit("k", ["f"]),
+            )
+        
+        results = asyncio.run(scenario())
+        assert results == [["k:a", "k:b", "k:c"], ["k:d", "k:e"], ["k:f"]]
+        assert all(len(items) <= 4 for key, items in calls)
+        assert calls[0] == ("k", ["a", "b", "c"])
+    
+    def test_one_bad_submission_fails_alone(self):
+        calls = []
+        
+        async def call(key, items):
+            calls.append(list(items))
+            if "bad" in items:
+                raise ValueError("bad input")
+            return [item.upper() for item in items]
+        
+        batcher = batch.MicroBatcher(call, max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit("k", ["a"]),
+                batcher.submit("k", ["bad"]),
+                batcher.submit("k", ["b", "c"]),
+                return_exceptions=True,
+            )
+        
+        good, bad, more = asyncio.run(scenario())
+        assert good == ["A"]
+        assert more == ["B", "C"]
+        assert isinstance(bad, ValueError)
+        assert calls[0] == ["a", "bad", "b", "c"]
+        assert batcher.retries == 1
+    
+    def test_short_results_fail_alone(self):
+        async def call(key, items):
+            return [] if "short" in items else list(items)
+        
+        batcher = batch.MicroBatcher(call, max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit("k", ["x"]), batcher.submit("k", ["short"]), return_exceptions=True,
+            )
+        
+        ok, short = asyncio.run(scenario())
+        assert ok == ["x"]
+        assert isinstance(short, ValueError)
+    
+    def test_upstream_errors_fail_the_batch_without_splitting(self):
+        class Unavailable(Exception):
+            status_code = 503
+        
+        calls = []
+        
+        async def call(key, items):
+            calls.append(list(items))
+            raise Unavailable("upstream down")
+        
+        batcher = batch.MicroBatcher(call, max_batch=10, max_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit("k", ["a"]), batcher.submit("k", ["b"]), batcher.submit("k", ["c"]),
+                return_exceptions=True,
+            )
+        
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, Unavailable) for r in results)
+        assert calls == [["a", "b", "c"]]
+        assert batcher.retries == 0
+    
+    def test_connection_errors_are_not_split(self):
+        assert not batch.input_error(ConnectionError("refused"))
+        assert not batch.input_error(TimeoutError())
+        assert batch.input_error(ValueError("bad"))
+    
+    def test_holds_task_references_until_done(self):
+        started = []
+        
+        async def call(key, items):
+            started.append(len(batcher.tasks))
+            await asyncio.sleep(0)
+            return list(items)
+        
+        batcher = batch.MicroBatcher(call, max_batch=2, max_wait=10)
+        
+        async def scenario():
+            return await asyncio.gather(batcher.submit("k", ["a"]), batcher.submit("k", ["b"]))
+        
+        assert asyncio.run(scenario()) == [["a"], ["b"]]
+        assert started == [1]
+        assert not batcher.tasks
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.cascade module"""
+
+import pytest
+import json
+import types
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import cascade
+
+
+def completion(content, finish_reason="stop", logprobs=None):
+    choice = {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}
+    if logprobs is not None:
+        choice["logprobs"] = {"content": [{"token": "t", "logprob": lp} for lp in logprobs]}
+    return {"id": "chatcmpl-1", "model": "m", "choices": [choice], "usage": {"prompt_tokens": 1, "completion_tokens": 2}}
+
+
+class TestSchemaErrors:
+    """Test the JSON schema subset"""
+    
+    SCHEMA = {
+        "type": "object",
+        "required": ["answer", "confidence"],
+        "properties": {
+            "answer": {"type": "string"},
+            "confidence": {"type": "number"},
+            "tags": {"type": "array", "items": {"enum": ["a", "b"]}},
+        },
+        "additionalProperties": False,
+    }
+    
+    def test_valid(self):
+        assert cascade.schema_errors(self.SCHEMA, {"answer": "x", "confidence": 1, "tags": ["a"]}) == []
+    
+    def test_invalid(self):
+        assert cascade.schema_errors(self.SCHEMA, {"answer": "x"}) == ["$: missing confidence"]
+        assert cascade.schema_errors(self.SCHEMA, {"answer": 1, "confidence": True}) == [
+            "$.answer: expected string", "$.confidence: expected number",
+        ]
+        assert cascade.schema_errors(self.SCHEMA, {"answer": "x", "confidence": 1, "tags": ["c"], "extra": 1}) == [
+            "$.tags[0]: not one of ['a', 'b']", "$: unexpected extra",
+        ]
+
+
+class TestAcceptance:
+    """Test compiled acceptance checks"""
+    
+    def test_empty_accepts_anything(self):
+        assert cascade.Acceptance()(completion("")) == (True, None)
+    
+    def test_json_schema(self):
+        check = cascade.Acceptance({"json_schema": {"type": "object", "required": ["answer"]}})
+        assert check(completion(json.dumps({"answer": 42})))[0]
+        assert check(completion("not json")) == (False, "not JSON")
+        assert check(completion("{}")) == (False, "$: missing answer")
+    
+    def test_regex_length_and_finish_reason(self):
+        check = cascade.Acceptance({"regex": "^yes|no$", "max_length": 3, "finish_reasons": ["stop"]})
+        assert check(completion("yes"))[0]
+        assert not check(completion("maybe"))[0]
+        assert check(completion("no", finish_reason="length")) == (False, "finish_reason length")
+    
+    def test_logprob_threshold(self):
+        check = cascade.Acceptance({"min_logprob": -0.5})
+        assert check.logprobs
+        assert check(completion("x", logprobs=[-0.1, -0.3]))[0]
+        assert not check(completion("x", logprobs=[-0.1, -2.0]))[0]
+        assert check(completion("x")) == (False, "no logprobs")
+    
+    def test_accepts_namespace_config(self):
+        accept = json.loads('{"json_schema": {"type": "object", "required": ["a"]}}', object_hook=lambda d: types.SimpleNamespace(**d))
+        check = cascade.Acceptance(accept)
+        assert check(completion('{"a": 1}'))[0]
+    
+    def test_checks_cached_per_version(self):
+        checks = cascade.Checks()
+        first = checks.get("c", {"min_length": 1}, version=1)
+        assert checks.get("c", {"min_length": 1}, version=1) is first
+        assert checks.get("c", {"min_length": 1}, version=2) is not first
+
+
+class TestAsChunks:
+    """Test completions replayed as stream chunks"""
+    
+    def test_chunks(self):
+        chunks = list(cascade.as_chunks(completion("hi")))
+        assert chunks[0]["object"] == "chat.completion.chunk"
+        assert chunks[0]["choices"][0]["delta"]["content"] == "hi"
+        assert chunks[1]["choices"][0]["finish_reason"] == "stop"
+        assert chunks[2]["usage"] == {"prompt_tokens": 1, "completion_tokens": 2}
+    
+    def test_logprobs_carried_or_stripped(self):
+        answer = completion("hi")
+        answer["choices"][0]["logprobs"] = {"content": [{"token": "hi", "logprob": -0.1}]}
+        assert "logprobs" in list(cascade.as_chunks(answer))[0]["choices"][0]
+        cascade.strip_logprobs(answer)
+        assert "logprobs" not in answer["choices"][0]
+        assert "logprobs" not in list(cascade.as_chunks(answer))[0]["choices"][0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
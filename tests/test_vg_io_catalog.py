@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.catalog module"""
+
+import pytest
+import json
+import types
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import catalog
+
+
+PROVIDERS = types.SimpleNamespace(**{
+    "groq-llama8": types.SimpleNamespace(
+        api="requests", url="https://api.groq.com/openai/v1/chat/completions",
+        key_path="vg_cfg/Groq.key", model="llama-3.1-8b-instant", catalog=True,
+    ),
+    "openai-embed-small": types.SimpleNamespace(
+        api="requests", url="https://api.openai.com/v1/embeddings", model="text-embedding-3-small",
+    ),
+    "aws-nova-micro": types.SimpleNamespace(
+        api="langchain_aws", model="amazon.nova-micro-v1:0", region="us-east-1",
+    ),
+})
+
+
+class TestEntries:
+    """Test per-provider entries"""
+    
+    def test_capabilities_inferred(self):
+        assert catalog.capabilities(PROVIDERS.__dict__["groq-llama8"]) == ["chat"]
+        assert catalog.capabilities(PROVIDERS.__dict__["openai-embed-small"]) == ["embeddings"]
+    
+    def test_catalog_url(self):
+        assert catalog.catalog_url(PROVIDERS.__dict__["groq-llama8"]) == "https://api.groq.com/openai/v1/models"
+    
+    def test_entry_fields(self):
+        entry = catalog.model_entry("aws-nova-micro", PROVIDERS.__dict__["aws-nova-micro"])
+        assert entry["id"] == "aws-nova-micro"
+        assert entry["upstream_model"] == "amazon.nova-micro-v1:0"
+        assert entry["region"] == "us-east-1"
+
+
+class TestCatalog:
+    """Test snapshot caching and upstream refresh"""
+    
+    def test_snapshot_is_cached(self):
+        cat = catalog.Catalog()
+        calls = []
+        def providers():
+            calls.append(1)
+            return PROVIDERS
+        first = cat.snapshot(providers, 1)
+        second = cat.snapshot(providers, 1)
+        assert first == second
+        assert len(calls) == 1
+        assert len(json.loads(first[0])["data"]) == 3
+    
+    def test_snapshot_changes_with_mtime(self):
+        cat = catalog.Catalog()
+        assert cat.snapshot(lambda: PROVIDERS, 1)[1] == cat.snapshot(lambda: PROVIDERS, 2)[1]
+        assert list(cat.snapshots) == [(2, 0, None)]
+    
+    def test_snapshot_filters_allowed(self):
+        cat = catalog.Catalog()
+        body, _ = cat.snapshot(lambda: PROVIDERS, 1, frozenset(["aws-nova-micro"]))
+        assert [m["id"] for m in json.loads(body)["data"]] == ["aws-nova-micro"]
+    
+    def test_refresh_enriches_entries(self):
+        cat = catalog.Catalog()
+        _, etag = cat.snapshot(lambda: PROVIDERS, 1)
+        upstream = {"llama-3.1-8b-instant": {"id": "llama-3.1-8b-instant", "context_window": 131072}}
+        with patch.object(catalog, "fetch_upstream", return_value=upstream) as mock_fetch:
+            cat.refresh(PROVIDERS, lambda path: "key")
+        assert mock_fetch.call_count == 1
+        body, new_etag = cat.snapshot(lambda: PROVIDERS, 1)
+        assert new_etag != etag
+        entry = [m for m in json.loads(body)["data"] if m["id"] == "groq-llama8"][0]
+        assert entry["upstream"]["context_window"] == 131072
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.cfg module"""
+
+import pytest
+import json
+import os
+import types
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import cfg, rqs
+
+
+CFG = {
+    "projectConfig": {
+        "gateway_url": "https://localhost:8443/chat/completions",
+        "nickname": "groq-gpt-20b",
+        "parameters": {"max_tokens": 400, "temperature": 0.5},
+        "retries": 3,
+        "cache": {"path": "responses.sqlite"},
+    }
+}
+
+@pytest.fixture
+def files(tmp_path):
+    cfg_file = tmp_path / "client.json"
+    cfg_file.write_text(json.dumps(CFG))
+    key_file = tmp_path / "test.key"
+    key_file.write_text("secret-one\n")
+    return str(cfg_file), str(key_file)
+
+def bump(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+
+
+class TestLoad:
+    """Test loading and memoization"""
+    
+    def test_attribute_access(self, files):
+        loaded = cfg.load_from_file(*files)
+        assert loaded.projectConfig.nickname == "groq-gpt-20b"
+        assert loaded.projectConfig.parameters.temperature == 0.5
+        assert dict(loaded.projectConfig.parameters) == {"max_tokens": 400, "temperature": 0.5}
+        assert loaded.projectConfig.cache.path == "responses.sqlite"
+        assert loaded.secret_k == "secret-one"
+    
+    def test_absent_optional_fields_stay_unset(self, files):
+        loaded = cfg.inline_set('{"projectConfig": {"gateway_url": "u", "nickname": "n"}}', files[1])
+        assert not hasattr(loaded.projectConfig, "pool_size")
+        assert getattr(loaded.projectConfig, "timeout", 30) == 30
+        assert dict(loaded.projectConfig.parameters) == {}
+        assert rqs.client_options(cfg.load_from_file(*files)) == {"retries": 3}
+    
+    def test_parsed_once_until_file_changes(self, files):
+        cfg_file, key_file = files
+        first = cfg.load_from_file(cfg_file, key_file)
+        with patch("builtins.open", side_effect=AssertionError("re-read")):
+            again = cfg.load_from_file(cfg_file, key_file)
+        assert again.projectConfig.nickname == first.projectConfig.nickname
+        bump(cfg_file, json.dumps(dict(CFG, projectConfig=dict(CFG["projectConfig"], nickname="other"))))
+        assert cfg.load_from_file(cfg_file, key_file).projectConfig.nickname == "other"
+    
+    def test_secret_read_lazily_once(self, files):
+        cfg_file, key_file = files
+        with patch("builtins.open", wraps=open) as opened:
+            loaded = cfg.inline_set(json.dumps(CFG), key_file)
+            assert opened.call_count == 0
+            assert loaded.secret_k == "secret-one"
+            assert loaded.secret_k == "secret-one"
+            assert opened.call_count == 1
+    
+    def test_secret_read_once_across_loads(self, files):
+        cfg_file, key_file = files
+        cfg.load_from_file(cfg_file, key_file).secret_k
+        with patch("builtins.open", side_effect=AssertionError("re-read")):
+            for _ in range(100):
+                assert cfg.load_from_file(cfg_file, key_file).secret_k == "secret-one"
+    
+    def test_key_rotation_reloads(self, files):
+        cfg_file, key_file = files
+        assert cfg.load_from_file(cfg_file, key_file).secret_k == "secret-one"
+        bump(key_file, "secret-two\n")
+        assert cfg.load_from_file(cfg_file, key_file).secret_k == "secret-two"
+    
+    def test_inline_parse_memoized(self, files):
+        raw = json.dumps(dict(CFG, projectConfig=dict(CFG["projectConfig"], nickname="inline")))
+        cfg.inline_set(raw, files[1])
+        with patch("vg_io.cfg.json.loads", side_effect=AssertionError("re-parsed")):
+            assert cfg.inline_set(raw, files[1]).projectConfig.nickname == "inline"
+
+class TestValidation:
+    """Test load-time validation"""
+    
+    def load(self, project):
+        return cfg.inline_set(json.dumps({"projectConfig": project}), "unused.key")
+    
+    def test_unknown_key_is_kept_with_warning(self):
+        with pytest.warns(UserWarning, match="unknown key.*nicknmae"):
+            loaded = self.load({"gateway_url": "u", "nickname": "n", "nicknmae": "typo"})
+        assert loaded.projectConfig.nicknmae == "typo"
+        assert not hasattr(loaded.projectConfig, "other")
+    
+    def test_missing_required(self):
+        with pytest.raises(ValueError, match="projectConfig.nickname is required"):
+            self.load({"gateway_url": "u"})
+    
+    def test_wrong_types(self):
+        with pytest.raises(ValueError, match="timeout must be number"):
+            self.load({"gateway_url": "u", "nickname": "n", "timeout": "30"})
+        with pytest.raises(ValueError, match="retries must be int"):
+            self.load({"gateway_url": "u", "nickname": "n", "retries": True})
+        with pytest.raises(ValueError, match="parameters must be an object"):
+            self.load({"gateway_url": "u", "nickname": "n", "parameters": []})
+        with pytest.raises(ValueError, match="cache.path is required"):
+            self.load({"gateway_url": "u", "nickname": "n", "cache": {"max_mb": 1}})
+    
+    def test_records_are_frozen(self):
+        raw = json.dumps({"projectConfig": {"gateway_url": "u", "nickname": "n", "parameters": {"temperature": 1}}})
+        loaded = cfg.inline_set(raw, "unused.key")
+        with pytest.raises(AttributeError, match="frozen"):
+            loaded.projectConfig.nickname = "x"
+        with pytest.raises(AttributeError, match="frozen"):
+            loaded.projectConfig.parameters.temperature = 0
+        with pytest.raises(TypeError):
+            loaded.projectConfig.parameters["top_p"] = 0.9
+        with pytest.raises(AttributeError, match="frozen"):
+            loaded.secret_k = "inline"
+        assert cfg.inline_set(raw, "unused.key") is loaded
+    
+    def test_replace_is_checked_and_leaves_original(self):
+        raw = json.dumps({"projectConfig": {"gateway_url": "u", "nickname": "n", "parameters": {"temperature": 1}}})
+        loaded = cfg.inline_set(raw, "unused.key")
+        project = loaded.projectConfig.replace(nickname="x", parameters=loaded.projectConfig.parameters.replace(top_p=0.9))
+        changed = loaded.replace(projectConfig=project, secret_k="inline", extra_setting=1)
+        assert changed.projectConfig.nickname == "x"
+        assert dict(changed.projectConfig.parameters) == {"temperature": 1, "top_p": 0.9}
+        assert (changed.extra_setting, changed.secret_k) == (1, "inline")
+        with pytest.raises(ValueError, match="retries must be int"):
+            loaded.projectConfig.replace(retries="3")
+        
+        assert loaded.projectConfig.nickname == "n"
+        assert dict(loaded.projectConfig.parameters) == {"temperature": 1}
+        assert not hasattr(loaded, "extra_setting")
+
+
+class TestAwsConfig:
+    """Test AWS-style client configs used by vg_io.aws"""
+    
+    def test_aws_fields(self, tmp_path):
+        from vg_io import aws
+        credentials = tmp_path / "credentials"
+        credentials.write_text("[default]\naws_access_key_id = AKIA\naws_secret_access_key = s\n")
+        raw = json.dumps({
+            "projectConfig": {"gateway_url": "u", "nickname": "aws-nova-micro"},
+            "key_path": str(credentials),
+            "aws_region": "eu-west-1",
+        })
+        loaded = cfg.inline_set(raw, "unused.key")
+        assert (loaded.key_path, loaded.aws_region) == (str(credentials), "eu-west-1")
+        
+        def builder(cfg):
+            return {"model": "amazon.nova-micro-v1:0", "messages": [{"role": "user", "content": "hi"}]}, False
+        with patch("vg_io.aws.ChatBedrock") as mock_bedrock:
+            mock_bedrock.return_value.invoke.return_value = types.SimpleNamespace(content="ok", response_metadata={})
+            assert aws.parse_response(loaded, builder) == ("ok", False)
+        kwargs = mock_bedrock.call_args.kwargs
+        assert kwargs["region_name"] == "eu-west-1"
+        assert (kwargs["aws_access_key_id"], kwargs["aws_secret_access_key"]) == ("AKIA", "s")
+    
+    def test_aws_field_types(self):
+        with pytest.raises(ValueError, match="cfg.aws_region must be str"):
+            cfg.inline_set(json.dumps({"projectConfig": {"gateway_url": "u", "nickname": "n"}, "aws_region": 1}), "k")
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.codec module"""
+
+import pytest
+import gzip
+import json
+import zlib
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import codec
+
+import fastapi
+from fastapi.testclient import TestClient
+
+
+def make_app():
+    app = fastapi.FastAPI()
+    app.add_middleware(codec.CompressionMiddleware, min_size=16)
+
+    @app.post("/echo")
+    async def echo(request: fastapi.Request):
+        return await request.json()
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/sse")
+    async def sse():
+        async def events():
+            for i in range(3):
+                yield f"data: {json.dumps({'i': i})}\n\n"
+        return fastapi.responses.StreamingResponse(events(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+class TestDecodeBody:
+    """Test request body decoding"""
+    
+    def test_gzip_round_trip(self):
+        assert codec.decode_body(gzip.compress(b"hello"), "gzip") == b"hello"
+    
+    def test_deflate_round_trip(self):
+        assert codec.decode_body(zlib.compress(b"hello"), "deflate") == b"hello"
+    
+    def test_rejects_unknown_encoding(self):
+        with pytest.raises(ValueError, match="Unsupported"):
+            codec.decode_body(b"x", "br")
+    
+    def test_rejects_oversized_body(self):
+        with pytest.raises(ValueError, match="exceeds"):
+            codec.decode_body(gzip.compress(b"a" * 1000), "gzip", max_size=100)
+    
+    @pytest.mark.skipif(codec.zstandard is None, reason="zstandard not installed")
+    def test_zstd_round_trip(self):
+        assert codec.decode_body(codec.encode_body(b"hello", "zstd"), "zstd") == b"hello"
+    
+    def test_rejects_truncated_gzip(self):
+        with pytest.raises(ValueError, match="Truncated"):
+            codec.decode_body(gzip.compress(b"hello world" * 50)[:-8], "gzip")
+    
+    @pytest.mark.skipif(codec.zstandard is None, reason="zstandard not installed")
+    def test_rejects_truncated_zstd(self):
+        with pytest.raises(ValueError, match="Truncated"):
+            codec.decode_body(codec.encode_body(os.urandom(200000), "zstd")[:-5], "zstd")
+
+
+class TestPickEncoding:
+    """Test Accept-Encoding negotiation"""
+    
+    def test_none_without_header(self):
+        assert codec.pick_encoding(None) is None
+        assert codec.pick_encoding("br") is None
+    
+    def test_gzip(self):
+        assert codec.pick_encoding("gzip, deflate") == "gzip"
+    
+    def test_respects_q_values(self):
+        assert codec.pick_encoding("gzip;q=0, zstd;q=0") is None
+        assert codec.pick_encoding("gzip;q=1.0, zstd;q=0.5") == "gzip"
+
+
+class TestCompressionMiddleware:
+    """Test the ASGI middleware"""
+    
+    def test_accepts_gzip_request_body(self):
+        client = make_app()
+        body = gzip.compress(json.dumps({"messages": ["x" * 100]}).encode())
+        response = client.post("/echo", content=body, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"})
+        assert response.status_code == 200
+        assert response.json() == {"messages": ["x" * 100]}
+    
+    def test_truncated_request_body_is_400(self):
+        client = make_app()
+        body = gzip.compress(json.dumps({"messages": ["x" * 100]}).encode())[:-8]
+        response = client.post("/echo", content=body, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"})
+        assert response.status_code == 400
+    
+    def test_oversized_compressed_body_is_413(self):
+        app = fastapi.FastAPI()
+        app.add_middleware(codec.CompressionMiddleware, max_decoded=1000)
+        response = TestClient(app).post("/echo", content=os.urandom(4000), headers={"Content-Encoding": "gzip"})
+        assert response.status_code == 413
+    
+    def test_unsupported_request_encoding(self):
+        client = make_app()
+        response = client.post("/echo", content=b"xx", headers={"Content-Encoding": "br"})
+        assert response.status_code == 415
+    
+    def test_compresses_large_response(self):
+        client = make_app()
+        response = client.post("/echo", json={"text": "y" * 500}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == {"text": "y" * 500}
+    
+    def test_skips_small_response(self):
+        client = make_app()
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+    
+    def test_streaming_chunks_decode_independently(self):
+        compressor = codec.StreamCompressor("gzip")
+        decompressor = zlib.decompressobj(31)
+        for chunk in (b"data: 1\n\n", b"data: 2\n\n"):
+            assert decompressor.decompress(compressor.compress(chunk)) == chunk
+    
+    def test_compresses_sse(self):
+        client = make_app()
+        response = client.get("/sse", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text.count("data:") == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
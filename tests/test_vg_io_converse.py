@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.converse module"""
+
+import pytest
+import json
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import converse
+
+import boto3
+from botocore.stub import Stubber
+
+MODEL = "amazon.nova-micro-v1:0"
+
+WEATHER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_weather",
+        "description": "Current weather",
+        "parameters": {"type": "object", "properties": {"city": {"type": "string"}}},
+    },
+}
+
+
+@pytest.fixture
+def stubbed():
+    client = boto3.client(
+        "bedrock-runtime", region_name="us-east-1",
+        aws_access_key_id="testing", aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+class TestToConverse:
+    """Test OpenAI -> Converse request mapping"""
+    
+    def test_system_messages_and_inference_config(self):
+        request = converse.to_converse({
+            "messages": [
+                {"role": "system", "content": "Be brief."},
+                {"role": "user", "content": "Hello"},
+            ],
+            "max_tokens": 50, "temperature": 0.2, "top_p": 0.9, "stop": "END",
+        }, MODEL)
+        assert request == {
+            "modelId": MODEL,
+            "system": [{"text": "Be brief."}],
+            "messages": [{"role": "user", "content": [{"text": "Hello"}]}],
+            "inferenceConfig": {"maxTokens": 50, "temperature": 0.2, "topP": 0.9, "stopSequences": ["END"]},
+        }
+    
+    def test_tool_round_trip_messages(self):
+        request = converse.to_converse({
+            "messages": [
+                {"role": "user", "content": "Weather in Oslo?"},
+                {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": "call_1", "type": "function",
+                    "function": {"name": "get_weather", "arguments": "{\"city\": \"Oslo\"}"},
+                }]},
+                {"role": "tool", "tool_call_id": "call_1", "content": "4C, rain"},
+                {"role": "user", "content": "Thanks"},
+            ],
+            "tools": [WEATHER_TOOL], "tool_choice": "required",
+        }, MODEL)
+        assert [m["role"] for m in request["messages"]] == ["user", "assistant", "user"]
+        assert request["messages"][1]["content"] == [
+            {"toolUse": {"toolUseId": "call_1", "name": "get_weather", "input": {"city": "Oslo"}}}
+        ]
+        # The tool result and the following user turn are merged into one turn
+        assert request["messages"][2]["content"] == [
+            {"toolResult": {"toolUseId": "call_1", "content": [{"text": "4C, rain"}]}},
+            {"text": "Thanks"},
+        ]
+        assert request["toolConfig"]["toolChoice"] == {"any": {}}
+        assert request["toolConfig"]["tools"][0]["toolSpec"]["inputSchema"]["json"] == WEATHER_TOOL["function"]["parameters"]
+    
+    def test_tool_choice_none_drops_tools(self):
+        request = converse.to_converse({
+            "messages": [{"role": "user", "content": "hi"}], "tools": [WEATHER_TOOL], "tool_choice": "none",
+        }, MODEL)
+        assert "toolConfig" not in request
+    
+    def test_data_url_image(self):
+        request = converse.to_converse({"messages": [{"role": "user", "content": [
+            {"type": "text", "text": "What is this?"},
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64,iVBORw=="}},
+        ]}]}, MODEL)
+        image = request["messages"][0]["content"][1]["image"]
+        assert image["format"] == "png"
+        assert image["source"]["bytes"].startswith(b"\x89PNG")
+    
+    def test_invalid_role(self):
+        with pytest.raises(ValueError):
+            converse.to_converse({"messages": [{"role": "narrator", "content": "hi"}]}, MODEL)
+
+
+class TestConverse:
+    """Test the Converse call against a stubbed client"""
+    
+    def test_text_answer(self, stubbed):
+        client, stubber = stubbed
+        payload = {"messages": [{"role": "user", "content": "Hello"}], "max_tokens": 20}
+        stubber.add_response("converse", {
+            "output": {"message": {"role": "assistant", "content": [{"text": "Hi there"}]}},
+            "stopReason": "max_tokens",
+            "usage": {"inputTokens": 3, "outputTokens": 20, "totalTokens": 23},
+            "metrics": {"latencyMs": 120},
+        }, converse.to_converse(payload, MODEL))
+        result = converse.converse(client, payload, MODEL)
+        assert result["object"] == "chat.completion"
+        assert result["choices"][0]["message"] == {"role": "assistant", "content": "Hi there"}
+        assert result["choices"][0]["finish_reason"] == "length"
+        assert result["usage"] == {"prompt_tokens": 3, "completion_tokens": 20, "total_tokens": 23}
+    
+    def test_tool_call_answer(self, stubbed):
+        client, stubber = stubbed
+        payload = {"messages": [{"role": "user", "content": "Weather in Oslo?"}], "tools": [WEATHER_TOOL]}
+        stubber.add_response("converse", {
+            "output": {"message": {"role": "assistant", "content": [
+                {"toolUse": {"toolUseId": "tooluse_1", "name": "get_weather", "input": {"city": "Oslo"}}},
+            ]}},
+            "stopReason": "tool_use",
+            "usage": {"inputTokens": 30, "outputTokens": 12, "totalTokens": 42},
+            "metrics": {"latencyMs": 200},
+        }, converse.to_converse(payload, MODEL))
+        result = converse.converse(client, payload, MODEL)
+        choice = result["choices"][0]
+        assert choice["finish_reason"] == "tool_calls"
+        assert choice["message"]["content"] is None
+        call = choice["message"]["tool_calls"][0]
+        assert call["id"] == "tooluse_1"
+        assert json.loads(call["function"]["arguments"]) == {"city": "Oslo"}
+    
+    def test_cached_prompt_tokens_are_counted(self):
+        result = converse.openai_usage({
+            "inputTokens": 100, "outputTokens": 20, "totalTokens": 1620,
+            "cacheReadInputTokens": 1000, "cacheWriteInputTokens": 500,
+        })
+        assert result["prompt_tokens"] == 1600
+        assert result["total_tokens"] == 1620
+        assert result["prompt_tokens_details"] == {"cached_tokens": 1000}
+        assert result["cache_creation_input_tokens"] == 500
+    
+    def test_client_error(self, stubbed):
+        client, stubber = stubbed
+        stubber.add_client_error(
+            "converse", service_error_code="ThrottlingException",
+            service_message="Too many requests", http_status_code=429,
+        )
+        with pytest.raises(Exception) as excinfo:
+            converse.converse(client, {"messages": [{"role": "user", "content": "hi"}]}, MODEL)
+        body, status = converse.error_response(excinfo.value)
+        assert status == 429
+        assert body["error"]["type"] == "ThrottlingException"
+
+
+class TestStreamChunks:
+    """Test ConverseStream event mapping"""
+    
+    EVENTS = [
+        {"messageStart": {"role": "assistant"}},
+        {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": "Let me "}}},
+        {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": "check."}}},
+        {"contentBlockStop": {"contentBlockIndex": 0}},
+        {"contentBlockStart": {"contentBlockIndex": 1, "start": {"toolUse": {"toolUseId": "tooluse_1", "name": "get_weather"}}}},
+        {"contentBlockDelta": {"contentBlockIndex": 1, "delta": {"toolUse": {"input": "{\"city\": "}}}},
+        {"contentBlockDelta": {"contentBlockIndex": 1, "delta": {"toolUse": {"input": "\"Oslo\"}"}}}},
+        {"contentBlockStop": {"contentBlockIndex": 1}},
+        {"messageStop": {"stopReason": "tool_use"}},
+        {"metadata": {"usage": {"inputTokens": 30, "outputTokens": 12, "totalTokens": 42}, "metrics": {"latencyMs": 200}}},
+    ]
+    
+    def test_chunks(self):
+        chunks = list(converse.stream_chunks(self.EVENTS, MODEL))
+        assert len({c["id"] for c in chunks}) == 1
+        deltas = [c["choices"][0]["delta"] for c in chunks if c["choices"]]
+        assert deltas[0] == {"role": "assistant", "content": ""}
+        assert "".join(d.get("content", "") for d in deltas) == "Let me check."
+        calls = [d["tool_calls"][0] for d in deltas if "tool_calls" in d]
+        assert calls[0]["id"] == "tooluse_1"
+        assert "".join(c["function"]["arguments"] for c in calls) == "{\"city\": \"Oslo\"}"
+        assert chunks[-2]["choices"][0]["finish_reason"] == "tool_calls"
+        assert chunks[-1]["choices"] == []
+        assert chunks[-1]["usage"]["total_tokens"] == 42
+    
+    def test_stream_error_event(self):
+        events = [{"messageStart": {"role": "assistant"}}, {"throttlingException": {"message": "slow down"}}]
+        with pytest.raises(RuntimeError):
+            list(converse.stream_chunks(events, MODEL))
+    
+    def test_closes_event_stream_when_abandoned(self):
+        class EventStream(list):
+            closed = False
+            def close(self):
+                self.closed = True
+        
+        events = EventStream(self.EVENTS)
+        chunks = converse.stream_chunks(events, MODEL)
+        next(chunks)
+        assert not events.closed
+        chunks.close()
+        assert events.closed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.dnsc module"""
+
+import pytest
+import http.server
+import socket
+import threading
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import dnsc
+
+import requests
+
+
+def loopback(port):
+    return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("127.0.0.1", port))]
+
+
+def counting_lookup(calls, ttl=None, port_override=None):
+    def lookup(host, port):
+        calls.append((host, port))
+        return loopback(port_override or port), ttl
+    return lookup
+
+
+@pytest.fixture
+def http_server():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def do_GET(self):
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args):
+            pass
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class TestDnsCache:
+    """Test caching, expiry and refresh"""
+    
+    def test_second_lookup_is_a_hit(self):
+        calls = []
+        cache = dnsc.DnsCache(lookup=counting_lookup(calls))
+        cache.resolve("api.groq.com", 443)
+        cache.resolve("api.groq.com", 443)
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert "api.groq.com:443" in stats["hosts"]
+    
+    def test_ttl_is_clamped_and_expires(self):
+        calls = []
+        cache = dnsc.DnsCache(min_ttl=0, max_ttl=0.05, lookup=counting_lookup(calls, ttl=3600))
+        cache.resolve("api.groq.com", 443)
+        assert cache.entries[("api.groq.com", 443)]["ttl"] == 0.05
+        time.sleep(0.06)
+        cache.resolve("api.groq.com", 443)
+        assert len(calls) == 2
+    
+    def test_refresh_renews_entries_near_expiry(self):
+        calls = []
+        cache = dnsc.DnsCache(min_ttl=0, lookup=counting_lookup(calls, ttl=0.01))
+        cache.resolve("api.groq.com", 443)
+        time.sleep(0.02)
+        assert cache.refresh() == 1
+        assert len(calls) == 2
+    
+    def test_serves_stale_when_lookup_fails(self):
+        state = {"fail": False}
+        def lookup(host, port):
+            if state["fail"]:
+                raise socket.gaierror("resolver down")
+            return loopback(port), 0
+        cache = dnsc.DnsCache(min_ttl=0, lookup=lookup)
+        first = cache.resolve("api.groq.com", 443)
+        state["fail"] = True
+        assert cache.resolve("api.groq.com", 443) == first
+        assert cache.stats()["stale"] == 1
+    
+    def test_unknown_host_raises(self):
+        def lookup(host, port):
+            raise socket.gaierror("no such host")
+        cache = dnsc.DnsCache(lookup=lookup)
+        with pytest.raises(socket.gaierror):
+            cache.resolve("nowhere.invalid", 443)
+
+
+class TestHappyEyeballs:
+    """Test multi-address connects"""
+    
+    def test_interleaves_families(self):
+        v6 = (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", 1, 0, 0))
+        v4 = (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 1))
+        assert dnsc.interleave([v6, v6, v4]) == [v6, v4, v6]
+    
+    def test_skips_refused_address(self, http_server):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        dead_port = closed.getsockname()[1]
+        closed.close()
+        sock = dnsc.happy_eyeballs(loopback(dead_port) + loopback(http_server), timeout=2)
+        try:
+            assert sock.getpeername()[1] == http_server
+        finally:
+            sock.close()
+    
+    def test_all_refused_raises(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        dead_port = closed.getsockname()[1]
+        closed.close()
+        with pytest.raises(OSError):
+            dnsc.happy_eyeballs(loopback(dead_port), timeout=2)
+
+
+class TestCachedDnsAdapter:
+    """Test the requests integration"""
+    
+    def test_session_resolves_through_cache(self, http_server):
+        calls = []
+        cache = dnsc.DnsCache(lookup=counting_lookup(calls, port_override=http_server))
+        session = requests.Session()
+        session.mount("http://", dnsc.CachedDnsAdapter(cache))
+        for _ in range(2):
+            response = session.get(f"http://upstream.test:{http_server}/", timeout=2)
+            assert response.json() == {"ok": True}
+        assert calls == [("upstream.test", http_server)]
+    
+    def test_resolution_failure_is_a_connection_error(self):
+        def lookup(host, port):
+            raise socket.gaierror("no such host")
+        session = requests.Session()
+        session.mount("http://", dnsc.CachedDnsAdapter(dnsc.DnsCache(lookup=lookup)))
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get("http://nowhere.invalid/", timeout=2)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
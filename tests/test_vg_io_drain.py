@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.drain module"""
+
+import pytest
+import os
+import socket
+from unittest.mock import patch
+
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from vg_io import drain
+
+import fastapi
+from fastapi.testclient import TestClient
+
+
+def make_app(state):
+    app = fastapi.FastAPI()
+    app.add_middleware(drain.DrainMiddleware, state=state)
+
+    @app.get("/inflight")
+    async def inflight():
+        return {"inflight": state.inflight}
+
+    return TestClient(app)
+
+
+class TestDrainMiddleware:
+    """Test in-flight tracking and connection close while draining"""
+    
+    def test_counts_inflight(self):
+        state = drain.DrainState()
+        client = make_app(state)
+        assert client.get("/inflight").json() == {"inflight": 1}
+        assert state.inflight == 0
+    
+    def test_keeps_connections_open_normally(self):
+        client = make_app(drain.DrainState())
+        assert client.get("/inflight").headers.get("connection") != "close"
+    
+    def test_closes_connections_while_draining(self):
+        state = drain.DrainState()
+        state.begin()
+        client = make_app(state)
+        response = client.get("/inflight")
+        assert response.status_code == 200
+        assert response.headers["connection"] == "close"
+        assert state.status()["draining"]
+
+
+class TestListenerHandoff:
+    """Test socket creation, inheritance and successor spawning"""
+    
+    def test_binds_fresh_socket(self):
+        sock = drain.listen_socket("127.0.0.1", 0)
+        try:
+            assert sock.getsockname()[1] > 0
+        finally:
+            sock.close()
+    
+    def test_inherits_socket_from_env(self):
+        parent = drain.listen_socket("127.0.0.1", 0)
+        port = parent.getsockname()[1]
+        fd = os.dup(parent.fileno())
+        with patch.dict(os.environ, {drain.LISTEN_FD_ENV: str(fd)}):
+            sock = drain.listen_socket("127.0.0.1", 12345)
+            assert drain.LISTEN_FD_ENV not in os.environ
+        try:
+            assert sock.getsockname()[1] == port
+        finally:
+            sock.close()
+            parent.close()
+    
+    def test_spawn_successor_passes_fd(self):
+        sock = drain.listen_socket("127.0.0.1", 0)
+        try:
+            with patch("subprocess.Popen") as mock_popen:
+                drain.spawn_successor(sock, ["vanity-gateway.py", "-p", "8443"])
+            args, kwargs = mock_popen.call_args
+            assert args[0][1:] == ["vanity-gateway.py", "-p", "8443"]
+            assert kwargs["env"][drain.LISTEN_FD_ENV] == str(sock.fileno())
+            ready_w = int(kwargs["env"][drain.READY_FD_ENV])
+            assert kwargs["pass_fds"] == (sock.fileno(), ready_w)
+            os.close(mock_popen.return_value.ready_fd)
+        finally:
+            sock.close()
+    
+    def run_successor(self, code, timeout=10):
+        sock = drain.listen_socket("127.0.0.1", 0)
+        try:
+            successor = drain.spawn_successor(sock, ["-c", code])
+            ready = drain.wait_ready(successor, timeout)
+            successor.wait(10)
+            return ready
+        finally:
+            sock.close()
+    
+    def test_waits_for_successor_ready(self):
+        code = "import sys; sys.path.insert(0, %r); from vg_io import drain; drain.notify_ready()" % ROOT
+        assert self.run_successor(code)
+    
+    def test_successor_exiting_early_is_not_ready(self):
+        assert not self.run_successor("raise SystemExit(3)")
+    
+    def test_successor_timing_out_is_not_ready(self):
+        assert not self.run_successor("import time; time.sleep(0.5)", timeout=0.1)
+    
+    def test_notify_without_predecessor(self):
+        with patch.dict(os.environ, clear=False):
+            os.environ.pop(drain.READY_FD_ENV, None)
+            assert not drain.notify_ready()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.keys module"""
+
+import pytest
+import json
+import os
+import time
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import keys
+
+
+def write_callers(path, callers):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"callers": callers}, f)
+
+
+class TestLookup:
+    """Test key lookup"""
+    
+    def test_static_key_is_found(self):
+        store = keys.KeyStore(static={"test": {"key": "secret"}})
+        caller = store.lookup("secret")
+        assert caller.name == "test"
+        assert caller.nicknames is None
+    
+    def test_unknown_key_is_rejected(self):
+        store = keys.KeyStore(static={"test": {"key": "secret"}})
+        assert store.lookup("wrong") is None
+        assert store.lookup("") is None
+        assert store.lookup(None) is None
+    
+    def test_loads_hashed_keys_from_file(self, tmp_path):
+        path = tmp_path / "callers.json"
+        write_callers(path, {"team-a": {"key_sha256": keys.hash_key("a-key"), "nicknames": ["groq-llama8"]}})
+        store = keys.KeyStore(str(path))
+        caller = store.lookup("a-key")
+        assert caller.name == "team-a"
+        assert caller.nicknames == frozenset(["groq-llama8"])
+    
+    def test_hot_reload_picks_up_new_keys(self, tmp_path):
+        path = tmp_path / "callers.json"
+        write_callers(path, {"team-a": {"key_sha256": keys.hash_key("a-key")}})
+        store = keys.KeyStore(str(path), reload_interval=0)
+        write_callers(path, {"team-b": {"key_sha256": keys.hash_key("b-key")}})
+        os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+        assert store.maybe_reload()
+        assert store.lookup("a-key") is None
+        assert store.lookup("b-key").name == "team-b"
+    
+    def test_broken_file_keeps_previous_index(self, tmp_path):
+        path = tmp_path / "callers.json"
+        write_callers(path, {"team-a": {"key_sha256": keys.hash_key("a-key")}})
+        store = keys.KeyStore(str(path))
+        path.write_text("{not json")
+        assert not store.load()
+        assert store.lookup("a-key").name == "team-a"
+    
+    @pytest.mark.parametrize("callers", [
+        {"team-b": {"nicknames": ["groq-llama8"]}},
+        {"team-b": None},
+        None,
+        {"team-b": {"key": "b-key"}, "team-c": {"key_sha256": keys.hash_key("b-key")}},
+    ])
+    def test_bad_entries_keep_previous_index(self, tmp_path, callers):
+        path = tmp_path / "callers.json"
+        write_callers(path, {"team-a": {"key_sha256": keys.hash_key("a-key")}})
+        store = keys.KeyStore(str(path))
+        write_callers(path, callers)
+        assert not store.load()
+        assert store.lookup("a-key").name == "team-a"
+        assert store.lookup("b-key") is None
+    
+    def test_bad_file_at_startup_keeps_static_callers(self, tmp_path):
+        path = tmp_path / "callers.json"
+        write_callers(path, {"team-b": {"nicknames": ["groq-llama8"]}})
+        store = keys.KeyStore(str(path), static={"test": {"key": "tk", "admin": True}})
+        assert store.lookup("tk").name == "test"
+    
+    def test_duplicate_static_key_is_rejected(self):
+        store = keys.KeyStore(static={"one": {"key": "secret"}, "two": {"key": "secret"}})
+        assert store.lookup("secret") is None
+
+
+class TestAdmit:
+    """Test nickname access and limits"""
+    
+    def test_rejects_disallowed_nickname(self):
+        store = keys.KeyStore(static={"a": {"key": "k", "nicknames": ["groq-llama8"]}})
+        caller = store.lookup("k")
+        assert store.admit(caller, "groq-llama8") is None
+        assert store.admit(caller, "aws-claude-opus")[0] == 403
+        assert keys.allows(caller, "groq-llama8")
+        assert not keys.allows(caller, "aws-claude-opus")
+        assert keys.allows(keys.make_caller("b", {"key": "k2"}), "aws-claude-opus")
+    
+    def test_concurrency_cap_and_release(self):
+        store = keys.KeyStore(static={"a": {"key": "k", "max_concurrency": 1}})
+        caller = store.lookup("k")
+        assert store.admit(caller, "x") is None
+        status, detail, headers = store.admit(caller, "x")
+        assert (status, headers) == (429, {"Retry-After": "1"})
+        store.release(caller)
+        assert store.admit(caller, "x") is None
+    
+    def test_requests_per_minute(self):
+        store = keys.KeyStore(static={"a": {"key": "k", "requests_per_minute": 2}})
+        caller = store.lookup("k")
+        for _ in range(2):
+            assert store.admit(caller, "x") is None
+            store.release(caller)
+        status, detail, headers = store.admit(caller, "x")
+        assert status == 429
+        assert 1 <= int(headers["Retry-After"]) <= 60
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -233,5 +233,64 @@ class TestParseResponse:
         assert content == "Builder failed"
 
 
+
+class TestModelCache:
+    """Test reuse of ChatOpenAI instances"""
+    
+    def make_cfg(self, key="test-key"):
+        return types.SimpleNamespace(
+            projectConfig=types.SimpleNamespace(gateway_url="https://test.api/v1"),
+            secret_k=key
+        )
+    
+    def builder(self, cfg, model="gpt-4o", temperature=0.7):
+        return {"messages": [{"role": "user", "content": "hi"}], "model": model, "temperature": temperature}, False
+    
+    def test_reuses_instance_for_same_settings(self):
+        with patch("vg_io.oai.ChatOpenAI") as mock_chat:
+            mock_chat.return_value.invoke.return_value = MagicMock(content="ok", response_metadata={})
+            for _ in range(3):
+                result, err = oai.get_response(self.make_cfg(), self.builder)
+                assert not err
+            assert mock_chat.call_count == 1
+            assert mock_chat.return_value.invoke.call_count == 3
+    
+    def test_new_instance_per_model_key_and_sampling(self):
+        with patch("vg_io.oai.ChatOpenAI") as mock_chat:
+            mock_chat.return_value.invoke.return_value = MagicMock(content="ok", response_metadata={})
+            oai.get_response(self.make_cfg(), self.builder)
+            oai.get_response(self.make_cfg(), self.builder, "gpt-4o-mini")
+            oai.get_response(self.make_cfg(), self.builder, "gpt-4o", 0.2)
+            oai.get_response(self.make_cfg("other-key"), self.builder)
+            assert mock_chat.call_count == 4
+    
+    def test_lru_is_bounded(self):
+        cache = oai.rqs.LRUCache(2)
+        made = []
+        for key in ["a", "b", "a", "c", "b"]:
+            cache.get(key, lambda: made.append(key) or key)
+        assert made == ["a", "b", "c", "b"]
+        assert len(cache) == 2
+
+
+class TestParseResponseMany:
+    """Test thread-pool batches for langchain_openai"""
+    
+    def test_runs_each_args_in_order(self):
+        calls = []
+        def fake_parse(cfg, payload_builder, text, verify=True):
+            calls.append(text)
+            return text.upper(), False
+        with patch("vg_io.oai.parse_response", side_effect=fake_parse):
+            results = oai.parse_response_many(Mock(), Mock(), ["a", "b", "c"], max_workers=2)
+        assert results == [("A", False), ("B", False), ("C", False)]
+        assert sorted(calls) == ["a", "b", "c"]
+    
+    def test_exceptions_become_errors(self):
+        with patch("vg_io.oai.get_response", side_effect=RuntimeError("down")):
+            results = oai.get_response_many(Mock(), Mock(), [("a",)])
+        assert results == [("Error: down", True)]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
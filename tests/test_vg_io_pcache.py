@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.pcache module"""
+
+import pytest
+import copy
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import pcache, converse
+
+import boto3
+from botocore.stub import Stubber
+
+MODEL = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+SYSTEM = "You are a meticulous assistant. " * 200
+TOOL = {"type": "function", "function": {"name": "search", "description": "d" * 5000, "parameters": {"type": "object"}}}
+
+
+def request(*turns, tools=False):
+    messages = [{"role": "system", "content": SYSTEM}]
+    for i, text in enumerate(turns):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": text})
+    payload = {"messages": messages}
+    if tools:
+        payload["tools"] = [TOOL]
+    return converse.to_converse(payload, MODEL)
+
+def points(req):
+    found = []
+    if any("cachePoint" in b for b in (req.get("toolConfig") or {}).get("tools", [])):
+        found.append("tools")
+    if any("cachePoint" in b for b in req.get("system", [])):
+        found.append("system")
+    for i, msg in enumerate(req["messages"]):
+        if any("cachePoint" in b for b in msg["content"]):
+            found.append(i)
+    return found
+
+
+class TestPrefixTracker:
+    """Test cache point placement"""
+    
+    def test_first_request_has_no_points(self):
+        tracker = pcache.PrefixTracker()
+        req = request("Hello")
+        assert tracker.place(req, "team-a") == 0
+        assert points(req) == []
+    
+    def test_repeated_system_prompt(self):
+        tracker = pcache.PrefixTracker()
+        tracker.place(request("Hello"), "team-a", now=0)
+        req = request("Something else")
+        assert tracker.place(req, "team-a", now=1) == 1
+        assert points(req) == ["system"]
+    
+    def test_growing_history(self):
+        tracker = pcache.PrefixTracker()
+        long_turn = "x" * 8000
+        tracker.place(request(long_turn), "team-a", now=0)
+        req = request(long_turn, "answer", "follow-up")
+        tracker.place(req, "team-a", now=1)
+        assert points(req) == ["system", 0]
+    
+    def test_tools(self):
+        tracker = pcache.PrefixTracker()
+        tracker.place(request("a", tools=True), "team-a", now=0)
+        req = request("b", tools=True)
+        tracker.place(req, "team-a", now=1)
+        assert points(req) == ["tools", "system"]
+    
+    def test_scoped_per_caller_and_expiring(self):
+        tracker = pcache.PrefixTracker(ttl=300)
+        tracker.place(request("Hello"), "team-a", now=0)
+        req = request("Hello")
+        assert tracker.place(req, "team-b", now=1) == 0
+        assert tracker.place(request("Hello"), "team-a", now=1000) == 0
+    
+    def test_short_prefixes_are_not_cached(self):
+        tracker = pcache.PrefixTracker()
+        short = converse.to_converse({"messages": [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "hi"}]}, MODEL)
+        tracker.place(copy.deepcopy(short), "team-a", now=0)
+        assert tracker.place(short, "team-a", now=1) == 0
+    
+    def test_bounded(self):
+        tracker = pcache.PrefixTracker(capacity=3)
+        for i in range(5):
+            tracker.place(request(f"turn {i}"), "team-a")
+        assert len(tracker.seen) == 3
+    
+    def test_points_are_valid_converse_input(self):
+        tracker = pcache.PrefixTracker()
+        tracker.place(request("a", "b", "c", tools=True), "team-a", now=0)
+        req = request("a", "b", "c", tools=True)
+        tracker.place(req, "team-a", now=1)
+        assert points(req)
+        client = boto3.client("bedrock-runtime", region_name="us-east-1", aws_access_key_id="testing", aws_secret_access_key="testing")
+        with Stubber(client) as stubber:
+            stubber.add_response("converse", {
+                "output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}},
+                "stopReason": "end_turn",
+                "usage": {"inputTokens": 10, "outputTokens": 1, "totalTokens": 2011,
+                          "cacheReadInputTokens": 2000, "cacheWriteInputTokens": 0},
+                "metrics": {"latencyMs": 10},
+            }, req)
+            result = converse.converse(client, {}, MODEL, req)
+        assert result["usage"]["cache_read_input_tokens"] == 2000
+        assert result["usage"]["prompt_tokens_details"] == {"cached_tokens": 2000}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
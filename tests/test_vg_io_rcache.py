@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.rcache module"""
+
+import pytest
+import types
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import rcache
+
+
+def completion(text):
+    return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+
+
+class TestRequestKey:
+    """Test canonical request keys"""
+    
+    def test_key_ignores_field_order(self):
+        a = rcache.request_key("https://gw/chat", "groq", {"messages": [], "temperature": 0.5})
+        b = rcache.request_key("https://gw/chat", "groq", {"temperature": 0.5, "messages": []})
+        assert a == b
+    
+    def test_key_depends_on_nickname_url_and_payload(self):
+        base = rcache.request_key("https://gw/chat", "groq", {"messages": []})
+        assert base != rcache.request_key("https://gw/chat", "aws", {"messages": []})
+        assert base != rcache.request_key("https://other/chat", "groq", {"messages": []})
+        assert base != rcache.request_key("https://gw/chat", "groq", {"messages": [], "n": 2})
+
+
+class TestResponseCache:
+    """Test storage, LRU eviction and stats"""
+    
+    def test_hit_and_miss(self, tmp_path):
+        cache = rcache.ResponseCache(str(tmp_path / "r.sqlite"))
+        assert cache.get("k") is None
+        cache.put("k", completion("hi"))
+        assert cache.get("k") == completion("hi")
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 0.5
+    
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "r.sqlite")
+        first = rcache.ResponseCache(path)
+        first.put("k", completion("hi"))
+        first.close()
+        second = rcache.ResponseCache(path)
+        assert second.get("k") == completion("hi")
+        assert second.stats()["bytes"] > 0
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        size = len(rcache.json.dumps(completion("a"), separators=(",", ":")))
+        cache = rcache.ResponseCache(str(tmp_path / "r.sqlite"), max_bytes=size * 2)
+        cache.put("a", completion("a"))
+        cache.put("b", completion("b"))
+        cache.get("a")
+        cache.put("c", completion("c"))
+        assert cache.get("b") is None
+        assert cache.get("a") == completion("a")
+        assert cache.get("c") == completion("c")
+        assert cache.stats()["bytes"] <= size * 2
+    
+    def test_eviction_reads_only_the_oldest_rows(self, tmp_path):
+        size = len(rcache.json.dumps(completion("000"), separators=(",", ":")))
+        cache = rcache.ResponseCache(str(tmp_path / "r.sqlite"), max_bytes=size * 200)
+        for i in range(200):
+            cache.put(f"k{i}", completion(f"{i:03d}"))
+        statements = []
+        cache.con.set_trace_callback(statements.append)
+        cache.put("new", completion("new"))
+        cache.con.set_trace_callback(None)
+        selects = [sql for sql in statements if sql.startswith("SELECT key, size")]
+        assert selects and all("LIMIT" in sql for sql in selects)
+        assert cache.stats()["entries"] == 200
+        assert cache.get("k0") is None
+        assert cache.get("k1") is not None
+    
+    def test_replacing_entry_keeps_size(self, tmp_path):
+        cache = rcache.ResponseCache(str(tmp_path / "r.sqlite"))
+        cache.put("k", completion("a"))
+        before = cache.stats()["bytes"]
+        cache.put("k", completion("b"))
+        assert cache.stats()["bytes"] == before
+        assert cache.stats()["entries"] == 1
+    
+    def test_skips_oversized_entries(self, tmp_path):
+        cache = rcache.ResponseCache(str(tmp_path / "r.sqlite"), max_bytes=10)
+        cache.put("k", completion("too large"))
+        assert cache.get("k") is None
+
+
+class TestCacheFor:
+    """Test enabling the cache from client config"""
+    
+    def test_disabled_without_config(self):
+        cfg = types.SimpleNamespace(projectConfig=types.SimpleNamespace())
+        assert rcache.cache_for(cfg) is None
+        cfg.projectConfig.cache = types.SimpleNamespace(path="x.sqlite", enabled=False)
+        assert rcache.cache_for(cfg) is None
+    
+    def test_shared_per_path(self, tmp_path):
+        options = types.SimpleNamespace(path=str(tmp_path / "r.sqlite"), max_mb=1)
+        cfg = types.SimpleNamespace(projectConfig=types.SimpleNamespace(cache=options))
+        cache = rcache.cache_for(cfg)
+        assert cache is rcache.cache_for(cfg)
+        assert cache.max_bytes == 1024 * 1024
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
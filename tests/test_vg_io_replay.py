@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.replay module"""
+
+import pytest
+import asyncio
+import http.server
+import json
+import threading
+import time
+import types
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import replay
+
+PAYLOAD = {"model": "llama-3.1-8b-instant", "messages": [{"role": "user", "content": "Hello"}]}
+ANSWER = {"choices": [{"index": 0, "message": {"role": "assistant", "content": "Hi"}, "finish_reason": "stop"}]}
+CHUNKS = [{"choices": [{"index": 0, "delta": {"content": "H"}}]}, {"choices": [{"index": 0, "delta": {"content": "i"}}]}]
+
+
+def capture(path):
+    recorder = replay.Recorder(str(path))
+    recorder.record("groq-llama8", PAYLOAD, 200, response=ANSWER, latency_ms=250)
+    list(recorder.capture_stream("groq-llama8", dict(PAYLOAD, stream=True), iter(CHUNKS), time.monotonic()))
+    recorder.flush()
+    return recorder
+
+
+class TestRequestKey:
+    """Test request matching keys"""
+    
+    def test_model_is_ignored(self):
+        assert replay.request_key(PAYLOAD) == replay.request_key(dict(PAYLOAD, model="other"))
+    
+    def test_stream_and_content_matter(self):
+        assert replay.request_key(PAYLOAD) != replay.request_key(dict(PAYLOAD, stream=True))
+        assert replay.request_key(PAYLOAD) != replay.request_key(dict(PAYLOAD, temperature=0.1))
+
+
+class TestRecorder:
+    """Test capture to the append-only log"""
+    
+    def test_records_and_appends(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        capture(path)
+        rows = replay.read_log(str(path))
+        assert len(rows) == 4
+        assert rows[0]["response"] == ANSWER
+        assert [chunk for _, chunk in rows[1]["chunks"]] == CHUNKS
+        assert all(delay >= 0 for delay, _ in rows[1]["chunks"])
+    
+    def test_client_disconnect_is_flagged(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        recorder = replay.Recorder(str(path))
+        stream = recorder.capture_stream("groq-llama8", dict(PAYLOAD, stream=True), iter(CHUNKS), time.monotonic())
+        next(stream)
+        stream.close()
+        recorder.flush()
+        row = replay.read_log(str(path))[0]
+        assert row["status"] == replay.DISCONNECTED_STATUS
+        assert row["disconnected"]
+        assert len(row["chunks"]) == 1
+    
+    def test_disabled_without_path(self):
+        recorder = replay.Recorder()
+        assert not recorder.wants("groq-llama8")
+        assert replay.Recorder("x.jsonl", nicknames=["a"]).wants("a")
+        assert not replay.Recorder("x.jsonl", nicknames=["a"]).wants("b")
+
+
+class TestReplayer:
+    """Test serving captured exchanges"""
+    
+    def test_matches_request(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        provider = types.SimpleNamespace(api="replay", path=str(path), speed=0)
+        content, status = asyncio.run(replay.Replayer().forward(provider, dict(PAYLOAD, model="x")))
+        assert (content, status) == (ANSWER, 200)
+        chunks, status = asyncio.run(replay.Replayer().forward(provider, dict(PAYLOAD, stream=True)))
+        assert list(chunks) == CHUNKS
+    
+    def test_fallback_and_miss(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        replayer = replay.Replayer()
+        other = {"messages": [{"role": "user", "content": "Something else"}]}
+        assert replayer.pick(str(path), other)["response"] == ANSWER
+        assert replayer.pick(str(path), other, fallback=False) is None
+        assert replayer.pick(str(path), PAYLOAD, nickname="groq-gpt-20b") is None
+    
+    def test_disconnected_streams_are_not_replayed(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        recorder = replay.Recorder(str(path))
+        stream = recorder.capture_stream("groq-llama8", dict(PAYLOAD, stream=True), iter(CHUNKS), time.monotonic())
+        next(stream)
+        stream.close()
+        recorder.flush()
+        provider = types.SimpleNamespace(api="replay", path=str(path), speed=0)
+        content, status = asyncio.run(replay.Replayer().forward(provider, dict(PAYLOAD, stream=True)))
+        assert status == 404
+    
+    def test_log_is_indexed_off_the_loop(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        replayer = replay.Replayer()
+        threads = []
+        index = replayer.index
+        
+        def spy(*args):
+            threads.append(threading.get_ident())
+            return index(*args)
+        
+        replayer.index = spy
+        provider = types.SimpleNamespace(api="replay", path=str(path), speed=0)
+        assert asyncio.run(replayer.forward(provider, PAYLOAD)) == (ANSWER, 200)
+        assert threads and threads[0] != threading.get_ident()
+    
+    def test_scaled_timing(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        provider = types.SimpleNamespace(api="replay", path=str(path), speed=5)
+        started = time.monotonic()
+        asyncio.run(replay.Replayer().forward(provider, PAYLOAD))
+        assert 0.04 <= time.monotonic() - started < 0.25
+
+
+class TestDrive:
+    """Test the load driver against a local stand-in gateway"""
+    
+    def test_drive(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        capture(path)
+        seen = []
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                seen.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+            def log_message(self, *args):
+                pass
+        
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            report = replay.drive(str(path), f"http://127.0.0.1:{server.server_address[1]}", "key", speed=0)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert report["requests"] == 2
+        assert report["statuses"] == {"200": 2}
+        assert all(p.startswith("/chat/completions?nickname=groq-llama8") for p, _ in seen)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.reslv module"""
+
+import pytest
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import reslv
+
+COCONUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "coconuts", "TestA.md")
+
+
+class TestReSolve:
+    """Test include and variable resolution"""
+    
+    def test_coconuts(self):
+        some_str = "\nAND ALSO STRINGS!!!"
+        assert reslv.re_solve(COCONUTS) == "I've got a lovely bunch of coconuts.\nAND ALSO STRINGS!!!"
+    
+    def test_explicit_context_and_missing_vars(self):
+        text = 'a {{{var_str:"x"}}} b {{{var_str:"missing"}}} c {{{var_str:"x"}}}'
+        assert reslv.re_solve(text, {"x": 1}) == 'a 1 b {{{var_str:"missing"}}} c 1'
+    
+    def test_substituted_values_are_not_rescanned(self):
+        text = '{{{var_str:"a"}}}|{{{var_str:"b"}}}'
+        context = {"a": '{{{var_str:"b"}}}', "b": '{{{path:"/etc/passwd"}}}'}
+        assert reslv.re_solve(text, context) == '{{{var_str:"b"}}}|{{{path:"/etc/passwd"}}}'
+    
+    def test_includes_are_relative_and_repeatable(self, tmp_path):
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "leaf.md").write_text('leaf={{{var_str:"name"}}}')
+        (tmp_path / "mid.md").write_text('[{{{path:"sub/leaf.md"}}}]')
+        (tmp_path / "top.md").write_text('{{{path:"mid.md"}}} {{{path:"mid.md"}}}')
+        assert reslv.re_solve(str(tmp_path / "top.md"), {"name": "n"}) == "[leaf=n] [leaf=n]"
+    
+    def test_missing_include_shows_error(self, tmp_path):
+        (tmp_path / "top.md").write_text('x {{{path:"nope.md"}}} y')
+        result = reslv.re_solve(str(tmp_path / "top.md"), {})
+        assert result.startswith("x Error: File ")
+        assert result.endswith("nope.md not found. y")
+    
+    def test_circular_include(self, tmp_path):
+        (tmp_path / "a.md").write_text('{{{path:"b.md"}}}')
+        (tmp_path / "b.md").write_text('{{{path:"a.md"}}}')
+        assert reslv.re_solve(str(tmp_path / "a.md"), {}).startswith("Resolution Error: Circular dependency detected")
+
+
+class TestTemplate:
+    """Test compiled templates"""
+    
+    def test_segments(self):
+        template = reslv.compile_template('Hi {{{var_str:"name"}}}!\n')
+        kinds = [kind for kind, value, raw_tag in template.segments]
+        assert kinds == [reslv.LITERAL, reslv.VAR, reslv.LITERAL]
+    
+    def test_render_many_contexts(self):
+        text = "\n".join(f'{i}={{{{{{var_str:"v{i}"}}}}}}' for i in range(300))
+        template = reslv.compile_template(text)
+        for n in range(3):
+            context = {f"v{i}": i * n for i in range(300)}
+            assert template.render(context) == "\n".join(f"{i}={i * n}" for i in range(300))
+
+
+
+def bump(path, text):
+    path.write_text(text)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+
+
+class TestTemplateCache:
+    """Test reuse and invalidation of compiled templates"""
+    
+    @pytest.fixture
+    def tree(self, tmp_path):
+        (tmp_path / "leaf.md").write_text('leaf {{{var_str:"x"}}}')
+        (tmp_path / "top.md").write_text('top [{{{path:"leaf.md"}}}]')
+        return tmp_path
+    
+    def test_reuses_without_io(self, tree):
+        cache = reslv.TemplateCache(check_interval=60)
+        first = cache.get(str(tree / "top.md"), now=0)
+        with patch("vg_io.reslv.os.stat", side_effect=AssertionError("stat")), \
+             patch("builtins.open", side_effect=AssertionError("open")):
+            assert cache.get(str(tree / "top.md"), now=1) is first
+        assert first.render({"x": 1}) == "top [leaf 1]"
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    
+    def test_recompiles_when_include_changes(self, tree):
+        cache = reslv.TemplateCache(check_interval=0)
+        first = cache.get(str(tree / "top.md"))
+        assert cache.get(str(tree / "top.md")) is first
+        bump(tree / "leaf.md", 'new leaf {{{var_str:"x"}}}')
+        second = cache.get(str(tree / "top.md"))
+        assert second is not first
+        assert second.render({"x": 2}) == "top [new leaf 2]"
+    
+    def test_change_seen_after_check_interval(self, tree):
+        cache = reslv.TemplateCache(check_interval=5)
+        first = cache.get(str(tree / "top.md"), now=100)
+        bump(tree / "top.md", "changed")
+        assert cache.get(str(tree / "top.md"), now=101) is first
+        assert cache.get(str(tree / "top.md"), now=106).render({}) == "changed"
+    
+    def test_missing_include_picked_up_when_created(self, tmp_path):
+        (tmp_path / "top.md").write_text('{{{path:"later.md"}}}')
+        cache = reslv.TemplateCache(check_interval=0)
+        assert "not found" in cache.get(str(tmp_path / "top.md")).render({})
+        (tmp_path / "later.md").write_text("here")
+        assert cache.get(str(tmp_path / "top.md")).render({}) == "here"
+    
+    def test_explicit_invalidation(self, tree):
+        cache = reslv.TemplateCache(check_interval=60)
+        first = cache.get(str(tree / "top.md"), now=0)
+        cache.get('raw {{{path:"%s"}}}' % (tree / "leaf.md"), now=0)
+        cache.get('unrelated {{{var_str:"x"}}}', now=0)
+        cache.invalidate(str(tree / "leaf.md"))
+        assert cache.stats()["entries"] == 1
+        assert cache.get(str(tree / "top.md"), now=1) is not first
+        cache.invalidate()
+        assert cache.stats()["entries"] == 0
+    
+    def test_lru_eviction(self, tmp_path):
+        cache = reslv.TemplateCache(capacity=2)
+        for name in ["a", "b", "a", "c"]:
+            cache.get(f'{name} {{{{{{var_str:"x"}}}}}}')
+        assert [key[2][0] for key in cache.entries] == ["a", "c"]
+    
+    def test_re_solve_sees_str2file_edit(self, tmp_path):
+        path = str(tmp_path / "note.md")
+        reslv.str2file("one X", path)
+        assert reslv.re_solve(path) == "one X"
+        reslv.str2file("two X", path)
+        assert reslv.re_solve(path) == "two X"
+    
+    def test_stats_every_get_by_default(self, tree):
+        cache = reslv.TemplateCache()
+        cache.get(str(tree / "top.md"))
+        with patch("vg_io.reslv.file_stamp", wraps=reslv.file_stamp) as stamp:
+            cache.get(str(tree / "top.md"))
+        assert stamp.called
+    
+    def test_re_solve_uses_process_cache(self, tree):
+        reslv.re_solve(str(tree / "top.md"), {"x": 1})
+        with patch("builtins.open", side_effect=AssertionError("open")):
+            assert reslv.re_solve(str(tree / "top.md"), {"x": 2}) == "top [leaf 2]"
+        reslv.invalidate(str(tree / "top.md"))
+        assert ("file", str(tree / "top.md")) not in reslv.TEMPLATES.entries
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.route module"""
+
+import pytest
+import types
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import route
+
+
+def ns(**kwargs):
+    return types.SimpleNamespace(**kwargs)
+
+PROVIDERS = ns(**{
+    "cheap": ns(api="requests", model="a", price={"input": 0.05, "output": 0.08}, context_length=8000),
+    "mid": ns(api="bedrock", model="b", price={"input": 0.5, "output": 1.5}, context_length=128000),
+    "premium": ns(api="langchain_openai", model="c", price={"input": 2.5, "output": 10.0}),
+})
+
+ROUTE = ns(api="router", targets=["premium", "mid", "cheap"], slo_p95_ms=1000, max_error_rate=0.2, max_queue=2)
+
+def messages(chars):
+    return {"messages": [{"role": "user", "content": "x" * chars}]}
+
+
+class TestRouteStats:
+    """Test the live statistics"""
+    
+    def test_ewma_and_inflight(self):
+        stats = route.RouteStats(alpha=0.5)
+        stats.start("cheap")
+        assert stats.get("cheap").inflight == 1
+        stats.observe("cheap", 100, True)
+        stats.start("cheap")
+        stats.observe("cheap", 300, False)
+        entry = stats.get("cheap")
+        assert entry.inflight == 0
+        assert entry.latency_ms == 200
+        assert entry.error_rate == 0.5
+        assert route.RouteStats.p95(entry) > entry.latency_ms
+        assert stats.snapshot()["cheap"]["samples"] == 2
+    
+    def test_no_p95_before_samples(self):
+        assert route.RouteStats.p95(route.RouteStats().get("new")) is None
+
+
+class TestRouter:
+    """Test target selection"""
+    
+    def test_prefers_cheapest(self):
+        router = route.Router(route.RouteStats())
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "cheap"
+    
+    def test_skips_targets_that_cannot_hold_the_prompt(self):
+        router = route.Router(route.RouteStats())
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(40000))[0] == "mid"
+        assert router.choose("auto", ROUTE, PROVIDERS, dict(messages(100), max_tokens=10000))[0] == "mid"
+    
+    def test_only_allowed_targets(self):
+        router = route.Router(route.RouteStats())
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100), allowed={"mid"})[0] == "mid"
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100), allowed=frozenset()) is None
+    
+    def test_skips_slow_erroring_or_busy_targets(self):
+        stats = route.RouteStats()
+        router = route.Router(stats)
+        stats.observe("cheap", 5000, True, started=False)
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "mid"
+        for _ in range(5):
+            stats.observe("mid", 200, False, started=False)
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "premium"
+        stats.start("premium")
+        stats.start("premium")
+        # Nothing is healthy: fall back to the best p95
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "mid"
+    
+    def test_excluded_target_recovers(self):
+        now = [0.0]
+        stats = route.RouteStats(half_life_s=10.0, clock=lambda: now[0])
+        router = route.Router(stats)
+        for _ in range(10):
+            stats.observe("cheap", 5000, False, started=False)
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "mid"
+        # No traffic reaches "cheap"; its stale samples age out
+        now[0] = 25.0
+        assert stats.snapshot()["cheap"]["p95_ms"] is None
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "cheap"
+        # The retry's sample replaces the stale latency instead of averaging with it
+        stats.observe("cheap", 200, True, started=False)
+        assert stats.get("cheap").latency_ms == 200
+        assert router.choose("auto", ROUTE, PROVIDERS, messages(100))[0] == "cheap"
+    
+    def test_prompt_too_large_for_all(self):
+        router = route.Router(route.RouteStats())
+        small = ns(api="router", targets=["cheap"])
+        assert router.choose("auto", small, PROVIDERS, messages(40000)) is None
+    
+    def test_plan_cached_per_version(self):
+        router = route.Router(route.RouteStats())
+        first = router.plan("auto", ROUTE, PROVIDERS, version=1)
+        assert router.plan("auto", ROUTE, PROVIDERS, version=1) is first
+        assert [target for target, _, _ in first] == ["cheap", "mid", "premium"]
+        assert router.plan("auto", ROUTE, PROVIDERS, version=2) is not first
+        assert list(router.plans) == [("auto", 2)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -205,5 +205,308 @@ class TestParseResponse:
             assert "Error parsing JSON response" in content
 
 
+
+class FakeGateway:
+    """Local HTTP stand-in for the gateway that records connections and requests."""
+    
+    def __init__(self, statuses=(), delay=0.0):
+        import http.server, threading
+        gateway = self
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.connections = set()
+        self.requests = []
+        self.sent = 0
+        self.finished = threading.Event()
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def do_POST(self):
+                gateway.connections.add(self.client_address)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                gateway.requests.append((self.path, body))
+                status = gateway.statuses.pop(0) if gateway.statuses else 200
+                status, extra = status if isinstance(status, tuple) else (status, {})
+                content = "```\n" + body["messages"][-1]["content"] + "\n```"
+                if body.get("stream") and status == 200:
+                    return self.stream(content)
+                data = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            def stream(self, content):
+                import time
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunks = [{"choices": [{"index": 0, "delta": {"content": word}}]} for word in content.split(" ")]
+                chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                chunks.append({"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": len(chunks)}})
+                try:
+                    self.wfile.write(b": keep-alive\n\n")
+                    for chunk in chunks:
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        gateway.sent += 1
+                        time.sleep(gateway.delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    gateway.finished.set()
+            def log_message(self, *args):
+                pass
+        
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chat/completions"
+    
+    def cfg(self, **project):
+        return types.SimpleNamespace(
+            projectConfig=types.SimpleNamespace(
+                gateway_url=self.url, nickname="groq-llama8",
+                parameters=types.SimpleNamespace(temperature=0.5), **project
+            ),
+            secret_k="test-key",
+        )
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def gateway():
+    fake = FakeGateway()
+    yield fake
+    fake.close()
+
+def builder(cfg, text="hi"):
+    return {"messages": [{"role": "user", "content": text}]}, False
+
+
+class TestClient:
+    """Test the pooled keep-alive client"""
+    
+    def test_connection_is_reused(self, gateway):
+        cfg = gateway.cfg()
+        with rqs.Client() as client:
+            for _ in range(3):
+                content, err = rqs.parse_response(cfg, builder, client=client)
+                assert (content, err) == ("hi", False)
+        assert len(gateway.requests) == 3
+        assert len(gateway.connections) == 1
+        path, body = gateway.requests[0]
+        assert "nickname=groq-llama8" in path
+        assert body["temperature"] == 0.5
+    
+    def test_shared_client_per_gateway(self, gateway):
+        assert rqs.client_for(gateway.url) is rqs.client_for(gateway.url.replace("/chat/completions", "/models"))
+        assert rqs.client_for(gateway.url) is not rqs.client_for(gateway.url, verify=False)
+        content, err = rqs.parse_response(gateway.cfg(), builder)
+        assert not err
+    
+    def test_retries_unavailable(self):
+        fake = FakeGateway(statuses=[(503, {"Retry-After": "0"}), (429, {"Retry-After": "0"})])
+        try:
+            with rqs.Client(retries=2, backoff=0) as client:
+                content, err = rqs.parse_response(fake.cfg(), builder, client=client)
+        finally:
+            fake.close()
+        assert (content, err) == ("hi", False)
+        assert len(fake.requests) == 3
+    
+    def test_gives_up_after_retries(self):
+        fake = FakeGateway(statuses=[(503, {"Retry-After": "0"})] * 2)
+        try:
+            with rqs.Client(retries=1, backoff=0) as client:
+                content, err = rqs.get_response(fake.cfg(), builder, client=client)
+        finally:
+            fake.close()
+        assert err
+        assert "503" in content
+    
+    def test_post_not_retried_when_upstream_may_have_run(self):
+        # 502/504 pass upstream failures through, and a bare 503 gives no promise either
+        for status in (502, 504, 503):
+            fake = FakeGateway(statuses=[status])
+            try:
+                with rqs.Client(retries=2, backoff=0) as client:
+                    content, err = rqs.get_response(fake.cfg(), builder, client=client)
+            finally:
+                fake.close()
+            assert err
+            assert str(status) in content
+            assert len(fake.requests) == 1
+    
+    def test_ssl_context_is_cached(self):
+        import certifi
+        context = rqs.ssl_context(certifi.where())
+        assert context is rqs.ssl_context(certifi.where())
+        assert rqs.ssl_context(True) is None
+        assert rqs.Client(verify=certifi.where()).adapter.context is context
+
+
+    
+    def test_response_cache(self, gateway, tmp_path):
+        cfg = gateway.cfg(cache=types.SimpleNamespace(path=str(tmp_path / "responses.sqlite")))
+        assert rqs.parse_response(cfg, builder, "same") == ("same", False)
+        assert rqs.parse_response(cfg, builder, "same") == ("same", False)
+        assert rqs.parse_response(cfg, builder, "other") == ("other", False)
+        assert rqs.parse_response(cfg, builder, "same", cache=False) == ("same", False)
+        assert len(gateway.requests) == 3
+        stats = rqs.rcache.cache_for(cfg).stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+    
+    def test_typed_cfg(self, gateway, tmp_path):
+        from vg_io import cfg as vg_cfg
+        key_file = tmp_path / "test.key"
+        key_file.write_text("test-key")
+        raw = json.dumps({"projectConfig": {
+            "gateway_url": gateway.url, "nickname": "groq-llama8", "parameters": {"temperature": 0.2},
+        }})
+        assert rqs.parse_response(vg_cfg.inline_set(raw, str(key_file)), builder) == ("hi", False)
+        path, body = gateway.requests[0]
+        assert body["temperature"] == 0.2
+
+
+class TestResponseMany:
+    """Test thread-pool batches over the shared client"""
+    
+    def test_results_in_input_order(self, gateway):
+        args_list = [(f"p{i}",) for i in range(12)]
+        results = rqs.parse_response_many(gateway.cfg(), builder, args_list, max_workers=4)
+        assert results == [(f"p{i}", False) for i in range(12)]
+    
+    def test_single_args_and_raw_responses(self, gateway):
+        results = rqs.get_response_many(gateway.cfg(), builder, ["a", "b"])
+        assert [data["choices"][0]["message"]["content"] for data, err in results] == ["```\na\n```", "```\nb\n```"]
+    
+    def test_per_item_errors(self, gateway):
+        def picky(cfg, text):
+            if text == "bad":
+                return "bad payload", True
+            if text == "boom":
+                raise RuntimeError("builder failed")
+            return builder(cfg, text)
+        results = rqs.parse_response_many(gateway.cfg(), picky, ["ok", "bad", "boom"])
+        assert results[0] == ("ok", False)
+        assert results[1] == ("bad payload", True)
+        assert results[2][1] and "builder failed" in results[2][0]
+    
+    def test_progress_callback(self, gateway):
+        seen = []
+        rqs.parse_response_many(gateway.cfg(), builder, ["a", "b", "c"], progress=lambda *call: seen.append(call))
+        assert [done for done, total, index, result in seen] == [1, 2, 3]
+        assert {total for done, total, index, result in seen} == {3}
+        assert sorted((index, result) for done, total, index, result in seen) == [
+            (0, ("a", False)), (1, ("b", False)), (2, ("c", False)),
+        ]
+    
+    def test_grows_existing_shared_pool(self, gateway):
+        cfg = gateway.cfg()
+        rqs.parse_response(cfg, builder)
+        client = rqs.client_for(gateway.url)
+        assert client.pool_size == 16
+        results = rqs.parse_response_many(cfg, builder, [(str(i),) for i in range(40)], max_workers=24)
+        assert results == [(str(i), False) for i in range(40)]
+        assert rqs.client_for(gateway.url) is client
+        assert client.pool_size == 24
+        assert client.adapter.poolmanager.connection_pool_kw["maxsize"] == 24
+        assert len(gateway.connections) <= 25
+    
+    def test_growing_the_pool_closes_the_old_one(self):
+        client = rqs.Client(pool_size=2)
+        old = client.adapter
+        with patch.object(old, "close", wraps=old.close) as closed:
+            client.ensure_pool(8)
+            client.ensure_pool(4)
+        assert closed.call_count == 1
+        assert client.adapter is not old
+        assert client.adapter.poolmanager.connection_pool_kw["maxsize"] == 8
+        client.close()
+    
+    def test_rate_limit(self, gateway):
+        import time
+        started = time.monotonic()
+        rqs.parse_response_many(gateway.cfg(), builder, ["a", "b", "c", "d"], max_workers=4, rate=20)
+        assert time.monotonic() - started >= 3 / 20
+    
+    def test_rate_limiter_spacing(self):
+        import time
+        limiter = rqs.RateLimiter(50)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        assert time.monotonic() - started >= 4 / 50
+        unlimited = rqs.RateLimiter()
+        started = time.monotonic()
+        for _ in range(100):
+            unlimited.wait()
+        assert time.monotonic() - started < 0.05
+
+
+
+class TestStreamResponse:
+    """Test incremental consumption of streamed completions"""
+    
+    def test_yields_deltas_and_assembles(self, gateway):
+        stream, err = rqs.stream_response(gateway.cfg(), builder, "one two three")
+        assert not err
+        with stream:
+            deltas = list(stream)
+        assert deltas == ["```\none", "two", "three\n```"]
+        assert gateway.requests[0][1]["stream"] is True
+        assert stream.result() == ("onetwothree", False)
+        assert stream.finish_reason == "stop"
+        assert stream.usage["prompt_tokens"] == 3
+    
+    def test_early_close_drops_connection(self):
+        fake = FakeGateway(delay=0.02)
+        try:
+            stream, err = rqs.stream_response(fake.cfg(), builder, " ".join(["word"] * 200))
+            with stream:
+                for count, delta in enumerate(stream, 1):
+                    if count == 3:
+                        break
+            assert fake.finished.wait(5)
+            assert fake.sent < 100
+            assert stream.text == "```\nwordwordword"
+        finally:
+            fake.close()
+    
+    def test_error_status(self):
+        fake = FakeGateway(statuses=[400])
+        try:
+            content, err = rqs.stream_response(fake.cfg(), builder)
+        finally:
+            fake.close()
+        assert err
+        assert "400" in content
+    
+    def test_error_event(self):
+        assembler = rqs.Assembler()
+        assert assembler.feed(b'data: {"choices": [{"index": 0, "delta": {"content": "hi"}}]}') == "hi"
+        assert assembler.feed(b'data: {"error": {"message": "upstream failed"}}') == ""
+        assert assembler.done
+        assert assembler.result() == ("Error: upstream failed", True)
+    
+    def test_ignores_other_choices_and_comments(self):
+        assembler = rqs.Assembler()
+        assert assembler.feed(b": keep-alive") == ""
+        assert assembler.feed(b"") == ""
+        assert assembler.feed(b'data: {"choices": [{"index": 1, "delta": {"content": "x"}}]}') == ""
+        assert assembler.feed(b"data: [DONE]") == ""
+        assert assembler.done
+        assert assembler.result() == ("", False)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.schema module"""
+
+import pytest
+import types
+import json
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import schema
+
+VALID = {
+    "model": "groq-llama8",
+    "messages": [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": [
+            {"type": "text", "text": "What is this?"},
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64,iVBORw=="}},
+        ]},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_1", "type": "function", "function": {"name": "look", "arguments": "{}"}},
+        ]},
+        {"role": "tool", "tool_call_id": "call_1", "content": "a cat"},
+    ],
+    "temperature": 0.2, "max_tokens": 100, "stop": ["END"], "stream": False,
+    "tools": [{"type": "function", "function": {"name": "look", "parameters": {"type": "object"}}}],
+    "tool_choice": "auto",
+    "x_custom": {"passed": "through"},
+}
+
+def with_(**fields):
+    return dict(VALID, **fields)
+
+
+class TestChatError:
+    """Test the chat completions shape"""
+    
+    def test_valid(self):
+        assert schema.chat_error(VALID) is None
+    
+    @pytest.mark.parametrize("body,error", [
+        ([], "body must be a JSON object"),
+        ({"model": "x"}, "messages is required"),
+        (with_(messages=[]), "messages must be a non-empty list"),
+        (with_(messages=[{"role": "robot", "content": "hi"}]), "messages[0] has invalid role 'robot'"),
+        (with_(messages=[{"role": "user", "content": 42}]), "messages[0] content must be a string or a list of parts"),
+        (with_(messages=[{"role": "user"}]), "messages[0] content is required"),
+        (with_(messages=[{"role": "user", "content": [{"type": "video"}]}]), "messages[0] content[0] has unsupported type 'video'"),
+        (with_(messages=[{"role": "tool", "content": "x"}]), "messages[0] tool_call_id must be a string"),
+        (with_(temperature="hot"), "temperature must be a number"),
+        (with_(temperature=3), "temperature must be between 0 and 2"),
+        (with_(max_tokens=0), "max_tokens must be at least 1"),
+        (with_(max_tokens=True), "max_tokens must be an integer"),
+        (with_(stream="yes"), "stream must be a boolean"),
+        (with_(stop=["a", "b", "c", "d", "e"]), "stop must be a string or a list of up to 4 strings"),
+        (with_(tools=[{"type": "function", "function": {}}]), "tools[0] function.name must be a string"),
+        (with_(tool_choice="sometimes"), "tool_choice must be one of ['auto', 'none', 'required']"),
+    ])
+    def test_invalid(self, body, error):
+        assert schema.chat_error(body) == error
+    
+    def test_null_optional_fields_are_allowed(self):
+        assert schema.chat_error(with_(temperature=None, stop=None)) is None
+
+
+class TestProviderError:
+    """Test per-provider capability checks"""
+    
+    def test_bedrock(self):
+        bedrock = types.SimpleNamespace(api="bedrock")
+        assert schema.provider_error(bedrock, VALID) is None
+        remote = with_(messages=[{"role": "user", "content": [{"type": "image_url", "image_url": {"url": "https://x/cat.png"}}]}])
+        assert schema.provider_error(bedrock, remote) == "Bedrock only accepts base64 data: image urls"
+        assert schema.provider_error(bedrock, with_(n=2)) == "n > 1 is not supported by Bedrock"
+    
+    def test_langchain_aws_needs_string_content(self):
+        provider = types.SimpleNamespace(api="langchain_aws")
+        assert schema.provider_error(provider, with_(messages=[{"role": "user", "content": "hi"}], tools=None)) is None
+        assert schema.provider_error(provider, VALID) == "messages[1] content must be a string for langchain_aws"
+    
+    def test_configured_capabilities(self):
+        provider = types.SimpleNamespace(api="requests", capabilities=["chat"])
+        assert schema.provider_error(provider, VALID) == "provider does not support tools"
+        provider.capabilities = ["chat", "tools"]
+        assert schema.provider_error(provider, VALID) == "provider does not accept images"
+        provider.capabilities = ["embeddings"]
+        assert "does not serve chat" in schema.provider_error(provider, VALID)
+
+
+class TestBench:
+    """Test the parse vs validate benchmark (timings are compared by running vg_io/schema.py, not here)"""
+    
+    def test_sample_bodies_are_valid(self):
+        for messages, chars in ((2, 100), (32, 2000)):
+            assert schema.chat_error(json.loads(schema.sample_body(messages, chars))) is None
+    
+    def test_reports_per_body_microseconds(self):
+        parse_us, validate_us = schema.bench(number=10)
+        assert parse_us > 0 and validate_us > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.shadow module"""
+
+import pytest
+import asyncio
+import threading
+import types
+from unittest import mock
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import shadow
+
+
+def answer(text, completion_tokens=5):
+    return {
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": completion_tokens},
+    }
+
+SHADOW = types.SimpleNamespace(target="candidate", sample=1.0, max_concurrency=2)
+
+
+class TestAdmit:
+    """Test sampling and the concurrency bound"""
+    
+    def test_sample_zero_never_mirrors(self):
+        mirror = shadow.Mirror()
+        assert not mirror.admit(types.SimpleNamespace(target="candidate", sample=0.0))
+    
+    def test_bounded_and_dropped(self):
+        mirror = shadow.Mirror()
+        assert mirror.admit(SHADOW)
+        assert mirror.admit(SHADOW)
+        assert not mirror.admit(SHADOW)
+        assert mirror.dropped == 1
+        assert mirror.inflight["candidate"] == 2
+    
+    def test_global_bound(self):
+        mirror = shadow.Mirror(max_inflight=3)
+        other = types.SimpleNamespace(target="other", sample=1.0, max_concurrency=2)
+        assert mirror.admit(SHADOW) and mirror.admit(SHADOW)
+        assert mirror.admit(other)
+        # "other" is under its own bound, but the mirror as a whole is full
+        assert not mirror.admit(other)
+        assert mirror.dropped == 1
+
+
+class TestMirror:
+    """Test background shadow calls and comparisons"""
+    
+    def test_pair_is_recorded(self):
+        mirror = shadow.Mirror()
+        
+        async def call():
+            return answer("Paris is the capital.", 7), 200
+        
+        async def go():
+            assert mirror.admit(SHADOW)
+            primary = mirror.mirror("primary", "candidate", call)
+            await asyncio.sleep(0)
+            primary.set_result((answer("Paris is the capital."), 200, 120.0))
+            await asyncio.gather(*mirror.tasks)
+        
+        asyncio.run(go())
+        row = mirror.records[-1]
+        assert row["primary_status"] == row["shadow_status"] == 200
+        assert row["similarity"] == 1.0
+        assert row["shadow_tokens"] == [10, 7]
+        summary = mirror.summary()
+        assert summary["inflight"] == 0
+        pair = summary["pairs"]["primary/candidate"]
+        assert pair["pairs"] == 1
+        assert pair["avg_primary_ms"] == 120.0
+        assert pair["shadow_completion_tokens"] == 7
+    
+    def test_similarity_runs_off_the_loop(self):
+        mirror = shadow.Mirror()
+        threads = []
+        
+        def spy(a, b):
+            threads.append(threading.get_ident())
+            return 0.5
+        
+        async def call():
+            return answer("Lyon"), 200
+        
+        async def go():
+            assert mirror.admit(SHADOW)
+            primary = mirror.mirror("primary", "candidate", call)
+            primary.set_result((answer("Paris"), 200, 50.0))
+            await asyncio.gather(*mirror.tasks)
+        
+        with mock.patch.object(shadow, "similarity", spy):
+            asyncio.run(go())
+        assert threads and threads[0] != threading.get_ident()
+        assert mirror.records[-1]["similarity"] == 0.5
+    
+    def test_shadow_failure_is_recorded(self):
+        mirror = shadow.Mirror()
+        
+        async def call():
+            raise RuntimeError("upstream down")
+        
+        async def go():
+            assert mirror.admit(SHADOW)
+            primary = mirror.mirror("primary", "candidate", call)
+            primary.set_result((answer("ok"), 200, 50.0))
+            await asyncio.gather(*mirror.tasks)
+        
+        asyncio.run(go())
+        row = mirror.records[-1]
+        assert row["shadow_status"] == 500
+        assert row["similarity"] is None
+        assert mirror.summary()["pairs"]["primary/candidate"]["shadow_errors"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+
+"""Unit tests for vg_io.usage module"""
+
+import pytest
+import asyncio
+import json
+import os
+import sqlite3
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vg_io import usage
+
+
+class TestNormalizeUsage:
+    """Test usage block normalization"""
+    
+    def test_openai_usage(self):
+        assert usage.normalize_usage({"prompt_tokens": 5, "completion_tokens": 7}) == (5, 7)
+    
+    def test_bedrock_usage(self):
+        assert usage.normalize_usage({"input_tokens": 10, "output_tokens": 20}) == (10, 20)
+    
+    def test_missing_usage(self):
+        assert usage.normalize_usage(None) == (0, 0)
+
+
+class TestUsageLog:
+    """Test recording, aggregation and persistence"""
+    
+    def test_record_updates_totals(self):
+        log = usage.UsageLog()
+        price = {"input": 1.0, "output": 2.0}
+        log.record("team-a", "groq-llama8", usage={"prompt_tokens": 1000, "completion_tokens": 500}, latency_ms=10, price=price)
+        log.record("team-a", "groq-llama8", usage={"prompt_tokens": 1000, "completion_tokens": 500}, latency_ms=30, status=502, price=price)
+        totals = log.summary("caller")["team-a"]
+        assert totals["requests"] == 2
+        assert totals["errors"] == 1
+        assert totals["total_tokens"] == 3000
+        assert totals["cost"] == pytest.approx(0.004)
+        assert totals["avg_latency_ms"] == 20
+    
+    @pytest.mark.parametrize("block", [
+        # OpenAI style: prompt_tokens includes the cached tokens
+        {"prompt_tokens": 12000, "completion_tokens": 0,
+         "cache_read_input_tokens": 10000, "cache_creation_input_tokens": 1000},
+        # Anthropic style: input_tokens leaves them out
+        {"input_tokens": 1000, "output_tokens": 0,
+         "cache_read_input_tokens": 10000, "cache_creation_input_tokens": 1000},
+    ])
+    def test_prompt_cache_tokens_are_priced(self, block):
+        log = usage.UsageLog()
+        row = log.record("team-a", "aws-claude-sonnet", usage=block, price={"input": 1.0, "output": 2.0})
+        assert row["cache_read_tokens"] == 10000
+        assert row["prompt_tokens"] == 12000
+        assert row["cost"] == pytest.approx((1000 + 10000 * 0.1 + 1000 * 1.25) / 1e6)
+        assert log.summary("caller")["team-a"]["cache_write_tokens"] == 1000
+    
+    def test_openai_cached_tokens(self):
+        row = usage.UsageLog().record("team-a", "openai-gpt4", usage={
+            "prompt_tokens": 2000, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 1500},
+        }, price={"input": 1.0, "output": 2.0})
+        assert row["cache_read_tokens"] == 1500
+        assert row["cost"] == pytest.approx((500 + 1500 * 0.1 + 10 * 2.0) / 1e6)
+    
+    def test_summary_filters_by_caller(self):
+        log = usage.UsageLog()
+        log.record("team-a", "groq-llama8")
+        log.record("team-b", "aws-nova-micro")
+        assert list(log.summary("caller,nickname", caller="team-b")) == ["team-b/aws-nova-micro"]
+        with pytest.raises(ValueError):
+            log.summary("model")
+    
+    def test_ring_buffer_drops_oldest(self, tmp_path):
+        log = usage.UsageLog(sink="jsonl", path=str(tmp_path / "usage.jsonl"), capacity=2)
+        for i in range(3):
+            log.record("team-a", f"n{i}")
+        assert log.dropped == 1
+        assert [row["nickname"] for row in log.drain()] == ["n1", "n2"]
+    
+    def test_no_sink_keeps_totals_only(self):
+        log = usage.UsageLog(capacity=2)
+        for i in range(5):
+            log.record("team-a", "groq-llama8")
+        assert log.dropped == 0
+        assert log.drain() == []
+        assert log.summary("caller")["team-a"]["requests"] == 5
+    
+    def test_jsonl_flush_and_rotation(self, tmp_path):
+        path = str(tmp_path / "usage.jsonl")
+        log = usage.UsageLog(sink="jsonl", path=path, max_bytes=1, backups=2)
+        log.record("team-a", "groq-llama8")
+        assert log.flush() == 1
+        log.record("team-a", "groq-llama8")
+        log.flush()
+        assert os.path.exists(path + ".1")
+        with open(path) as f:
+            assert json.loads(f.readline())["caller"] == "team-a"
+    
+    def test_sqlite_flush(self, tmp_path):
+        path = str(tmp_path / "usage.db")
+        log = usage.UsageLog(sink="sqlite", path=path)
+        log.record("team-a", "groq-llama8", usage={"prompt_tokens": 3, "completion_tokens": 4})
+        log.flush()
+        con = sqlite3.connect(path)
+        assert con.execute("SELECT caller, total_tokens FROM usage").fetchall() == [("team-a", 7)]
+        con.close()
+    
+    def test_sqlite_migrates_old_table(self, tmp_path):
+        path = str(tmp_path / "usage.db")
+        con = sqlite3.connect(path)
+        con.execute(f"CREATE TABLE usage ({', '.join(usage.COLUMNS[:11])})")
+        con.execute(f"INSERT INTO usage VALUES ({', '.join('?' * 11)})", (0, "old", "n", None, None, 200, 1.0, 1, 1, 2, 0.0))
+        con.commit()
+        con.close()
+        log = usage.UsageLog(sink="sqlite", path=path)
+        log.record("team-a", "aws-claude-sonnet", usage={"input_tokens": 5, "output_tokens": 1, "cache_read_input_tokens": 20})
+        log.flush()
+        con = sqlite3.connect(path)
+        rows = con.execute("SELECT caller, prompt_tokens, cache_read_tokens, cache_write_tokens FROM usage ORDER BY ts").fetchall()
+        con.close()
+        assert rows == [("old", 1, None, None), ("team-a", 25, 20, 0)]
+    
+    def test_stop_flushes_remaining(self, tmp_path):
+        path = str(tmp_path / "usage.jsonl")
+        log = usage.UsageLog(sink="jsonl", path=path, flush_interval=60)
+        
+        async def scenario():
+            log.start()
+            log.record("team-a", "groq-llama8")
+            await log.stop()
+        
+        asyncio.run(scenario())
+        assert os.path.getsize(path) > 0
+    
+    def test_failed_write_is_retried(self, tmp_path):
+        path = str(tmp_path / "usage.jsonl")
+        log = usage.UsageLog(sink="jsonl", path=path)
+        log.record("team-a", "groq-llama8")
+        with patch.object(log, "write", side_effect=OSError("disk full")):
+            assert log.flush() == 0
+        log.record("team-b", "groq-llama8")
+        assert log.flush() == 2
+        with open(path) as f:
+            assert [json.loads(line)["caller"] for line in f] == ["team-a", "team-b"]
+    
+    def test_requeue_is_bounded_by_capacity(self, tmp_path):
+        log = usage.UsageLog(sink="jsonl", path=str(tmp_path / "usage.jsonl"), capacity=3)
+        for caller in "abc":
+            log.record(caller, "groq-llama8")
+        batch = log.drain()
+        log.record("d", "groq-llama8")
+        log.record("e", "groq-llama8")
+        log.requeue(batch)
+        assert [row["caller"] for row in log.buffer] == ["c", "d", "e"]
+        assert log.dropped == 2
+    
+    def test_stop_waits_for_flush_in_progress(self, tmp_path):
+        import threading
+        log = usage.UsageLog(sink="jsonl", path=str(tmp_path / "usage.jsonl"), flush_interval=0)
+        writing, release, order = threading.Event(), threading.Event(), []
+        
+        def slow_write(batch):
+            if batch and not writing.is_set():
+                writing.set()
+                release.wait(5)
+            order.append(len(batch))
+        
+        async def scenario():
+            with patch.object(log, "write", side_effect=slow_write):
+                log.record("team-a", "groq-llama8")
+                log.start()
+                await asyncio.to_thread(writing.wait, 5)
+                log.record("team-b", "groq-llama8")
+                stopping = asyncio.ensure_future(log.stop())
+                await asyncio.sleep(0.05)
+                assert not stopping.done()
+                release.set()
+                await stopping
+        
+        asyncio.run(scenario())
+        assert order[0] == 1 and order[-1] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
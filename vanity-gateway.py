@@ -65,11 +65,14 @@ import fastapi
 import uvicorn
 import pathlib
 import argparse
-import pkgutil, importlib
+import pkgutil, importlib, importlib.util
 import langchain
 import pathspec
 import subprocess, threading, re, os, sys, inspect, shutil, argparse, random, math, json, fnmatch, requests, types, smart_open
 import logging  # Added for debug logs
+import asyncio, time, signal, contextlib, socket, urllib.parse, concurrent.futures
+import requests.adapters
+from fastapi.concurrency import run_in_threadpool
 
 logging.basicConfig(level=logging.INFO)
 
@@ -82,14 +85,161 @@ cwfd = os.path.dirname(cwf) # Current Working File Path
 ###################################
 
 app = fastapi.FastAPI()
+# In-flight tracking for graceful drain (SIGTERM) and socket handoff (SIGUSR2)
+DRAIN = vg_io.drain.DrainState()
+app.add_middleware(vg_io.drain.DrainMiddleware, state=DRAIN)
+# gzip/zstd request bodies and Accept-Encoding negotiated responses
+app.add_middleware(vg_io.codec.CompressionMiddleware)
 
 # Load the test key (used to authenticate callers to this vanity gateway)
 BASE = os.path.dirname(os.path.abspath(__file__))
-TEST_KEY_PATH = os.path.join(BASE, "vg_cfg/test.key")
+TEST_KEY_PATH = os.environ.get("VG_TEST_KEY_PATH") or os.path.join(BASE, "vg_cfg/test.key")
+GATE_CFG_PATH = os.path.join(BASE, "vg_cfg/vg_cfg.json")
 
 with open(TEST_KEY_PATH, "r") as f:
     TEST_KEY = f.read().strip()
 
+# Caller keys (vg_cfg/callers.json), hot-reloaded; the test key is always a caller
+CALLERS_PATH = os.path.join(BASE, "vg_cfg/callers.json")
+CALLERS = vg_io.keys.KeyStore(CALLERS_PATH, static={"test": {"key": TEST_KEY, "admin": True}})
+
+# Usage accounting; the sink is configured from vg_cfg.json at startup
+USAGE = vg_io.usage.UsageLog()
+
+def authenticate(request):
+    """Return the caller behind the Authorization header or raise 401."""
+    CALLERS.maybe_reload()
+    auth = request.headers.get("Authorization") or ""
+    caller = CALLERS.lookup(auth[7:] if auth.startswith("Bearer ") else None)
+    if caller is None:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid or missing authorization token")
+    return caller
+
+# Event loop / HTTP parser selection, resolved by main() from --loop/--http
+LOOP_CHOICES = {"auto": ("uvloop", "asyncio"), "uvloop": ("uvloop", "asyncio"), "asyncio": ("asyncio",)}
+HTTP_CHOICES = {"auto": ("httptools", "h11"), "httptools": ("httptools", "h11"), "h11": ("h11",)}
+
+RUNTIME = {
+    "loop": "asyncio",
+    "http": "h11",
+    "loop_class": None,
+}
+
+def module_available(name):
+    return importlib.util.find_spec(name) is not None
+
+def select_runtime(loop="auto", http="auto"):
+    """
+    Resolve the requested loop/parser to what is actually importable.
+    uvloop and httptools are optional; fall back to asyncio/h11 when missing.
+    Returns (loop, http) using uvicorn's names.
+    """
+    picked = []
+    for requested, choices in ((loop, LOOP_CHOICES), (http, HTTP_CHOICES)):
+        for candidate in choices[requested]:
+            if candidate in ("asyncio", "h11") or module_available(candidate):
+                break
+        if requested not in ("auto", candidate):
+            logging.warning("%s is not installed, falling back to %s", requested, candidate)
+        picked.append(candidate)
+    return tuple(picked)
+
+@app.on_event("startup")
+async def runtime_self_check():
+    # Record the loop uvicorn really gave us, not just the one we asked for
+    loop = asyncio.get_running_loop()
+    RUNTIME["loop_class"] = f"{type(loop).__module__}.{type(loop).__name__}"
+    logging.info("Event loop: %s (%s), HTTP parser: %s", RUNTIME["loop"], RUNTIME["loop_class"], RUNTIME["http"])
+
+@app.get("/status")
+async def status():
+    return {
+        "loop": RUNTIME["loop"], "loop_class": RUNTIME["loop_class"], "http": RUNTIME["http"],
+        **DRAIN.status(),
+        "dns": DNS.stats(),
+        "routes": ROUTE_STATS.snapshot(),
+        "prompt_cache": {"prefixes": len(PROMPT_CACHE.seen), "points_placed": PROMPT_CACHE.placed},
+    }
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that drains on SIGTERM and hands its listening socket to a
+    freshly started successor on SIGUSR2, draining once the successor is ready.
+    """
+
+    def __init__(self, config, sock):
+        super().__init__(config)
+        self.sock = sock
+        self.successor = None
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        handoff = getattr(signal, "SIGUSR2", None)
+        if handoff is None or threading.current_thread() is not threading.main_thread():
+            with super().capture_signals():
+                yield
+            return
+        previous = signal.signal(handoff, self.handle_exit)
+        try:
+            with super().capture_signals():
+                yield
+        finally:
+            signal.signal(handoff, previous)
+
+    def handle_exit(self, sig, frame):
+        if sig == getattr(signal, "SIGUSR2", None):
+            if DRAIN.draining or self.successor is not None:
+                return
+            self.successor = vg_io.drain.spawn_successor(self.sock)
+            logging.info("Started successor pid %s on inherited socket, waiting for it to be ready", self.successor.pid)
+            # Signal handlers must not block: wait for readiness in a thread
+            threading.Thread(target=self.hand_off, args=(self.successor,), daemon=True).start()
+            return
+        DRAIN.begin()
+        super().handle_exit(sig, frame)
+
+    def hand_off(self, successor):
+        """Drain once successor is ready; keep serving if it exits or never gets ready."""
+        if vg_io.drain.wait_ready(successor):
+            logging.info("Successor pid %s is ready, draining", successor.pid)
+            self.handle_exit(signal.SIGTERM, None)
+            return
+        if successor.poll() is None:
+            successor.terminate()
+        logging.error("Successor pid %s did not become ready (exit code %s), still serving", successor.pid, successor.poll())
+        self.successor = None
+
+@app.on_event("startup")
+async def start_usage_log():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    usage_cfg = getattr(gate_cfg, "usage", None)
+    if usage_cfg is None:
+        return
+    USAGE.configure(
+        sink=getattr(usage_cfg, "sink", None),
+        path=os.path.join(cwfd, getattr(usage_cfg, "path", "vg_cfg/usage.jsonl")),
+        flush_interval=getattr(usage_cfg, "flush_interval", 2.0),
+        max_bytes=getattr(usage_cfg, "max_bytes", 64 * 1024 * 1024),
+        backups=getattr(usage_cfg, "backups", 5),
+        capacity=getattr(usage_cfg, "capacity", None),
+    )
+    USAGE.start()
+
+@app.on_event("shutdown")
+async def stop_usage_log():
+    await USAGE.stop()
+
+@app.get("/usage")
+async def usage(request: fastapi.Request):
+    """Aggregated tokens, spend and latency since startup; non-admin callers only see their own."""
+    caller = authenticate(request)
+    group_by = request.query_params.get("group_by", "caller")
+    try:
+        totals = USAGE.summary(group_by, caller=None if caller.admin else caller.name)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    return {"group_by": group_by, "usage": totals, "dropped": USAGE.dropped}
+
 # Reuse helper from req_test: load config into a SimpleNamespace
 def load_cfg_from_path(cfg_path):
     """
@@ -99,12 +249,14 @@ def load_cfg_from_path(cfg_path):
     with open(cfg_path, "r", encoding="utf-8") as f:
         return json.load(f, object_hook=lambda d: types.SimpleNamespace(**d))
 
+# Live per-nickname latency/error/queue stats feeding the virtual nickname router
+ROUTE_STATS = vg_io.route.RouteStats()
+ROUTER = vg_io.route.Router(ROUTE_STATS)
+
 @app.post("/chat/completions")
 async def chat_completions(request: fastapi.Request):
     # Validate incoming authorization token
-    auth = request.headers.get("Authorization")
-    if not auth or auth != f"Bearer {TEST_KEY}":
-        raise fastapi.HTTPException(status_code=401, detail="Invalid or missing authorization token")
+    caller = authenticate(request)
 
     # 1. Get routing info from URL
     nickname = request.query_params.get("nickname")
@@ -112,45 +264,472 @@ async def chat_completions(request: fastapi.Request):
         raise fastapi.HTTPException(status_code=400, detail="Missing nickname in URL")
 
     # 2. Load Gateway Registry (vg_cfg.json)
-    gate_cfg = load_cfg_from_path(os.path.join(cwfd, "vg_cfg/vg_cfg.json"))
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
     provider = getattr(gate_cfg.providers, nickname, None)
     if not provider:
         raise fastapi.HTTPException(status_code=404, detail=f"Provider {nickname} not found")
 
-    # 3. Handle specific API types (Step 1: Requests)
-    if provider.api == "requests":
-        # Load the provider-specific key
-        with open(os.path.join(cwfd, provider.key_path), "r") as f:
-            provider_key = f.read().strip()
+    # Reject malformed bodies before any limits or upstream work
+    try:
+        body = await request.json()
+    except ValueError:
+        raise fastapi.HTTPException(status_code=400, detail="Body must be valid JSON")
+    error = vg_io.schema.chat_error(body)
+    if error is None and provider.api not in ("router", "cascade"):
+        error = vg_io.schema.provider_error(provider, body)
+    if error:
+        raise fastapi.HTTPException(status_code=400, detail=error)
 
-        # 4. Prepare the forward-facing payload
-        payload = await request.json()
-        
-        # SURGICAL FIX: Map nickname to the provider's actual model string
-        # This replaces the local nickname with what Groq/OpenAI expects
-        payload["model"] = provider.model
+    # Per-caller nickname access, rate and concurrency limits
+    rejected = CALLERS.admit(caller, nickname)
+    if rejected:
+        raise fastapi.HTTPException(status_code=rejected[0], detail=rejected[1], headers=rejected[2])
+    request.state.caller = caller
+    started = time.monotonic()
+    content, status_code = None, 500
+    routed = None
 
-        # Merge URL parameters into the JSON payload with type handling
-        for key, value in request.query_params.items():
-            if key == "nickname":
-                continue
-            
-            # Surgical fix for types: handle digits, floats, and booleans
-            if value.isdigit():
-                payload[key] = int(value)
-            elif value.replace('.', '', 1).isdigit() and '.' in value: # Handle floats
-                payload[key] = float(value)
-            elif value.lower() == "true":
-                payload[key] = True
-            elif value.lower() == "false":
-                payload[key] = False
+    def finish(usage, status=None):
+        # status overrides status_code for a stream that failed after its 200 went out
+        status = status_code if status is None else status
+        latency_ms = (time.monotonic() - started) * 1000
+        CALLERS.release(caller)
+        if routed:
+            ROUTE_STATS.observe(routed, latency_ms, status < 500 and status != 429)
+        USAGE.record(
+            caller=caller.name, nickname=nickname, api=provider.api, model=getattr(provider, "model", None),
+            usage=usage, latency_ms=latency_ms, status=status,
+            price=getattr(provider, "price", None),
+        )
+
+    streaming = False
+    try:
+        if provider.api == "router":
+            # Virtual nickname: pick a concrete target from live stats
+            version = os.stat(GATE_CFG_PATH).st_mtime_ns
+            # Only targets the caller may use themselves are candidates
+            choice = ROUTER.choose(nickname, provider, gate_cfg.providers, body, version, allowed=caller.nicknames)
+            if choice is None:
+                if caller.nicknames is not None and ROUTER.choose(nickname, provider, gate_cfg.providers, body, version):
+                    raise fastapi.HTTPException(status_code=403, detail=f"Caller {caller.name} may not use any target of {nickname} that can hold this prompt")
+                raise fastapi.HTTPException(status_code=400, detail=f"No target of {nickname} can hold this prompt")
+            nickname, provider = choice
+            error = vg_io.schema.provider_error(provider, body)
+            if error:
+                raise fastapi.HTTPException(status_code=400, detail=f"{nickname}: {error}")
+        if provider.api == "cascade":
+            # Cheap model first, escalating while the acceptance check fails
+            payload = body
+            content, status_code, nickname, provider = await forward_cascade(
+                nickname, provider, gate_cfg.providers, request, caller, os.stat(GATE_CFG_PATH).st_mtime_ns
+            )
+            if payload.get("stream") and isinstance(content, dict) and status_code == 200:
+                content = vg_io.cascade.as_chunks(content)
+        else:
+            routed = nickname
+            ROUTE_STATS.start(routed)
+            payload = await build_payload(request, provider)
+            primary = start_shadow(nickname, provider, gate_cfg.providers, payload)
+            forwarded = time.monotonic()
+            try:
+                content, status_code = await forward_chat(provider, payload, caller.name)
+            except Exception as e:
+                status_code = getattr(e, "status_code", 500)
+                raise
+            finally:
+                if primary is not None:
+                    primary.set_result((content, status_code, (time.monotonic() - forwarded) * 1000))
+            if CAPTURE.wants(nickname) and provider.api != "replay":
+                if inspect.isgenerator(content):
+                    content = CAPTURE.capture_stream(nickname, payload, content, forwarded)
+                else:
+                    CAPTURE.record(nickname, payload, status_code, response=content, latency_ms=(time.monotonic() - forwarded) * 1000)
+        if inspect.isgenerator(content):
+            # Streamed answers release the caller and record usage once the stream ends
+            streaming = True
+            include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+            return fastapi.responses.StreamingResponse(
+                sse_events(content, finish, include_usage), media_type="text/event-stream",
+                headers={"X-Served-By": nickname},
+            )
+        return fastapi.responses.JSONResponse(content=content, status_code=status_code, headers={"X-Served-By": nickname})
+    except fastapi.HTTPException as e:
+        status_code = e.status_code
+        raise
+    finally:
+        if not streaming:
+            finish(content.get("usage") if isinstance(content, dict) else None)
+
+# Capture of upstream exchanges ("capture" in vg_cfg.json) and the replay adapter
+CAPTURE = vg_io.replay.Recorder()
+REPLAY = vg_io.replay.Replayer()
+
+@app.on_event("startup")
+async def start_capture():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    capture_cfg = getattr(gate_cfg, "capture", None)
+    if capture_cfg is None or not getattr(capture_cfg, "enabled", False):
+        return
+    CAPTURE.configure(
+        path=os.path.join(cwfd, getattr(capture_cfg, "path", "vg_cfg/capture.jsonl")),
+        nicknames=getattr(capture_cfg, "nicknames", None),
+        flush_interval=getattr(capture_cfg, "flush_interval", 1.0),
+    )
+    CAPTURE.start()
+
+@app.on_event("shutdown")
+async def stop_capture():
+    await CAPTURE.stop()
+
+# Sampled shadow requests and their comparisons with the primary answers
+SHADOW = vg_io.shadow.Mirror()
+
+def start_shadow(nickname, provider, providers, payload):
+    """
+    Mirror a sampled share of provider's requests to its "shadow" target in the
+    background. Returns the future to resolve with the primary's result, or None.
+    Streamed requests are not mirrored.
+    """
+    shadow = getattr(provider, "shadow", None)
+    if shadow is None or payload.get("stream"):
+        return None
+    target = getattr(providers, shadow.target, None)
+    if target is None or target.api in ("router", "cascade") or not SHADOW.admit(shadow):
+        return None
+    shadow_payload = dict(payload, model=target.model)
+
+    async def call():
+        started = time.monotonic()
+        content, status_code = None, 500
+        try:
+            content, status_code = await forward_chat(target, shadow_payload)
+            return content, status_code
+        finally:
+            # Shadow spend is the gateway's, not the caller's
+            USAGE.record(
+                caller="shadow", nickname=shadow.target, api=target.api, model=target.model,
+                usage=content.get("usage") if isinstance(content, dict) else None,
+                latency_ms=(time.monotonic() - started) * 1000, status=status_code,
+                price=getattr(target, "price", None),
+            )
+
+    return SHADOW.mirror(nickname, shadow.target, call)
+
+@app.get("/shadow")
+async def shadow_report(request: fastapi.Request):
+    """Primary vs shadow comparisons since startup (admin only)."""
+    caller = authenticate(request)
+    if not caller.admin:
+        raise fastapi.HTTPException(status_code=403, detail="Shadow comparisons are admin only")
+    return SHADOW.summary()
+
+# Compiled acceptance checks for cascade nicknames
+CASCADE_CHECKS = vg_io.cascade.Checks()
+
+async def forward_cascade(nickname, cascade, providers, request, caller, version=None):
+    """
+    Try cascade.steps in order until an answer passes cascade.accept; the last
+    step's answer is always kept. Returns (content, status_code, step, provider).
+    Rejected attempts are recorded in usage and route stats as they happen.
+    """
+    check = CASCADE_CHECKS.get(nickname, getattr(cascade, "accept", None), version)
+    steps = list(getattr(cascade, "steps", None) or [])
+    if not steps:
+        raise fastapi.HTTPException(status_code=500, detail=f"Cascade {nickname} has no steps")
+    # Steps the caller may not use are skipped; the last one left is kept whatever it answers
+    steps = [step for step in steps if vg_io.keys.allows(caller, step)]
+    if not steps:
+        raise fastapi.HTTPException(status_code=403, detail=f"Caller {caller.name} may not use any step of {nickname}")
+    for i, step in enumerate(steps):
+        provider = getattr(providers, step, None)
+        if provider is None or provider.api in ("router", "cascade"):
+            raise fastapi.HTTPException(status_code=500, detail=f"Cascade {nickname} step {step} is not a provider")
+        last = i == len(steps) - 1
+        error = vg_io.schema.provider_error(provider, await request.json())
+        if error:
+            if last:
+                raise fastapi.HTTPException(status_code=400, detail=f"{step}: {error}")
+            logging.info("Cascade %s: skipping %s (%s)", nickname, step, error)
+            continue
+        payload = dict(await build_payload(request, provider))
+        payload.pop("stream", None)
+        payload.pop("stream_options", None)
+        # Logprobs asked for only to run the check are stripped from the answer
+        injected = check.logprobs and not last and provider.api in ("requests", "langchain_openai") and not payload.get("logprobs")
+        if injected:
+            payload["logprobs"] = True
+        started = time.monotonic()
+        content, status_code, reason = None, 500, None
+        ROUTE_STATS.start(step)
+        try:
+            content, status_code = await forward_chat(provider, payload, caller.name)
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            if last:
+                raise
+            reason = str(getattr(e, "detail", e)) or type(e).__name__
+        finally:
+            ROUTE_STATS.observe(step, (time.monotonic() - started) * 1000, status_code < 500 and status_code != 429)
+        if last:
+            return content, status_code, step, provider
+        if reason is None:
+            if status_code != 200:
+                reason = f"status {status_code}"
             else:
-                payload[key] = value
+                accepted, reason = check(content)
+                if accepted:
+                    if injected:
+                        vg_io.cascade.strip_logprobs(content)
+                    return content, status_code, step, provider
+        USAGE.record(
+            caller=caller.name, nickname=step, api=provider.api, model=provider.model,
+            usage=content.get("usage") if isinstance(content, dict) else None,
+            latency_ms=(time.monotonic() - started) * 1000, status=status_code,
+            price=getattr(provider, "price", None),
+        )
+        logging.info("Cascade %s: %s rejected (%s), escalating", nickname, step, reason)
+
+def sse_events(chunks, finish, include_usage=False):
+    """
+    OpenAI chunk dicts -> server-sent events; calls finish(usage, status) at
+    the end, with status 502 when the upstream stream failed part-way.
+    """
+    usage, status = None, None
+    try:
+        for chunk in chunks:
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+                if not include_usage and not chunk.get("choices"):
+                    continue
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+    except Exception:
+        status = 502
+        raise
+    finally:
+        # A client that went away closes us; pass that on to the upstream stream
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        finish(usage, status)
+
+def merge_query_params(payload, query_params):
+    """Merge URL parameters into the JSON payload with type handling"""
+    for key, value in query_params.items():
+        if key == "nickname":
+            continue
+
+        # Surgical fix for types: handle digits, floats, and booleans
+        if value.isdigit():
+            payload[key] = int(value)
+        elif value.replace('.', '', 1).isdigit() and '.' in value: # Handle floats
+            payload[key] = float(value)
+        elif value.lower() == "true":
+            payload[key] = True
+        elif value.lower() == "false":
+            payload[key] = False
+        else:
+            payload[key] = value
+
+    # Remove keys that the upstream provider (Groq/OpenAI) won't recognize
+    payload.pop("nickname", None)
+    # Optional: remove other custom params if they cause 400s
+    # payload.pop("include_reasoning", None)
+    return payload
+
+async def build_payload(request, provider):
+    # 4. Prepare the forward-facing payload
+    payload = await request.json()
+
+    # SURGICAL FIX: Map nickname to the provider's actual model string
+    # This replaces the local nickname with what Groq/OpenAI expects
+    # Providers without a model (e.g. replay) keep the caller's
+    payload["model"] = getattr(provider, "model", payload.get("model"))
+    return merge_query_params(payload, request.query_params)
+
+# Upstream DNS answers, cached for their TTL and refreshed in the background
+DNS = vg_io.dnsc.DnsCache()
+
+# Shared keep-alive pool for upstream HTTP, pre-filled by warm_up()
+UPSTREAM = requests.Session()
+UPSTREAM_ADAPTER = vg_io.dnsc.CachedDnsAdapter(DNS, pool_connections=32, pool_maxsize=32)
+UPSTREAM.mount("https://", UPSTREAM_ADAPTER)
+UPSTREAM.mount("http://", UPSTREAM_ADAPTER)
+
+# Prefixes seen per (caller, model), for automatic Bedrock cache points
+PROMPT_CACHE = vg_io.pcache.PrefixTracker()
+
+# Bedrock runtime clients per region, built once from the gateway's own boto3 session.
+# boto3's default session is not thread-safe, and clients are built from pool threads.
+BEDROCK_CLIENTS = {}
+BEDROCK_SESSION = None
+BEDROCK_LOCK = threading.Lock()
+
+def bedrock_client(region):
+    global BEDROCK_SESSION
+    client = BEDROCK_CLIENTS.get(region)
+    if client is None:
+        with BEDROCK_LOCK:
+            client = BEDROCK_CLIENTS.get(region)
+            if client is None:
+                import boto3.session, botocore.config
+                if BEDROCK_SESSION is None:
+                    BEDROCK_SESSION = boto3.session.Session()
+                config = botocore.config.Config(max_pool_connections=32)
+                client = BEDROCK_CLIENTS[region] = BEDROCK_SESSION.client("bedrock-runtime", region_name=region, config=config)
+    return client
+
+# Filled in by warm_up(); /ready answers 503 until it has finished
+READINESS = {"ready": False, "started": None, "finished": None, "targets": {}}
+
+# Modules a provider's api imports on its first request, imported by warm_up() instead
+ADAPTER_MODULES = {
+    "langchain_aws": ("langchain_aws", "langchain_core.messages"),
+}
+
+def warmup_targets(providers):
+    """Group providers into unique warm-up targets: {(kind, host, region or module): [nicknames]}."""
+    targets = {}
+    for nickname, provider in vars(providers).items():
+        if getattr(provider, "warmup", True) is False:
+            continue
+        for module in ADAPTER_MODULES.get(provider.api, ()):
+            targets.setdefault(("import", module), []).append(nickname)
+        if provider.api in ("bedrock", "langchain_aws"):
+            target = ("bedrock", getattr(provider, "region", "us-east-1"))
+        elif getattr(provider, "url", None):
+            parsed = urllib.parse.urlsplit(provider.url)
+            target = ("http", f"{parsed.scheme}://{parsed.netloc}")
+        else:
+            continue
+        targets.setdefault(target, []).append(nickname)
+    return targets
+
+def warm_target(target, connections, timeout):
+    """Resolve, connect or import for one target (blocking). Returns elapsed ms."""
+    kind, value = target
+    started = time.monotonic()
+    if kind == "http":
+        parsed = urllib.parse.urlsplit(value)
+        DNS.resolve(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        # Concurrent requests each open a keep-alive connection that stays in the pool
+        with concurrent.futures.ThreadPoolExecutor(connections) as pool:
+            list(pool.map(lambda _: UPSTREAM.head(value + "/", timeout=timeout, allow_redirects=False), range(connections)))
+    elif kind == "bedrock":
+        import botocore.exceptions
+        # Building the client opens nothing; one cheap signed call leaves a connection in its pool.
+        # Any answer from the service will do, even AccessDenied.
+        try:
+            bedrock_client(value).list_async_invokes(maxResults=1)
+        except botocore.exceptions.ClientError:
+            pass
+    elif kind == "import":
+        importlib.import_module(value)
+    return round((time.monotonic() - started) * 1000, 1)
+
+async def warm_up(providers, connections=2, timeout=5.0):
+    """Warm every target concurrently; failures are reported, not fatal."""
+    READINESS.update(ready=False, started=time.time(), finished=None, targets={})
+
+    async def one(target, nicknames):
+        try:
+            ms = await asyncio.wait_for(asyncio.to_thread(warm_target, target, connections, timeout), timeout * 2)
+            state = {"ok": True, "ms": ms}
+        except Exception as e:
+            state = {"ok": False, "error": str(e) or type(e).__name__}
+        READINESS["targets"][f"{target[0]}:{target[1]}"] = dict(state, nicknames=nicknames)
+
+    await asyncio.gather(*(one(t, n) for t, n in warmup_targets(providers).items()))
+    READINESS.update(ready=True, finished=time.time())
+    vg_io.drain.notify_ready()
+    logging.info("Warm-up finished: %s", {k: v.get("ms", v.get("error")) for k, v in READINESS["targets"].items()})
+
+@app.on_event("startup")
+async def start_warm_up():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    warm_cfg = getattr(gate_cfg, "warmup", None)
+    if warm_cfg is not None and getattr(warm_cfg, "enabled", True) is False:
+        READINESS.update(ready=True, finished=time.time())
+        vg_io.drain.notify_ready()
+        return
+    asyncio.get_running_loop().create_task(warm_up(
+        gate_cfg.providers,
+        connections=getattr(warm_cfg, "connections", 2),
+        timeout=getattr(warm_cfg, "timeout", 5.0),
+    ))
+
+async def refresh_dns(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(DNS.refresh)
+        except Exception as e:
+            logging.warning("DNS refresh failed: %s", e)
+
+@app.on_event("startup")
+async def start_dns_refresh():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    dns_cfg = getattr(gate_cfg, "dns", None)
+    if dns_cfg is not None:
+        DNS.configure(**{k: v for k, v in vars(dns_cfg).items() if k != "refresh_interval"})
+    asyncio.get_running_loop().create_task(refresh_dns(getattr(dns_cfg, "refresh_interval", 5.0)))
+
+@app.get("/ready")
+async def ready():
+    return fastapi.responses.JSONResponse(content=READINESS, status_code=200 if READINESS["ready"] else 503)
 
-        # Remove keys that the upstream provider (Groq/OpenAI) won't recognize
-        payload.pop("nickname", None) 
-        # Optional: remove other custom params if they cause 400s
-        # payload.pop("include_reasoning", None)
+def read_provider_key(key_path):
+    with open(os.path.join(cwfd, key_path), "r") as f:
+        return f.read().strip()
+
+def upstream_body(provider, payload, headers):
+    """
+    UPSTREAM.post kwargs for the payload. Providers with "request_encoding"
+    set get large bodies compressed; everything else is sent as plain JSON.
+    """
+    encoding = getattr(provider, "request_encoding", None)
+    if not encoding:
+        return {"json": payload}
+    body = json.dumps(payload).encode("utf-8")
+    if len(body) < vg_io.codec.MIN_COMPRESS_BYTES:
+        return {"json": payload}
+    headers["Content-Encoding"] = encoding
+    return {"data": vg_io.codec.encode_body(body, encoding)}
+
+def upstream_chunks(resp):
+    """Parse an upstream SSE response into chunk dicts."""
+    try:
+        for line in resp.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            yield json.loads(data)
+    finally:
+        resp.close()
+
+async def forward_stream(url, headers, body):
+    """POST a streaming request; returns (chunk generator, 200) or (error body, status)."""
+    resp = await run_in_threadpool(UPSTREAM.post, url, headers=headers, timeout=30, stream=True, **body)
+    if resp.status_code != 200:
+        try:
+            return resp.json(), resp.status_code
+        except ValueError:
+            return {"error": {"message": resp.text, "type": "upstream_error"}}, resp.status_code
+        finally:
+            resp.close()
+    return upstream_chunks(resp), 200
+
+async def forward_chat(provider, payload, caller=None):
+    """
+    Send payload to provider and return (content, status_code).
+    caller (a name) scopes per-caller state such as Bedrock prompt caching.
+    """
+    # 3. Handle specific API types (Step 1: Requests)
+    if provider.api == "requests":
+        # Load the provider-specific key
+        provider_key = read_provider_key(provider.key_path)
 
         # LOGGING: See exactly what we are sending upstream
         print(f"Forwarding to: {provider.url}")
@@ -158,71 +737,57 @@ async def chat_completions(request: fastapi.Request):
 
         # 5. Forward to the actual provider
         headers = {"Authorization": f"Bearer {provider_key}", "Content-Type": "application/json"}
-        resp = requests.post(provider.url, headers=headers, json=payload, timeout=30)
-        return fastapi.responses.JSONResponse(content=resp.json(), status_code=resp.status_code)
+        body = upstream_body(provider, payload, headers)
+        if payload.get("stream"):
+            return await forward_stream(provider.url, headers, body)
+        resp = await run_in_threadpool(UPSTREAM.post, provider.url, headers=headers, timeout=30, **body)
+        return resp.json(), resp.status_code
     
     elif provider.api == "langchain_openai":
         # Load the provider-specific key
         provider_key = None
         if hasattr(provider, "key_path") and provider.key_path:
-            with open(os.path.join(cwfd, provider.key_path), "r") as f:
-                provider_key = f.read().strip()
-
-        # Prepare payload and merge URL params (same logic as requests branch)
-        payload = await request.json()
-        payload["model"] = provider.model
-
-        for key, value in request.query_params.items():
-            if key == "nickname":
-                continue
-            if value.isdigit():
-                payload[key] = int(value)
-            elif value.replace('.', '', 1).isdigit() and '.' in value:
-                payload[key] = float(value)
-            elif value.lower() == "true":
-                payload[key] = True
-            elif value.lower() == "false":
-                payload[key] = False
-            else:
-                payload[key] = value
-
-        # Remove keys that the upstream provider (Groq/OpenAI) won't recognize
-        payload.pop("nickname", None) 
-        # Optional: remove other custom params if they cause 400s
-        # payload.pop("include_reasoning", None)
+            provider_key = read_provider_key(provider.key_path)
 
         logging.info("Forwarding to langchain_openai provider URL %s", provider.url)
         headers = {"Content-Type": "application/json"}
         if provider_key:
             headers["Authorization"] = f"Bearer {provider_key}"
         # headers = {"Authorization": f"Bearer {provider_key}", "Content-Type": "application/json"}
-        resp = requests.post(provider.url, headers=headers, json=payload, timeout=30)
-        return fastapi.responses.JSONResponse(content=resp.json(), status_code=resp.status_code)
+        body = upstream_body(provider, payload, headers)
+        if payload.get("stream"):
+            return await forward_stream(provider.url, headers, body)
+        resp = await run_in_threadpool(UPSTREAM.post, provider.url, headers=headers, timeout=30, **body)
+        return resp.json(), resp.status_code
+
+    elif provider.api == "replay":
+        # Captured upstream traffic served back with its original timing
+        return await REPLAY.forward(provider, payload, cwfd)
     
+    elif provider.api == "bedrock":
+        # AWS Bedrock Converse on the shared client - credentials from environment or AWS config
+        client = bedrock_client(getattr(provider, "region", "us-east-1"))
+        try:
+            converse = vg_io.converse.to_converse(payload, provider.model)
+            cache_cfg = getattr(provider, "prompt_cache", None)
+            if cache_cfg:
+                # Opt-in: mark prefixes this caller has sent recently as cache points
+                PROMPT_CACHE.place(
+                    converse, (caller, provider.model),
+                    min_tokens=getattr(cache_cfg, "min_tokens", 1024), ttl=getattr(cache_cfg, "ttl", None),
+                )
+            if payload.get("stream"):
+                return await run_in_threadpool(vg_io.converse.converse_stream, client, payload, provider.model, converse), 200
+            return await run_in_threadpool(vg_io.converse.converse, client, payload, provider.model, converse), 200
+        except ValueError as e:
+            raise fastapi.HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            if not hasattr(e, "response"):
+                raise
+            return vg_io.converse.error_response(e)
+
     elif provider.api == "langchain_aws":
         # AWS Bedrock - credentials from environment or AWS config
-        payload = await request.json()
-        payload["model"] = provider.model
-
-        for key, value in request.query_params.items():
-            if key == "nickname":
-                continue
-            if value.isdigit():
-                payload[key] = int(value)
-            elif value.replace('.', '', 1).isdigit() and '.' in value:
-                payload[key] = float(value)
-            elif value.lower() == "true":
-                payload[key] = True
-            elif value.lower() == "false":
-                payload[key] = False
-            else:
-                payload[key] = value
-
-        # Remove keys that the upstream provider (Groq/OpenAI) won't recognize
-        payload.pop("nickname", None) 
-        # Optional: remove other custom params if they cause 400s
-        # payload.pop("include_reasoning", None)
-
         logging.info("Forwarding to AWS Bedrock model %s", provider.model)
         
         from langchain_aws import ChatBedrock
@@ -236,16 +801,18 @@ async def chat_completions(request: fastapi.Request):
             if role in role_map and content:
                 lc_messages.append(role_map[role](content=content))
         
+        region = getattr(provider, "region", "us-east-1")
         llm = ChatBedrock(
+            client=bedrock_client(region),
             model_id=provider.model,
-            region_name=getattr(provider, "region", "us-east-1"),
+            region_name=region,
             model_kwargs={
                 "temperature": payload.get("temperature", 0.7),
                 "max_tokens": payload.get("max_tokens", None),
             }
         )
         
-        response = llm.invoke(lc_messages)
+        response = await run_in_threadpool(llm.invoke, lc_messages)
         
         usage = {}
         if hasattr(response, 'response_metadata') and 'usage' in response.response_metadata:
@@ -264,7 +831,175 @@ async def chat_completions(request: fastapi.Request):
             "usage": usage
         }
         
-        return fastapi.responses.JSONResponse(content=response_json, status_code=200)
+        return response_json, 200
+
+    raise fastapi.HTTPException(status_code=400, detail=f"Unsupported api {provider.api}")
+
+def embeddings_url(provider):
+    """provider.embeddings_url, else derived from the chat url."""
+    url = getattr(provider, "embeddings_url", None)
+    if url:
+        return url
+    if provider.url.endswith("/chat/completions"):
+        return provider.url[:-len("/chat/completions")] + "/embeddings"
+    if provider.url.endswith("/embeddings"):
+        return provider.url
+    return provider.url.rstrip("/") + "/embeddings"
+
+async def embed_batch(key, inputs):
+    """
+    One upstream /embeddings call for a coalesced batch.
+    Returns [(embedding, prompt_tokens_share), ...] in input order.
+    """
+    url, key_path, model, dimensions, encoding_format, request_encoding = key
+    headers = {"Content-Type": "application/json"}
+    if key_path:
+        headers["Authorization"] = f"Bearer {read_provider_key(key_path)}"
+    payload = {"model": model, "input": inputs}
+    if dimensions is not None:
+        payload["dimensions"] = dimensions
+    if encoding_format is not None:
+        payload["encoding_format"] = encoding_format
+    body = upstream_body(types.SimpleNamespace(request_encoding=request_encoding), payload, headers)
+    resp = await run_in_threadpool(UPSTREAM.post, url, headers=headers, timeout=30, **body)
+    if resp.status_code != 200:
+        try:
+            detail = resp.json()
+        except ValueError:
+            detail = resp.text
+        raise fastapi.HTTPException(status_code=resp.status_code, detail=detail)
+    content = resp.json()
+    vectors = [row["embedding"] for row in sorted(content["data"], key=lambda row: row["index"])]
+    # Upstream only reports usage for the whole batch; split it by input size
+    prompt_tokens = vg_io.usage.normalize_usage(content.get("usage"))[0]
+    sizes = [len(i) if isinstance(i, (str, list)) else 1 for i in inputs]
+    total = sum(sizes) or 1
+    return [(v, prompt_tokens * n / total) for v, n in zip(vectors, sizes)]
+
+def is_tokens(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(t, int) and not isinstance(t, bool) for t in value)
+
+def embedding_inputs(inputs):
+    """
+    (items, batchable) for an embeddings "input": one string, a list of strings,
+    one token array or a list of token arrays. Only strings are coalesced with
+    other callers' inputs; token arrays go upstream as sent.
+    """
+    if isinstance(inputs, str):
+        return [inputs], True
+    if isinstance(inputs, list) and inputs:
+        if all(isinstance(i, str) for i in inputs):
+            return inputs, True
+        if is_tokens(inputs):
+            return [inputs], False
+        if all(is_tokens(i) for i in inputs):
+            return inputs, False
+    raise fastapi.HTTPException(
+        status_code=400,
+        detail="input must be a string, a non-empty list of strings, a token array or a list of token arrays",
+    )
+
+# Coalesces concurrent embedding requests per provider; tuned from vg_cfg.json
+EMBED_BATCHER = vg_io.batch.MicroBatcher(embed_batch)
+
+@app.on_event("startup")
+async def configure_embeddings():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    embed_cfg = getattr(gate_cfg, "embeddings", None)
+    if embed_cfg is not None:
+        EMBED_BATCHER.configure(
+            max_batch=getattr(embed_cfg, "max_batch", None),
+            max_wait=getattr(embed_cfg, "max_wait_ms", 5) / 1000,
+        )
+
+@app.post("/embeddings")
+async def embeddings(request: fastapi.Request):
+    caller = authenticate(request)
+    nickname = request.query_params.get("nickname")
+    if not nickname:
+        raise fastapi.HTTPException(status_code=400, detail="Missing nickname in URL")
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    provider = getattr(gate_cfg.providers, nickname, None)
+    if not provider:
+        raise fastapi.HTTPException(status_code=404, detail=f"Provider {nickname} not found")
+    if provider.api not in ("requests", "langchain_openai"):
+        raise fastapi.HTTPException(status_code=400, detail=f"Embeddings are not supported for api {provider.api}")
+
+    rejected = CALLERS.admit(caller, nickname)
+    if rejected:
+        raise fastapi.HTTPException(status_code=rejected[0], detail=rejected[1], headers=rejected[2])
+    started = time.monotonic()
+    status_code, prompt_tokens = 500, 0
+    try:
+        try:
+            payload = await build_payload(request, provider)
+        except ValueError:
+            raise fastapi.HTTPException(status_code=400, detail="Request body must be valid JSON")
+        inputs, batchable = embedding_inputs(payload.get("input") if isinstance(payload, dict) else None)
+        key = (
+            embeddings_url(provider), getattr(provider, "key_path", None), provider.model,
+            payload.get("dimensions"), payload.get("encoding_format"), getattr(provider, "request_encoding", None),
+        )
+        try:
+            if batchable:
+                results = await EMBED_BATCHER.submit(key, inputs)
+            else:
+                results = await embed_batch(key, inputs)
+        except fastapi.HTTPException:
+            raise
+        except Exception as e:
+            raise fastapi.HTTPException(status_code=502, detail=f"Upstream embeddings failed: {e}")
+        prompt_tokens = round(sum(tokens for _, tokens in results))
+        status_code = 200
+        return {
+            "object": "list",
+            "model": provider.model,
+            "data": [{"object": "embedding", "index": i, "embedding": v} for i, (v, _) in enumerate(results)],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+    except fastapi.HTTPException as e:
+        status_code = e.status_code
+        raise
+    finally:
+        CALLERS.release(caller)
+        USAGE.record(
+            caller=caller.name, nickname=nickname, api=provider.api, model=provider.model,
+            usage={"prompt_tokens": prompt_tokens}, latency_ms=(time.monotonic() - started) * 1000,
+            status=status_code, price=getattr(provider, "price", None),
+        )
+
+# /models snapshots, rebuilt when vg_cfg.json or the upstream catalogs change
+MODELS = vg_io.catalog.Catalog()
+
+async def refresh_catalogs(interval):
+    while True:
+        try:
+            gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+            await asyncio.to_thread(MODELS.refresh, gate_cfg.providers, read_provider_key)
+        except Exception as e:
+            logging.warning("Model catalog refresh failed: %s", e)
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_catalog_refresh():
+    gate_cfg = load_cfg_from_path(GATE_CFG_PATH)
+    if any(getattr(p, "catalog", False) for p in vars(gate_cfg.providers).values()):
+        models_cfg = getattr(gate_cfg, "models", None)
+        interval = getattr(models_cfg, "refresh_interval", 3600) if models_cfg else 3600
+        asyncio.get_running_loop().create_task(refresh_catalogs(interval))
+
+@app.get("/models")
+async def models(request: fastapi.Request):
+    caller = authenticate(request)
+    body, etag = MODELS.snapshot(
+        lambda: load_cfg_from_path(GATE_CFG_PATH).providers,
+        os.stat(GATE_CFG_PATH).st_mtime_ns,
+        caller.nicknames,
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+    if request.headers.get("If-None-Match") == etag:
+        return fastapi.Response(status_code=304, headers=headers)
+    return fastapi.Response(content=body, media_type="application/json", headers=headers)
 
 #https://openrouter.ai/api/v1
 
@@ -282,6 +1017,10 @@ def main():
     parser.add_argument("--ssl-key-file",           required=False, type=str,   help="Path to the ssl key. (is skipped if config is provided)")
     parser.add_argument("-H", "--host",             required=False, type=str,   help="host address. (default: 0.0.0.0)")
     parser.add_argument("-p", "--port",             required=False, type=int,   help="Port address. (default: 8443)")
+    parser.add_argument("--loop",                   required=False, type=str,   default="auto", choices=sorted(LOOP_CHOICES), help="Event loop. (default: auto, uvloop if installed)")
+    parser.add_argument("--drain-timeout",          required=False, type=float, default=90.0, help="Seconds in-flight requests get to finish on SIGTERM/SIGUSR2. (default: 90)")
+    parser.add_argument("--reuse-port",             required=False, action="store_true", help="Set SO_REUSEPORT so another gateway can bind the same port.")
+    parser.add_argument("--http",                   required=False, type=str,   default="auto", choices=sorted(HTTP_CHOICES), help="HTTP parser. (default: auto, httptools if installed)")
     args = vars(parser.parse_args())
 
     # Server configuration
@@ -338,13 +1077,26 @@ def main():
         print(f"No certficate file provided. Defaulting to {str(ssl_keyfile.absolute())}")
 
 
-    uvicorn.run(
-        "vanity-gateway:app",
+    # Pick the event loop and HTTP parser
+    server_loop, server_http = select_runtime(args.get("loop"), args.get("http"))
+    RUNTIME["loop"] = server_loop
+    RUNTIME["http"] = server_http
+    print(f"Using {server_loop} event loop with {server_http} HTTP parser")
+
+    # Bind ourselves (or inherit the predecessor's socket) so it can be handed off
+    sock = vg_io.drain.listen_socket(server_host, server_port, reuse_port=args.get("reuse_port"))
+
+    config = uvicorn.Config(
+        app,
         host = server_host,
         port = server_port,
         ssl_keyfile=str(ssl_keyfile),
         ssl_certfile=str(ssl_certfile),
+        loop = server_loop,
+        http = server_http,
+        timeout_graceful_shutdown = args.get("drain_timeout"),
     )
+    DrainingServer(config, sock).run(sockets=[sock])
 
 if __name__ == "__main__":
     main()
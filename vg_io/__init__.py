@@ -25,7 +25,23 @@
 # vanity-gateway/vg_io/__init__.py
 
 from . import rqs
+from . import arqs
 from . import oai
 from . import cfg
 from . import reslv
+from . import keys
+from . import usage
+from . import codec
+from . import batch
+from . import catalog
+from . import drain
+from . import dnsc
+from . import converse
+from . import route
+from . import cascade
+from . import shadow
+from . import replay
+from . import schema
+from . import pcache
+from . import rcache
 # from . import goog
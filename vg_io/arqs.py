@@ -0,0 +1,247 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# arqs.py
+# asyncio counterpart of rqs.py: the same (value, err) API, awaited, over an
+# httpx.AsyncClient connection pool, so one process can keep hundreds of
+# prompts in flight without threads.
+#
+#   data, err = await vg_io.arqs.get_response(cfg, payload_builder, *args)
+#   results = await vg_io.arqs.gather_responses(cfg, [(builder, arg) for arg in args], concurrency=64)
+#
+# results come back in the order of the builders. Pool settings (pool_size,
+# retries, backoff, timeout) come from cfg.projectConfig as in rqs.py.
+#
+#   stream, err = await vg_io.arqs.stream_response(cfg, payload_builder, prompt)
+#   async with stream:
+#       async for delta in stream:
+#           print(delta, end="")
+#   content, err = await stream.result()
+
+import asyncio, urllib.parse, weakref
+import httpx
+from . import rqs
+
+class Client:
+    """
+    Keep-alive connection pool to one gateway, bound to the running event loop.
+    Retries connect failures with exponential backoff, and refused requests
+    (429/503 with Retry-After, see rqs.should_retry) after the delay they ask for.
+    """
+
+    def __init__(self, verify=True, pool_size=16, retries=2, backoff=0.2, timeout=30):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        transport = httpx.AsyncHTTPTransport(
+            verify=rqs.ssl_context(verify) or verify, limits=limits, retries=retries,
+        )
+        # Waiting for a free pooled connection is not a timeout: callers bound the whole call instead
+        self.session = httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(timeout, pool=None))
+
+    async def post(self, url, **kwargs):
+        for attempt in range(self.retries + 1):
+            response = await self.session.post(url, **kwargs)
+            if not rqs.should_retry(response.status_code, response.headers) or attempt == self.retries:
+                return response
+            await response.aclose()
+            await asyncio.sleep(rqs.retry_delay(response.headers, self.backoff * (2 ** attempt)))
+
+    async def stream(self, url, **kwargs):
+        """Like post(), but the body is left unread for aiter_lines(); close the response when done."""
+        for attempt in range(self.retries + 1):
+            request = self.session.build_request("POST", url, **kwargs)
+            response = await self.session.send(request, stream=True)
+            if not rqs.should_retry(response.status_code, response.headers) or attempt == self.retries:
+                return response
+            await response.aclose()
+            await asyncio.sleep(rqs.retry_delay(response.headers, self.backoff * (2 ** attempt)))
+
+    async def close(self):
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+# Shared clients per event loop, then per (gateway origin, verify)
+CLIENTS = weakref.WeakKeyDictionary()
+
+def client_for(url, verify=True, **options):
+    """The shared Client for this gateway origin on the running loop; options only apply when it is first created."""
+    clients = CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    parsed = urllib.parse.urlsplit(url)
+    key = (parsed.scheme, parsed.netloc, verify)
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = Client(verify=verify, **options)
+    return client
+
+async def get_response(cfg, payload_builder, *builder_args, verify=True, client=None, timeout=None):
+    """
+    Send Message to Server, as (response json, err).
+    timeout (seconds) bounds the whole call including retries; cancelling the
+    awaiting task cancels the request.
+    """
+    try:
+        request, err = rqs.prepare(cfg, payload_builder, *builder_args)
+        if err: return request, True
+        target_url, headers, payload, params = request
+
+        client = client or client_for(target_url, verify, **rqs.client_options(cfg))
+        response = await asyncio.wait_for(
+            client.post(target_url, headers=headers, json=payload, params=params), timeout,
+        )
+        response.raise_for_status()
+        return response.json(), False
+    except asyncio.TimeoutError:
+        return f"Error: timed out after {timeout}s", True
+    except Exception as e:
+        return f"Error: {str(e)}", True
+
+async def parse_response(cfg, payload_builder, *builder_args, verify=True, client=None, timeout=None):
+    """Receive Response from server, as (content, err) with any code fence stripped."""
+    data, err = await get_response(
+        cfg, payload_builder, *builder_args, verify=verify, client=client, timeout=timeout,
+    )
+    if err:
+        return data, True
+    return rqs.parse_content(data)
+
+class AsyncStream:
+    """Async iterator of content deltas over a streaming gateway response; aclose() ends it early."""
+
+    def __init__(self, response):
+        self.response = response
+        self.assembler = rqs.Assembler()
+        self.closed = False
+
+    async def __aiter__(self):
+        if self.closed:
+            return
+        assembler = self.assembler
+        try:
+            async for line in self.response.aiter_lines():
+                delta = assembler.feed(line.encode())
+                if delta:
+                    yield delta
+                if assembler.done:
+                    break
+        except Exception as e:
+            assembler.error = assembler.error or f"Error: {str(e)}"
+        finally:
+            await self.aclose()
+
+    @property
+    def text(self):
+        """Content received so far, as sent."""
+        return self.assembler.text
+
+    @property
+    def usage(self):
+        return self.assembler.usage
+
+    @property
+    def finish_reason(self):
+        return self.assembler.finish_reason
+
+    async def result(self):
+        """
+        Consume the rest of the stream; (content with any code fence stripped, err).
+        After an early close this is the content received up to that point.
+        """
+        async for _ in self:
+            pass
+        return self.assembler.result()
+
+    async def aclose(self):
+        self.closed = True
+        await self.response.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+async def stream_response(cfg, payload_builder, *builder_args, verify=True, client=None, timeout=None):
+    """
+    Send a streaming request; (AsyncStream, err).
+    timeout bounds the wait for the response headers; errors before the first
+    event come back as (message, True).
+    """
+    try:
+        request, err = rqs.prepare(cfg, payload_builder, *builder_args)
+        if err: return request, True
+        target_url, headers, payload, params = request
+        payload["stream"] = True
+
+        client = client or client_for(target_url, verify, **rqs.client_options(cfg))
+        response = await asyncio.wait_for(
+            client.stream(target_url, headers=headers, json=payload, params=params), timeout,
+        )
+        if response.status_code >= 400:
+            try:
+                await response.aread()
+                response.raise_for_status()
+            finally:
+                await response.aclose()
+        return AsyncStream(response), False
+    except asyncio.TimeoutError:
+        return f"Error: timed out after {timeout}s", True
+    except Exception as e:
+        return f"Error: {str(e)}", True
+
+async def gather_responses(cfg, builders, concurrency=16, verify=True, client=None, timeout=None, parse=True):
+    """
+    Run many requests with at most concurrency in flight; a list of (value, err) in builders order.
+    Each builder is a payload_builder or a (payload_builder, *builder_args) tuple.
+    parse=False returns the raw response json like get_response. timeout applies per request.
+    Without a client, runs on the shared one, or on a dedicated pool of concurrency
+    connections when the shared pool is smaller.
+    """
+    call = parse_response if parse else get_response
+    semaphore = asyncio.Semaphore(concurrency)
+    own = None
+    if client is None:
+        options = rqs.client_options(cfg)
+        client = client_for(cfg.projectConfig.gateway_url, verify, **options)
+        if client.pool_size < concurrency:
+            # The shared pool would cap concurrency: use one sized for this batch
+            client = own = Client(verify=verify, **dict(options, pool_size=concurrency))
+
+    async def one(builder):
+        payload_builder, *builder_args = builder if isinstance(builder, tuple) else (builder,)
+        async with semaphore:
+            return await call(cfg, payload_builder, *builder_args, verify=verify, client=client, timeout=timeout)
+
+    try:
+        return await asyncio.gather(*(one(builder) for builder in builders))
+    finally:
+        if own is not None:
+            await own.close()
@@ -27,14 +27,65 @@
 # get list of models at:
 # https://ai.azure.com/catalog/models
 
-import json, types, os
+import json, types, os, threading
 from langchain_aws import ChatBedrock
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 import time
 import random
+from . import rqs
 import configparser
 
-def get_response(cfg, payload_builder, *builder_args, verify=True):
+# Credentials per (key file, mtime), so the file is parsed once rather than per call.
+# Filled from pool threads, so every access holds CREDENTIALS_LOCK.
+CREDENTIALS = {}
+CREDENTIALS_LOCK = threading.Lock()
+
+def load_credentials(key_path):
+    """
+    (aws_access_key_id, aws_secret_access_key) from the [default] section of
+    key_path, cached. A missing file gives (None, None), so boto3 falls back to
+    its default credential chain.
+    """
+    if not key_path:
+        return None, None
+    try:
+        stamp = os.stat(key_path).st_mtime_ns
+    except FileNotFoundError:
+        stamp = None
+    key = (key_path, stamp)
+    with CREDENTIALS_LOCK:
+        credentials = CREDENTIALS.get(key)
+        if credentials is None:
+            config = configparser.ConfigParser()
+            config.read(key_path)
+            section = config['default'] if 'default' in config else {}
+            for stale in [k for k in CREDENTIALS if k[0] == key_path]:
+                del CREDENTIALS[stale]
+            credentials = CREDENTIALS[key] = (section.get('aws_access_key_id'), section.get('aws_secret_access_key'))
+    return credentials
+
+# ChatBedrock instances (and their boto3 clients) per (class, model, region, credentials, sampling)
+MODELS = rqs.LRUCache(32)
+
+def chat_model(cfg, payload):
+    """The cached ChatBedrock for cfg's region and credentials and the payload's model and sampling params."""
+    aws_access_key_id, aws_secret_access_key = load_credentials(getattr(cfg, 'key_path', None))
+    region = getattr(cfg, 'aws_region', 'us-east-1')
+    temperature = payload.get("temperature", 0.7)
+    max_tokens = payload.get("max_tokens", None)
+    key = (ChatBedrock, payload["model"], region, aws_access_key_id, aws_secret_access_key, temperature, max_tokens)
+    return MODELS.get(key, lambda: ChatBedrock(
+        model_id=payload["model"],
+        region_name=region,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        model_kwargs={
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+    ))
+
+def get_response(cfg, payload_builder, *builder_args, verify=True, params=None):
     """
     Use langchain_aws - Send Message to AWS Bedrock
     """
@@ -59,26 +110,8 @@ def get_response(cfg, payload_builder, *builder_args, verify=True):
             else:
                 raise ValueError(f"Invalid message: {msg}")
 
-        # Load AWS credentials from key_path if provided
-        aws_access_key_id = None
-        aws_secret_access_key = None
-        if hasattr(cfg, 'key_path') and cfg.key_path:
-            config = configparser.ConfigParser()
-            config.read(cfg.key_path)
-            if 'default' in config:
-                aws_access_key_id = config['default'].get('aws_access_key_id')
-                aws_secret_access_key = config['default'].get('aws_secret_access_key')
-
-        llm = ChatBedrock(
-            model_id=payload["model"],
-            region_name=getattr(cfg, 'aws_region', 'us-east-1'),
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            model_kwargs={
-                "temperature": payload.get("temperature", 0.7),
-                "max_tokens": payload.get("max_tokens", None),
-            }
-        )
+        # Reuse the ChatBedrock instance for these credentials and parameters
+        llm = chat_model(cfg, payload)
 
         response = llm.invoke(lc_messages)
 
@@ -131,3 +164,23 @@ def parse_response(cfg, payload_builder, *builder_args, verify=True):
 
     except (KeyError, IndexError, TypeError) as e:
         return f"Error parsing JSON response: {str(e)}", True
+
+def get_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True):
+    """
+    Use langchain_aws - get_response for each builder args in args_list on a bounded
+    thread pool, in input order; see rqs.run_many.
+    """
+    return rqs.run_many(
+        get_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify,
+    )
+
+def parse_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True):
+    """
+    Use langchain_aws - parse_response for each builder args in args_list on a bounded
+    thread pool, in input order; see rqs.run_many.
+    """
+    return rqs.run_many(
+        parse_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify,
+    )
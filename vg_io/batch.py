@@ -0,0 +1,130 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# batch.py
+# Dynamic micro-batching: concurrent submissions that share a key are
+# coalesced into one upstream call, then the results are split back out.
+# A batch is sent once it holds max_batch items or max_wait seconds after
+# its first item arrived, whichever comes first, and never holds more than
+# max_batch items unless a single submission is that large. When a coalesced
+# call fails on bad input (a 4xx, a ValueError, or the wrong number of
+# results), each submission is retried on its own so one caller's bad input
+# only fails that caller. Transport and 5xx errors fail the whole batch at
+# once; splitting those would only multiply calls to a failing upstream.
+
+import asyncio
+
+def input_error(e):
+    """True when e blames the inputs rather than the upstream."""
+    status = getattr(e, "status_code", None)
+    if isinstance(status, int):
+        return 400 <= status < 500 and status not in (408, 429)
+    return isinstance(e, (ValueError, TypeError, LookupError))
+
+class MicroBatcher:
+    """
+    call: async fn(key, items) -> list with one result per item.
+    submit(key, items) resolves to the results for just those items.
+    """
+
+    def __init__(self, call, max_batch=64, max_wait=0.005, splittable=input_error):
+        self.call = call
+        self.splittable = splittable
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = {}
+        self.timers = {}
+        self.batches = 0
+        self.items = 0
+        self.retries = 0
+        # The loop only keeps weak references to tasks
+        self.tasks = set()
+
+    def configure(self, max_batch=None, max_wait=None):
+        if max_batch:
+            self.max_batch = max_batch
+        if max_wait is not None:
+            self.max_wait = max_wait
+
+    async def submit(self, key, items):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # A submission bigger than a batch goes out on its own
+        if len(items) >= self.max_batch:
+            self.spawn(self.run(key, [(items, future)]))
+            return await future
+        # Cut the pending batch rather than letting these items push it past max_batch
+        if sum(len(i) for i, _ in self.pending.get(key, ())) + len(items) > self.max_batch:
+            self.flush(key)
+        batch = self.pending.setdefault(key, [])
+        batch.append((items, future))
+        if sum(len(i) for i, _ in batch) >= self.max_batch:
+            self.flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_wait, self.flush, key)
+        return await future
+
+    def flush(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(key, None)
+        if batch:
+            self.spawn(self.run(key, batch))
+
+    def spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def run(self, key, batch):
+        flat = [item for items, _ in batch for item in items]
+        self.batches += 1
+        self.items += len(flat)
+        try:
+            results = await self.call(key, flat)
+            if len(results) != len(flat):
+                raise ValueError(f"Batch call returned {len(results)} results for {len(flat)} items")
+        except asyncio.CancelledError as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        except Exception as e:
+            if len(batch) == 1 or not self.splittable(e):
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # One submission's bad input must not fail the others: retry each on its own
+            self.retries += 1
+            await asyncio.gather(*(self.run(key, [entry]) for entry in batch))
+            return
+        offset = 0
+        for items, future in batch:
+            if not future.done():
+                future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
@@ -0,0 +1,184 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# cascade.py
+# Cheap-model-first cascades. A cascade nickname lists its steps from
+# cheapest to most capable; each answer but the last is kept only if it
+# passes the configured acceptance check, otherwise the next step is tried.
+#
+# vg_cfg.json
+# "providers": {
+#   "cascade-chat": {
+#     "api": "cascade",
+#     "steps": ["groq-llama8", "aws-claude-sonnet"],
+#     "accept": {
+#       "json": true,
+#       "json_schema": {"type": "object", "required": ["answer"]},
+#       "regex": "\\S",
+#       "min_length": 1,
+#       "max_length": 20000,
+#       "min_logprob": -1.0,
+#       "finish_reasons": ["stop"]
+#     }
+#   }
+# }
+# Every check is optional. json_schema supports the type, required,
+# properties, items, enum and additionalProperties keywords. min_logprob is
+# the mean token logprob; steps that return no logprobs fail it.
+
+import json, re, time
+
+TYPES = {
+    "object": dict, "array": list, "string": str, "boolean": bool,
+    "integer": int, "number": (int, float), "null": type(None),
+}
+
+def schema_errors(schema, value, path="$"):
+    """Validate value against a JSON schema subset; returns a list of error strings."""
+    errors = []
+    expected = schema.get("type")
+    if expected:
+        names = expected if isinstance(expected, list) else [expected]
+        ok = any(
+            isinstance(value, TYPES[name]) and not (name in ("integer", "number") and isinstance(value, bool))
+            for name in names if name in TYPES
+        )
+        if not ok:
+            return [f"{path}: expected {expected}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: not one of {schema['enum']}")
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}: missing {name}")
+        for name, item in value.items():
+            if name in properties:
+                errors.extend(schema_errors(properties[name], item, f"{path}.{name}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected {name}")
+    elif isinstance(value, list) and isinstance(schema.get("items"), dict):
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(schema["items"], item, f"{path}[{i}]"))
+    return errors
+
+def mean_logprob(choice):
+    tokens = ((choice.get("logprobs") or {}).get("content")) or []
+    if not tokens:
+        return None
+    return sum(token.get("logprob", 0.0) for token in tokens) / len(tokens)
+
+class Acceptance:
+    """An "accept" block compiled once: call it with a chat.completion."""
+
+    def __init__(self, accept=None):
+        accept = accept or {}
+        if not isinstance(accept, dict):
+            accept = vars(accept)
+        self.json = bool(accept.get("json")) or "json_schema" in accept
+        schema = accept.get("json_schema")
+        self.schema = json.loads(json.dumps(schema, default=vars)) if schema is not None else None
+        self.regex = re.compile(accept["regex"], re.S) if accept.get("regex") else None
+        self.min_length = accept.get("min_length")
+        self.max_length = accept.get("max_length")
+        self.min_logprob = accept.get("min_logprob")
+        self.finish_reasons = frozenset(accept["finish_reasons"]) if accept.get("finish_reasons") else None
+
+    @property
+    def logprobs(self):
+        """True when the upstream must be asked for logprobs."""
+        return self.min_logprob is not None
+
+    def __call__(self, completion):
+        """Return (accepted, reason)."""
+        try:
+            choice = completion["choices"][0]
+            content = choice["message"].get("content") or ""
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return False, "no answer"
+        if self.finish_reasons and choice.get("finish_reason") not in self.finish_reasons:
+            return False, f"finish_reason {choice.get('finish_reason')}"
+        if self.min_length is not None and len(content) < self.min_length:
+            return False, "too short"
+        if self.max_length is not None and len(content) > self.max_length:
+            return False, "too long"
+        if self.regex and not self.regex.search(content):
+            return False, "regex did not match"
+        if self.json:
+            try:
+                value = json.loads(content)
+            except ValueError:
+                return False, "not JSON"
+            if self.schema is not None:
+                errors = schema_errors(self.schema, value)
+                if errors:
+                    return False, errors[0]
+        if self.min_logprob is not None:
+            logprob = mean_logprob(choice)
+            if logprob is None:
+                return False, "no logprobs"
+            if logprob < self.min_logprob:
+                return False, f"mean logprob {logprob:.3f}"
+        return True, None
+
+class Checks:
+    """Compiled Acceptance per cascade nickname, rebuilt when the config version changes."""
+
+    def __init__(self):
+        self.compiled = {}
+
+    def get(self, nickname, accept, version=None):
+        key = (nickname, version)
+        check = self.compiled.get(key) if version is not None else None
+        if check is None:
+            check = Acceptance(accept)
+            if version is not None:
+                self.compiled = {k: v for k, v in self.compiled.items() if k[0] != nickname}
+                self.compiled[key] = check
+        return check
+
+def strip_logprobs(completion):
+    """Drop every choice's logprobs in place (the cascade asked for them, not the caller)."""
+    for choice in completion.get("choices") or []:
+        if isinstance(choice, dict):
+            choice.pop("logprobs", None)
+    return completion
+
+def as_chunks(completion):
+    """A finished chat.completion as chat.completion.chunk dicts, for callers that asked to stream."""
+    base = {"id": completion.get("id"), "object": "chat.completion.chunk",
+            "created": completion.get("created", int(time.time())), "model": completion.get("model")}
+    for choice in completion.get("choices", []):
+        message = choice.get("message", {})
+        delta = {"role": "assistant", "content": message.get("content")}
+        if message.get("tool_calls"):
+            delta["tool_calls"] = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+        first = {"index": choice.get("index", 0), "delta": delta, "finish_reason": None}
+        if choice.get("logprobs") is not None:
+            first["logprobs"] = choice["logprobs"]
+        yield dict(base, choices=[first])
+        yield dict(base, choices=[{"index": choice.get("index", 0), "delta": {}, "finish_reason": choice.get("finish_reason")}])
+    if completion.get("usage"):
+        yield dict(base, choices=[], usage=completion["usage"])
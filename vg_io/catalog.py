@@ -0,0 +1,133 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# catalog.py
+# The /models listing. Entries come from the provider registry
+# (vg_cfg.json), optionally enriched with the upstream's own /models
+# catalog for providers that set "catalog": true. Serialized snapshots are
+# cached with their ETag so polling clients cost one stat and a dict lookup.
+
+import hashlib, json, threading, time, requests
+
+def capabilities(provider):
+    """provider.capabilities, else inferred from the url/model."""
+    caps = getattr(provider, "capabilities", None)
+    if caps:
+        return list(caps)
+    url = getattr(provider, "url", "") or ""
+    if url.endswith("/embeddings") or "embed" in (getattr(provider, "model", None) or ""):
+        return ["embeddings"]
+    return ["chat"]
+
+def catalog_url(provider):
+    url = provider.url
+    for suffix in ("/chat/completions", "/embeddings"):
+        if url.endswith(suffix):
+            url = url[:-len(suffix)]
+    return url.rstrip("/") + "/models"
+
+def model_entry(nickname, provider, upstream=None):
+    entry = {
+        "id": nickname,
+        "object": "model",
+        "owned_by": "vanity-gateway",
+        "api": provider.api,
+        "upstream_model": getattr(provider, "model", None),
+        "capabilities": capabilities(provider),
+    }
+    for name in ("region", "context_length", "targets", "steps"):
+        if hasattr(provider, name):
+            entry[name] = getattr(provider, name)
+    if upstream:
+        entry["upstream"] = upstream
+    return entry
+
+def fetch_upstream(provider, key=None, timeout=10):
+    """Return {model_id: info} from the provider's /models, or {} on any error."""
+    headers = {"Authorization": f"Bearer {key}"} if key else {}
+    try:
+        resp = requests.get(catalog_url(provider), headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        return {m["id"]: m for m in resp.json().get("data", []) if "id" in m}
+    except Exception as e:
+        print(f"Error fetching model catalog from {catalog_url(provider)}: {e}")
+        return {}
+
+class Catalog:
+    """
+    Precomputed /models snapshots keyed by (config mtime, upstream version,
+    allowed nicknames).
+    """
+
+    def __init__(self):
+        self.upstream = {}
+        self.version = 0
+        self.snapshots = {}
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def snapshot(self, providers, mtime, allowed=None):
+        """
+        providers: callable returning the registry's providers namespace,
+        only invoked when the cached snapshot is stale.
+        Returns (body_bytes, etag).
+        """
+        key = (mtime, self.version, allowed)
+        cached = self.snapshots.get(key)
+        if cached is not None:
+            return cached
+        entries = [
+            model_entry(nickname, provider, self.upstream.get(nickname))
+            for nickname, provider in vars(providers()).items()
+            if allowed is None or nickname in allowed
+        ]
+        body = json.dumps({"object": "list", "data": entries}, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        with self.lock:
+            # Old snapshots are useless once the config or upstream data changed
+            self.snapshots = {k: v for k, v in self.snapshots.items() if k[:2] == key[:2]}
+            self.snapshots[key] = (body, etag)
+        return body, etag
+
+    def refresh(self, providers, read_key):
+        """Fetch upstream catalogs for providers with "catalog": true (blocking)."""
+        upstream = {}
+        fetched = {}
+        for nickname, provider in vars(providers).items():
+            if not getattr(provider, "catalog", False):
+                continue
+            key_path = getattr(provider, "key_path", None)
+            cache_key = (catalog_url(provider), key_path)
+            if cache_key not in fetched:
+                fetched[cache_key] = fetch_upstream(provider, read_key(key_path) if key_path else None)
+            info = fetched[cache_key].get(provider.model)
+            if info:
+                upstream[nickname] = info
+        with self.lock:
+            if upstream != self.upstream:
+                self.upstream = upstream
+                self.version += 1
+            self.refreshed_at = time.time()
+        return upstream
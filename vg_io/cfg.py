@@ -1,4 +1,5 @@
 
+# coding=utf-8
 # Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
 #
 # Permission is  hereby  granted,  free  of  charge,  to  any  person
@@ -22,33 +23,246 @@
 # DEALINGS IN THE SOFTWARE.
 ###################################
 
-# oai.py
+# cfg.py
+# Client configuration for the vg_io clients (rqs, arqs, oai, aws).
+# load_from_file() and inline_set() validate the JSON once into slotted,
+# typed records, so a wrong type or a missing field fails at load time
+# instead of deep inside a request:
+#
+#   {"projectConfig": {"gateway_url": str, "nickname": str, "parameters": {...},
+#                      "pool_size": int, "retries": int, "backoff": number,
+#                      "timeout": number, "cache": {"path": str, "max_mb": number, "enabled": bool}},
+#    "key_path": str, "aws_region": str}
+#
+# Unknown keys are kept (readable as attributes) with a warning, so a typo is
+# reported without breaking configs that carry extra settings. Records are
+# frozen and shared: parsing is memoized by (file, mtime) or by the JSON text,
+# and the secret key is read on first use of cfg.secret_k and cached by
+# (key file, mtime). To change a setting, build a new record with replace():
+#
+#   cfg = cfg.replace(projectConfig=cfg.projectConfig.replace(nickname="other"))
+#
+# Optional fields that are absent stay unset (hasattr() is False), matching
+# the SimpleNamespace cfgs these replace.
+
+import collections.abc, functools, json, os, threading, warnings
+
+NUMBER = (int, float)
+
+class Record:
+    """Frozen, slotted config record built from JSON by build(); unknown keys live in extra."""
+    __slots__ = ("extra",)
+    # name -> (type or Record subclass, required)
+    FIELDS = {}
+
+    @classmethod
+    def build(cls, data, where):
+        if not isinstance(data, dict):
+            raise ValueError(f"{where} must be an object")
+        unknown = sorted(set(data) - set(cls.FIELDS))
+        if unknown:
+            warnings.warn(f"{where}: unknown key(s) {', '.join(unknown)}; expected {', '.join(cls.FIELDS)}", stacklevel=2)
+        record = object.__new__(cls)
+        object.__setattr__(record, "extra", {name: data[name] for name in unknown})
+        for name, (kind, required) in cls.FIELDS.items():
+            if name not in data:
+                if required:
+                    raise ValueError(f"{where}.{name} is required")
+                continue
+            object.__setattr__(record, name, check(kind, data[name], f"{where}.{name}"))
+        return record
+
+    def replace(self, **changes):
+        """A new record with changes applied (known fields are type-checked); self is untouched."""
+        record = object.__new__(type(self))
+        for name in slot_names(type(self)):
+            try:
+                object.__setattr__(record, name, object.__getattribute__(self, name))
+            except AttributeError:
+                pass
+        extra = dict(self.extra)
+        for name, value in changes.items():
+            if name in self.FIELDS:
+                value = check(self.FIELDS[name][0], value, f"{type(self).__name__}.{name}")
+                object.__setattr__(record, name, value)
+            elif name in slot_names(type(self)):
+                object.__setattr__(record, name, value)
+            else:
+                extra[name] = value
+        object.__setattr__(record, "extra", extra)
+        return record
+
+    def copy(self):
+        return self.replace()
+
+    def __getattr__(self, name):
+        # Only reached for unset slots and unknown names
+        try:
+            return object.__getattribute__(self, "extra")[name]
+        except (KeyError, AttributeError):
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is frozen; use replace({name}=...)")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is frozen; use replace()")
+
+    def __repr__(self):
+        fields = [f"{name}={getattr(self, name)!r}" for name in self.FIELDS if hasattr(self, name)]
+        fields += [f"{name}={value!r}" for name, value in self.extra.items()]
+        return f"{type(self).__name__}({', '.join(fields)})"
+
+@functools.lru_cache(maxsize=None)
+def slot_names(cls):
+    return tuple(name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ()))
+
+def check(kind, value, where):
+    """value validated as kind (a type tuple or a Record/Parameters class)."""
+    if isinstance(kind, type) and hasattr(kind, "build"):
+        if isinstance(value, kind):
+            return value
+        return kind.build(value, where)
+    kinds = kind if isinstance(kind, tuple) else (kind,)
+    if isinstance(value, bool) and bool not in kinds or not isinstance(value, kinds):
+        names = " or ".join("number" if k is float else k.__name__ for k in kinds if not (k is int and float in kinds))
+        raise ValueError(f"{where} must be {names}, not {type(value).__name__}")
+    return value
+
+class Parameters(collections.abc.Mapping):
+    """Frozen model parameters, readable as attributes or as a mapping (dict(params))."""
+    __slots__ = ("values",)
+
+    @classmethod
+    def build(cls, data, where):
+        if not isinstance(data, dict):
+            raise ValueError(f"{where} must be an object")
+        record = object.__new__(cls)
+        object.__setattr__(record, "values", dict(data))
+        return record
+
+    def replace(self, **changes):
+        return Parameters.build(dict(self.values, **changes), "parameters")
+
+    def copy(self):
+        return self.replace()
+
+    def __getattr__(self, name):
+        try:
+            return object.__getattribute__(self, "values")[name]
+        except (KeyError, AttributeError):
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Parameters are frozen; use replace({name}=...)")
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"Parameters({self.values!r})"
+
+# Secret keys per (key file, mtime, size), so each version is read once
+SECRETS = {}
+SECRETS_LOCK = threading.Lock()
+
+def read_secret(secret_key_path):
+    """The stripped contents of secret_key_path, re-read only when the file changes."""
+    stat = os.stat(secret_key_path)
+    key = (secret_key_path, stat.st_mtime_ns, stat.st_size)
+    secret = SECRETS.get(key)
+    if secret is None:
+        with open(secret_key_path, "r") as f:
+            secret = f.read().strip()
+        with SECRETS_LOCK:
+            for stale in [k for k in SECRETS if k[0] == secret_key_path]:
+                del SECRETS[stale]
+            SECRETS[key] = secret
+    return secret
+
+class CacheConfig(Record):
+    __slots__ = ("path", "max_mb", "enabled")
+    FIELDS = {"path": (str, True), "max_mb": (NUMBER, False), "enabled": (bool, False)}
+
+class ProjectConfig(Record):
+    __slots__ = ("gateway_url", "nickname", "parameters", "pool_size", "retries", "backoff", "timeout", "cache")
+    FIELDS = {
+        "gateway_url": (str, True),
+        "nickname": (str, True),
+        "parameters": (Parameters, False),
+        "pool_size": (int, False),
+        "retries": (int, False),
+        "backoff": (NUMBER, False),
+        "timeout": (NUMBER, False),
+        "cache": (CacheConfig, False),
+    }
+
+    @classmethod
+    def build(cls, data, where):
+        record = super().build(data, where)
+        if not hasattr(record, "parameters"):
+            object.__setattr__(record, "parameters", Parameters.build({}, f"{where}.parameters"))
+        return record
+
+class ClientConfig(Record):
+    """
+    projectConfig plus the bearer key, read from secret_key_path on use of secret_k
+    (or given with replace(secret_k=...)). key_path/aws_region are the AWS
+    credentials file and region used by vg_io.aws.
+    """
+    __slots__ = ("projectConfig", "key_path", "aws_region", "secret_key_path", "secret")
+    FIELDS = {
+        "projectConfig": (ProjectConfig, True),
+        "key_path": (str, False),
+        "aws_region": (str, False),
+    }
+
+    @property
+    def secret_k(self):
+        try:
+            return object.__getattribute__(self, "secret")
+        except AttributeError:
+            return read_secret(self.secret_key_path)
+
+    def replace(self, **changes):
+        if "secret_k" in changes:
+            changes["secret"] = changes.pop("secret_k")
+        return super().replace(**changes)
+
+@functools.lru_cache(maxsize=256)
+def parse(raw_json):
+    """Validated ClientConfig for a JSON document, memoized on its text."""
+    return ClientConfig.build(json.loads(raw_json), "cfg")
+
+@functools.lru_cache(maxsize=256)
+def client_config(parsed, secret_key_path):
+    """parsed bound to secret_key_path; the same frozen record for the same pair."""
+    return parsed.replace(secret_key_path=secret_key_path)
 
-import json, types
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-import time
-import random
+# Parsed configs per (file, mtime, size); stale versions are dropped
+LOADED = {}
+LOADED_LOCK = threading.Lock()
 
 def load_from_file(target_file, secret_key_path):
-    with open(target_file, "r", encoding="utf-8") as f:
-        cfg = json.load(f, object_hook=lambda d: types.SimpleNamespace(**d))
-    with open(secret_key_path, "r") as f:
-        cfg.secret_k = f.read().strip()        
-    return cfg
+    """Validated ClientConfig for a JSON file; the file is only re-parsed when it changes."""
+    target = os.stat(target_file)
+    key = (target_file, target.st_mtime_ns, target.st_size)
+    parsed = LOADED.get(key)
+    if parsed is None:
+        with open(target_file, "r", encoding="utf-8") as f:
+            parsed = parse(f.read())
+        with LOADED_LOCK:
+            for stale in [k for k in LOADED if k[0] == target_file]:
+                del LOADED[stale]
+            LOADED[key] = parsed
+    return client_config(parsed, secret_key_path)
 
 def inline_set(raw_json, secret_key_path):
-    # import types, json
-    # Convert dict -> SimpleNamespace recursively
-    def to_ns(obj):
-        if isinstance(obj, dict):
-            return types.SimpleNamespace(**{k: to_ns(v) for k, v in obj.items()})
-        if isinstance(obj, list):
-            return [to_ns(x) for x in obj]
-        return obj
-    # Parse the JSON string passed in
-    raw_cfg = json.loads(raw_json)
-    cfg = to_ns(raw_cfg)
-    with open(secret_key_path, "r") as f:
-        cfg.secret_k = f.read().strip()
-    return cfg
+    """Validated ClientConfig for a JSON string; parsing is memoized on the text."""
+    return client_config(parse(raw_json), secret_key_path)
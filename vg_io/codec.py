@@ -0,0 +1,245 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# codec.py
+# gzip/zstd bodies for the gateway: decoding compressed request bodies,
+# negotiating compressed responses (flushing per chunk so SSE events are
+# not held back) and compressing upstream request bodies.
+# zstd needs the optional zstandard package; without it only gzip/deflate
+# are offered.
+
+import gzip, io, zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAX_DECODED_BYTES = 32 * 1024 * 1024
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+def available_encodings():
+    """Encodings we can produce, in order of preference."""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+def decode_body(body, encoding, max_size=MAX_DECODED_BYTES):
+    """
+    Decompress a request body. Raises ValueError for unsupported encodings,
+    corrupt or truncated data, or bodies that inflate past max_size.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits 47 auto-detects gzip or zlib headers
+        d = zlib.decompressobj(47)
+        try:
+            out = d.decompress(body, max_size + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid {encoding} body: {e}")
+        complete = d.eof
+    elif encoding == "zstd" and zstandard is not None:
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                out = reader.read(max_size + 1)
+            # The reader stops quietly at a cut-off frame; once the size is known
+            # to be bounded, a decompressobj pass tells whether the frame ended
+            complete = True
+            if len(out) <= max_size:
+                d = zstandard.ZstdDecompressor().decompressobj()
+                d.decompress(body)
+                complete = d.eof
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}")
+    else:
+        raise ValueError(f"Unsupported Content-Encoding {encoding}")
+    if len(out) > max_size:
+        raise ValueError(f"Decoded body exceeds {max_size} bytes")
+    if not complete:
+        raise ValueError(f"Truncated {encoding} body")
+    return out
+
+def encode_body(body, encoding):
+    """Compress a whole body (used for upstream requests)."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported Content-Encoding {encoding}")
+
+def pick_encoding(accept_encoding):
+    """
+    Choose a response encoding from an Accept-Encoding header, or None.
+    Honours q-values; ties go to our own preference order.
+    """
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = offered.get(encoding, offered.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class StreamCompressor:
+    """Compressor that flushes after every chunk so each chunk is decodable on arrival."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self.obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif encoding == "zstd" and zstandard is not None:
+            self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            raise ValueError(f"Unsupported Content-Encoding {encoding}")
+
+    def compress(self, chunk):
+        if self.encoding == "gzip":
+            return self.obj.compress(chunk) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+        return self.obj.compress(chunk) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.obj.flush()
+
+def header(headers, name):
+    for k, v in headers:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+class CompressionMiddleware:
+    """
+    ASGI middleware: inflates gzip/deflate/zstd request bodies and compresses
+    responses according to Accept-Encoding. Streaming responses are
+    compressed chunk by chunk with a flush after each one.
+    """
+
+    def __init__(self, app, min_size=MIN_COMPRESS_BYTES, max_decoded=MAX_DECODED_BYTES):
+        self.app = app
+        self.min_size = min_size
+        self.max_decoded = max_decoded
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        content_encoding = header(scope["headers"], b"content-encoding")
+        if content_encoding and content_encoding.strip().lower() != "identity":
+            chunks, size = [], 0
+            more = True
+            while more:
+                message = await receive()
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                # Compressed bytes never legitimately outgrow the decoded limit
+                if size > self.max_decoded:
+                    return await self.reject(send, 413, f"Request body exceeds {self.max_decoded} bytes")
+                chunks.append(chunk)
+                more = message.get("more_body", False)
+            body = b"".join(chunks)
+            try:
+                body = decode_body(body, content_encoding, self.max_decoded)
+            except ValueError as e:
+                status = 415 if "Unsupported" in str(e) else 400
+                return await self.reject(send, status, str(e))
+            scope = dict(scope)
+            scope["headers"] = [(k, v) for k, v in scope["headers"]
+                                if k.lower() not in (b"content-encoding", b"content-length")]
+            scope["headers"].append((b"content-length", str(len(body)).encode()))
+            receive = self.replay(body, receive)
+
+        encoding = pick_encoding(header(scope["headers"], b"accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, self.compressing_send(send, encoding))
+
+    def replay(self, body, receive):
+        sent = False
+        async def wrapped():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        return wrapped
+
+    async def reject(self, send, status, detail):
+        body = ('{"detail": "%s"}' % detail.replace('"', "'")).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    def compressing_send(self, send, encoding):
+        start = None
+        compressor = None
+
+        async def wrapped(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = start["headers"]
+                content_type = header(headers, b"content-type") or ""
+                eligible = (
+                    header(headers, b"content-encoding") is None
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and (more or len(body) >= self.min_size)
+                )
+                if not eligible:
+                    await send(start)
+                    start = {}
+                    compressor = False
+                    return await send(message)
+                compressor = StreamCompressor(encoding)
+                start = dict(start)
+                start["headers"] = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                start["headers"] += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                await send(start)
+            if compressor is False:
+                return await send(message)
+            data = compressor.compress(body) if body else b""
+            if not more:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        return wrapped
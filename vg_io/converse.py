@@ -0,0 +1,271 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# converse.py
+# Native Bedrock adapter: maps OpenAI chat payloads straight onto the
+# Bedrock Converse / ConverseStream API of a shared bedrock-runtime client
+# and maps the answers back, without building LangChain message objects.
+# Tool calls, stop reasons and token usage are carried across both ways.
+
+import base64, json, random, time
+
+# Bedrock stopReason -> OpenAI finish_reason
+FINISH_REASONS = {
+    "end_turn": "stop",
+    "stop_sequence": "stop",
+    "max_tokens": "length",
+    "tool_use": "tool_calls",
+    "guardrail_intervened": "content_filter",
+    "content_filtered": "content_filter",
+}
+
+IMAGE_FORMATS = {"image/png": "png", "image/jpeg": "jpeg", "image/gif": "gif", "image/webp": "webp"}
+
+def completion_id():
+    return "chatcmpl-" + "".join(random.choices("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890", k=29))
+
+def image_block(url):
+    """Only inline data: urls can be sent; Converse does not fetch remote images."""
+    if not url.startswith("data:") or ";base64," not in url:
+        raise ValueError("Only base64 data: image urls are supported for Bedrock")
+    media_type, data = url[5:].split(";base64,", 1)
+    if media_type not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image type {media_type}")
+    return {"image": {"format": IMAGE_FORMATS[media_type], "source": {"bytes": base64.b64decode(data)}}}
+
+def content_blocks(content):
+    """OpenAI message content (string or list of parts) -> Converse content blocks."""
+    if not content:
+        return []
+    if isinstance(content, str):
+        return [{"text": content}]
+    blocks = []
+    for part in content:
+        kind = part.get("type")
+        if kind == "text":
+            if part.get("text"):
+                blocks.append({"text": part["text"]})
+        elif kind == "image_url":
+            image = part["image_url"]
+            blocks.append(image_block(image["url"] if isinstance(image, dict) else image))
+        else:
+            raise ValueError(f"Unsupported content part {kind}")
+    return blocks
+
+def tool_use_block(call):
+    function = call["function"]
+    arguments = function.get("arguments") or "{}"
+    return {"toolUse": {
+        "toolUseId": call["id"],
+        "name": function["name"],
+        "input": json.loads(arguments) if isinstance(arguments, str) else arguments,
+    }}
+
+def tool_result_block(msg):
+    content = msg.get("content")
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") for part in content)
+    return {"toolResult": {"toolUseId": msg["tool_call_id"], "content": [{"text": content or ""}]}}
+
+def tool_config(payload):
+    """OpenAI tools/tool_choice -> Converse toolConfig, or None."""
+    tools = payload.get("tools")
+    choice = payload.get("tool_choice")
+    if not tools or choice == "none":
+        return None
+    config = {"tools": [{"toolSpec": {
+        "name": tool["function"]["name"],
+        "description": tool["function"].get("description") or tool["function"]["name"],
+        "inputSchema": {"json": tool["function"].get("parameters") or {"type": "object", "properties": {}}},
+    }} for tool in tools]}
+    if choice == "required":
+        config["toolChoice"] = {"any": {}}
+    elif isinstance(choice, dict):
+        config["toolChoice"] = {"tool": {"name": choice["function"]["name"]}}
+    elif choice == "auto":
+        config["toolChoice"] = {"auto": {}}
+    return config
+
+def to_converse(payload, model):
+    """OpenAI chat payload -> keyword arguments for converse()/converse_stream()."""
+    system, messages = [], []
+    for msg in payload.get("messages", []):
+        role = msg.get("role")
+        if role in ("system", "developer"):
+            system.extend(content_blocks(msg.get("content")))
+            continue
+        if role == "user":
+            blocks = content_blocks(msg.get("content"))
+        elif role == "assistant":
+            blocks = content_blocks(msg.get("content"))
+            blocks.extend(tool_use_block(call) for call in msg.get("tool_calls") or [])
+        elif role == "tool":
+            role, blocks = "user", [tool_result_block(msg)]
+        else:
+            raise ValueError(f"Invalid message: {msg}")
+        if not blocks:
+            continue
+        # Converse wants strictly alternating roles; merge consecutive turns
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"].extend(blocks)
+        else:
+            messages.append({"role": role, "content": blocks})
+
+    request = {"modelId": model, "messages": messages}
+    if system:
+        request["system"] = system
+    inference = {}
+    max_tokens = payload.get("max_completion_tokens", payload.get("max_tokens"))
+    if max_tokens is not None:
+        inference["maxTokens"] = int(max_tokens)
+    if payload.get("temperature") is not None:
+        inference["temperature"] = float(payload["temperature"])
+    if payload.get("top_p") is not None:
+        inference["topP"] = float(payload["top_p"])
+    stop = payload.get("stop")
+    if stop:
+        inference["stopSequences"] = [stop] if isinstance(stop, str) else list(stop)
+    if inference:
+        request["inferenceConfig"] = inference
+    tools = tool_config(payload)
+    if tools:
+        request["toolConfig"] = tools
+    return request
+
+def openai_usage(usage):
+    """
+    Converse usage -> OpenAI usage. Bedrock's inputTokens excludes prompt cache
+    reads and writes while OpenAI's prompt_tokens includes them, so they are added in.
+    """
+    if not usage:
+        return {}
+    out = {
+        "prompt_tokens": usage.get("inputTokens", 0),
+        "completion_tokens": usage.get("outputTokens", 0),
+        "total_tokens": usage.get("totalTokens", usage.get("inputTokens", 0) + usage.get("outputTokens", 0)),
+    }
+    if "cacheReadInputTokens" in usage or "cacheWriteInputTokens" in usage:
+        read = usage.get("cacheReadInputTokens", 0)
+        write = usage.get("cacheWriteInputTokens", 0)
+        out["prompt_tokens"] += read + write
+        out["total_tokens"] = out["prompt_tokens"] + out["completion_tokens"]
+        out["prompt_tokens_details"] = {"cached_tokens": read}
+        out["cache_read_input_tokens"] = read
+        out["cache_creation_input_tokens"] = write
+    return out
+
+def from_converse(response, model):
+    """Converse response -> OpenAI chat.completion."""
+    text, tool_calls = [], []
+    for block in response.get("output", {}).get("message", {}).get("content", []):
+        if "text" in block:
+            text.append(block["text"])
+        elif "toolUse" in block:
+            use = block["toolUse"]
+            tool_calls.append({
+                "id": use["toolUseId"],
+                "type": "function",
+                "function": {"name": use["name"], "arguments": json.dumps(use.get("input", {}))},
+            })
+    message = {"role": "assistant", "content": "".join(text) if text or not tool_calls else None}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": completion_id(),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": FINISH_REASONS.get(response.get("stopReason"), "stop"),
+        }],
+        "usage": openai_usage(response.get("usage")),
+    }
+
+def stream_chunks(events, model):
+    """
+    ConverseStream events -> OpenAI chat.completion.chunk dicts. The final
+    chunk (from the metadata event) has no choices and carries the usage.
+    The event stream is closed when this generator is, even part-way through.
+    """
+    base = {"id": completion_id(), "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    tools = {}  # contentBlockIndex -> OpenAI tool_calls index
+
+    def chunk(delta, finish_reason=None):
+        return dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+    try:
+        for event in events:
+            if "messageStart" in event:
+                yield chunk({"role": "assistant", "content": ""})
+            elif "contentBlockStart" in event:
+                start = event["contentBlockStart"]
+                use = start.get("start", {}).get("toolUse")
+                if use:
+                    index = tools[start["contentBlockIndex"]] = len(tools)
+                    yield chunk({"tool_calls": [{
+                        "index": index, "id": use["toolUseId"], "type": "function",
+                        "function": {"name": use["name"], "arguments": ""},
+                    }]})
+            elif "contentBlockDelta" in event:
+                block = event["contentBlockDelta"]
+                delta = block.get("delta", {})
+                if "text" in delta:
+                    yield chunk({"content": delta["text"]})
+                elif "toolUse" in delta:
+                    yield chunk({"tool_calls": [{
+                        "index": tools.get(block["contentBlockIndex"], 0),
+                        "function": {"arguments": delta["toolUse"].get("input", "")},
+                    }]})
+            elif "messageStop" in event:
+                yield chunk({}, FINISH_REASONS.get(event["messageStop"].get("stopReason"), "stop"))
+            elif "metadata" in event:
+                yield dict(base, choices=[], usage=openai_usage(event["metadata"].get("usage")))
+            else:
+                for name in ("internalServerException", "modelStreamErrorException", "throttlingException",
+                             "validationException", "serviceUnavailableException"):
+                    if name in event:
+                        raise RuntimeError(f"{name}: {event[name].get('message', '')}")
+    finally:
+        # Hands botocore's connection back (or drops it) when the client goes away
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
+
+def converse(client, payload, model, request=None):
+    """Blocking Converse call; returns an OpenAI chat.completion. request overrides to_converse()."""
+    return from_converse(client.converse(**(request or to_converse(payload, model))), model)
+
+def converse_stream(client, payload, model, request=None):
+    """Blocking ConverseStream call; returns a generator of OpenAI chunks."""
+    response = client.converse_stream(**(request or to_converse(payload, model)))
+    return stream_chunks(response["stream"], model)
+
+def error_response(e):
+    """botocore ClientError -> (OpenAI style error body, HTTP status)."""
+    error = getattr(e, "response", {}).get("Error", {})
+    status = getattr(e, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode") or 502
+    return {"error": {"message": error.get("Message", str(e)), "type": error.get("Code", type(e).__name__)}}, status
@@ -0,0 +1,259 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# dnsc.py
+# In-process DNS cache for upstream connections. Answers are kept for their
+# TTL (when dnspython is installed; otherwise default_ttl), refreshed in the
+# background before they expire, and served stale if a refresh fails.
+# Connections try the cached addresses happy-eyeballs style: the next
+# address is started if the previous one has not connected after a short
+# delay, alternating address families, and the first to connect wins.
+# CachedDnsAdapter plugs this into a requests.Session.
+
+import errno, os, selectors, socket, threading, time
+import requests.adapters
+import urllib3.connection, urllib3.connectionpool, urllib3.exceptions
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+try:
+    import dns.resolver as dns_resolver
+except ImportError:
+    dns_resolver = None
+
+def system_lookup(host, port):
+    """Resolve with getaddrinfo; returns (addrinfos, ttl or None)."""
+    return socket.getaddrinfo(host, port, type=socket.SOCK_STREAM), None
+
+def dnspython_lookup(host, port):
+    """Resolve A/AAAA with dnspython so the record TTL is known."""
+    infos, ttls = [], []
+    for rdtype, family in (("AAAA", socket.AF_INET6), ("A", socket.AF_INET)):
+        try:
+            answer = dns_resolver.resolve(host, rdtype)
+        except Exception:
+            continue
+        ttls.append(answer.rrset.ttl)
+        for record in answer:
+            sockaddr = (record.address, port, 0, 0) if family == socket.AF_INET6 else (record.address, port)
+            infos.append((family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", sockaddr))
+    if not infos:
+        # /etc/hosts names, IP literals, search domains: leave those to the system
+        return system_lookup(host, port)
+    return infos, min(ttls)
+
+def interleave(infos):
+    """Alternate address families, starting with the resolver's first choice."""
+    if not infos:
+        return []
+    first = [i for i in infos if i[0] == infos[0][0]]
+    other = [i for i in infos if i[0] != infos[0][0]]
+    out = []
+    for pair in zip(first, other):
+        out.extend(pair)
+    longer = first if len(first) > len(other) else other
+    return out + longer[min(len(first), len(other)):]
+
+def happy_eyeballs(infos, timeout=None, delay=0.25, source_address=None, socket_options=None):
+    """Connect to the first address that answers, staggering attempts by delay seconds."""
+    infos = interleave(infos)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    sel = selectors.DefaultSelector()
+    pending = []
+    errors = []
+    next_index, next_start = 0, 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            if next_index < len(infos) and (not pending or now >= next_start):
+                family, type_, proto, _, sockaddr = infos[next_index]
+                next_index += 1
+                sock = socket.socket(family, type_, proto)
+                try:
+                    for opt in socket_options or ():
+                        sock.setsockopt(*opt)
+                    if source_address:
+                        sock.bind(source_address)
+                    sock.setblocking(False)
+                    sock.connect_ex(sockaddr)
+                except OSError as e:
+                    errors.append(e)
+                    sock.close()
+                    continue
+                sel.register(sock, selectors.EVENT_WRITE)
+                pending.append(sock)
+                next_start = now + delay
+                continue
+            if not pending:
+                raise errors[-1] if errors else OSError("No addresses to connect to")
+            if deadline is not None and now >= deadline:
+                raise socket.timeout("timed out")
+            wait = None if deadline is None else deadline - now
+            if next_index < len(infos):
+                wait = next_start - now if wait is None else min(wait, next_start - now)
+            for key, _ in sel.select(None if wait is None else max(wait, 0)):
+                sock = key.fileobj
+                sel.unregister(sock)
+                pending.remove(sock)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0:
+                    sock.setblocking(True)
+                    sock.settimeout(timeout)
+                    return sock
+                errors.append(OSError(err, f"{os.strerror(err)} ({errno.errorcode.get(err, err)})"))
+                sock.close()
+                # A refused/unreachable address should not hold up the next one
+                next_start = now
+    finally:
+        for sock in pending:
+            sock.close()
+        sel.close()
+
+class DnsCache:
+    def __init__(self, default_ttl=60.0, min_ttl=5.0, max_ttl=600.0, stale_ttl=300.0,
+                 idle_ttl=600.0, happy_eyeballs_delay=0.25, lookup=None):
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.stale_ttl = stale_ttl
+        self.idle_ttl = idle_ttl
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+        self.lookup = lookup or (dnspython_lookup if dns_resolver is not None else system_lookup)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats_ = {"hits": 0, "misses": 0, "stale": 0, "lookups": 0, "failures": 0,
+                       "lookup_ms_total": 0.0, "lookup_ms_max": 0.0}
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if value is not None and hasattr(self, name):
+                setattr(self, name, value)
+
+    def fetch(self, host, port):
+        """Resolve now and store the answer; raises socket.gaierror."""
+        started = time.monotonic()
+        try:
+            infos, ttl = self.lookup(host, port)
+        except OSError:
+            with self.lock:
+                self.stats_["failures"] += 1
+            raise
+        elapsed = (time.monotonic() - started) * 1000
+        ttl = min(max(ttl if ttl is not None else self.default_ttl, self.min_ttl), self.max_ttl)
+        now = time.monotonic()
+        with self.lock:
+            used = self.entries.get((host, port), {}).get("used", now)
+            self.entries[(host, port)] = {"infos": infos, "ttl": ttl, "expires": now + ttl, "used": used, "lookup_ms": round(elapsed, 3)}
+            self.stats_["lookups"] += 1
+            self.stats_["lookup_ms_total"] += elapsed
+            self.stats_["lookup_ms_max"] = max(self.stats_["lookup_ms_max"], elapsed)
+        return infos
+
+    def resolve(self, host, port):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get((host, port))
+            if entry is not None:
+                entry["used"] = now
+                if now < entry["expires"]:
+                    self.stats_["hits"] += 1
+                    return entry["infos"]
+        try:
+            with self.lock:
+                self.stats_["misses"] += 1
+            return self.fetch(host, port)
+        except OSError:
+            # Better a recently valid address than a failed request
+            if entry is not None and now < entry["expires"] + self.stale_ttl:
+                with self.lock:
+                    self.stats_["stale"] += 1
+                return entry["infos"]
+            raise
+
+    def refresh(self, ahead=0.2):
+        """
+        Re-resolve entries within the last `ahead` fraction of their TTL;
+        forget entries nobody used for idle_ttl. Blocking; run off the loop.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if now - e["used"] > self.idle_ttl]:
+                del self.entries[key]
+            due = [k for k, e in self.entries.items() if e["expires"] - now <= e["ttl"] * ahead]
+        for host, port in due:
+            try:
+                self.fetch(host, port)
+            except OSError:
+                pass
+        return len(due)
+
+    def connect(self, host, port, timeout=None, source_address=None, socket_options=None):
+        return happy_eyeballs(self.resolve(host, port), timeout, self.happy_eyeballs_delay, source_address, socket_options)
+
+    def stats(self):
+        with self.lock:
+            out = dict(self.stats_)
+            out["entries"] = len(self.entries)
+            out["lookup_ms_avg"] = round(out["lookup_ms_total"] / out["lookups"], 3) if out["lookups"] else 0.0
+            out["hosts"] = {f"{h}:{p}": e["lookup_ms"] for (h, p), e in self.entries.items()}
+        return out
+
+class CachedDnsConnectionMixin:
+    dns_cache = None
+
+    def _new_conn(self):
+        timeout = socket.getdefaulttimeout() if self.timeout is _DEFAULT_TIMEOUT else self.timeout
+        try:
+            return self.dns_cache.connect(
+                self._dns_host, self.port, timeout,
+                source_address=self.source_address, socket_options=self.socket_options,
+            )
+        except socket.gaierror as e:
+            raise urllib3.exceptions.NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise urllib3.exceptions.ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={timeout})"
+            ) from e
+        except OSError as e:
+            raise urllib3.exceptions.NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+def pool_classes(cache):
+    """urllib3 pool classes whose connections go through cache."""
+    http_conn = type("CachedDnsHTTPConnection", (CachedDnsConnectionMixin, urllib3.connection.HTTPConnection), {"dns_cache": cache})
+    https_conn = type("CachedDnsHTTPSConnection", (CachedDnsConnectionMixin, urllib3.connection.HTTPSConnection), {"dns_cache": cache})
+    return {
+        "http": type("CachedDnsHTTPConnectionPool", (urllib3.connectionpool.HTTPConnectionPool,), {"ConnectionCls": http_conn}),
+        "https": type("CachedDnsHTTPSConnectionPool", (urllib3.connectionpool.HTTPSConnectionPool,), {"ConnectionCls": https_conn}),
+    }
+
+class CachedDnsAdapter(requests.adapters.HTTPAdapter):
+    """requests adapter resolving through a DnsCache with happy-eyeballs connects."""
+
+    def __init__(self, cache, *args, **kwargs):
+        self.dns_cache = cache
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = pool_classes(self.dns_cache)
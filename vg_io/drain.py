@@ -0,0 +1,150 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# drain.py
+# Graceful drain and listener handoff. On SIGTERM the gateway stops
+# accepting connections and lets in-flight (including streaming) responses
+# finish; on SIGUSR2 it first starts a successor process that inherits the
+# listening socket through VG_LISTEN_FD, so no connection is refused while
+# the old process drains. The old process only starts draining once the
+# successor reports ready over a pipe (VG_READY_FD); if the successor exits
+# or stays unready, the old process keeps serving.
+
+import os, select, socket, subprocess, sys, time
+
+LISTEN_FD_ENV = "VG_LISTEN_FD"
+READY_FD_ENV = "VG_READY_FD"
+
+# Seconds a successor gets to report ready before the handoff is abandoned
+READY_TIMEOUT = 120.0
+
+class DrainState:
+    def __init__(self):
+        self.draining = False
+        self.since = None
+        self.inflight = 0
+
+    def begin(self):
+        if not self.draining:
+            self.draining = True
+            self.since = time.time()
+
+    def status(self):
+        return {"draining": self.draining, "draining_since": self.since, "inflight": self.inflight}
+
+class DrainMiddleware:
+    """
+    ASGI middleware counting in-flight HTTP requests (until their last body
+    chunk is sent). While draining, responses carry "Connection: close" so
+    keep-alive clients reconnect to the successor instead of reusing us.
+    """
+
+    def __init__(self, app, state):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def wrapped(message):
+            if message["type"] == "http.response.start" and self.state.draining:
+                message = dict(message)
+                message["headers"] = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"connection"]
+                message["headers"].append((b"connection", b"close"))
+            await send(message)
+
+        self.state.inflight += 1
+        try:
+            await self.app(scope, receive, wrapped)
+        finally:
+            self.state.inflight -= 1
+
+def listen_socket(host, port, reuse_port=False, backlog=2048):
+    """
+    The socket inherited from a predecessor (VG_LISTEN_FD), or a freshly
+    bound one. reuse_port lets independent processes share the port.
+    """
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+        sock.set_inheritable(False)
+        return sock
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port and hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+def spawn_successor(sock, argv=None):
+    """
+    Start a new gateway process that inherits sock; returns the Popen, whose
+    ready_fd is the read end of the pipe the successor reports ready on.
+    """
+    argv = list(sys.argv if argv is None else argv)
+    ready_r, ready_w = os.pipe()
+    env = dict(os.environ)
+    env[LISTEN_FD_ENV] = str(sock.fileno())
+    env[READY_FD_ENV] = str(ready_w)
+    try:
+        successor = subprocess.Popen([sys.executable] + argv, env=env, pass_fds=(sock.fileno(), ready_w))
+    except BaseException:
+        os.close(ready_r)
+        raise
+    finally:
+        # Only the successor holds the write end, so its exit reads as EOF
+        os.close(ready_w)
+    successor.ready_fd = ready_r
+    return successor
+
+def wait_ready(successor, timeout=READY_TIMEOUT):
+    """
+    Block until successor reports ready (True), or exits or times out (False).
+    Closes successor.ready_fd.
+    """
+    try:
+        readable, _, _ = select.select([successor.ready_fd], [], [], timeout)
+        return bool(readable) and os.read(successor.ready_fd, 64).startswith(b"ready")
+    finally:
+        os.close(successor.ready_fd)
+
+def notify_ready():
+    """Tell the predecessor (if we were spawned by one) that we are serving."""
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is None:
+        return False
+    try:
+        os.write(int(fd), b"ready\n")
+    except OSError:
+        return False
+    finally:
+        try:
+            os.close(int(fd))
+        except OSError:
+            pass
+    return True
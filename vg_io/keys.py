@@ -0,0 +1,181 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# keys.py
+# Caller key store for the gateway. Keys are kept as sha256 digests in a
+# dict so lookup is O(1) no matter how many callers are configured.
+#
+# vg_cfg/callers.json
+# {
+#   "callers": {
+#     "team-a": {
+#       "key_sha256": "<python -m vg_io.keys the-raw-key>",
+#       "nicknames": ["groq-llama8", "aws-nova-micro"],
+#       "max_concurrency": 8,
+#       "requests_per_minute": 120,
+#       "admin": false
+#     }
+#   }
+# }
+# "nicknames" may be omitted to allow every provider; limits omitted or 0
+# mean unlimited. Admin callers can read gateway-wide stats such as /usage.
+
+import hashlib, hmac, json, math, os, sys, threading, time, types
+
+def hash_key(raw_key):
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+def make_caller(name, entry):
+    """Build a caller record from a callers.json entry (dict)."""
+    key_hash = entry.get("key_sha256") or hash_key(entry["key"])
+    nicknames = entry.get("nicknames")
+    return types.SimpleNamespace(
+        name=name,
+        key_hash=key_hash.lower(),
+        nicknames=frozenset(nicknames) if nicknames is not None else None,
+        max_concurrency=int(entry.get("max_concurrency") or 0),
+        requests_per_minute=int(entry.get("requests_per_minute") or 0),
+        admin=bool(entry.get("admin", False)),
+    )
+
+def allows(caller, nickname):
+    """True when caller may use nickname (callers without a nicknames list may use any)."""
+    return caller.nicknames is None or nickname in caller.nicknames
+
+def build_index(entries):
+    """{key_hash: caller} for {name: entry}; raises ValueError when two callers share a key."""
+    index = {}
+    for name, entry in entries.items():
+        caller = make_caller(name, entry)
+        if caller.key_hash in index:
+            raise ValueError(f"callers {index[caller.key_hash].name} and {name} share a key")
+        index[caller.key_hash] = caller
+    return index
+
+class KeyStore:
+    """
+    In-memory index of caller keys, hot-reloaded from a JSON file.
+    static: {name: entry} callers that are always present (e.g. the legacy test key).
+    """
+
+    def __init__(self, path=None, static=None, reload_interval=5.0):
+        self.path = path
+        self.static = static or {}
+        self.reload_interval = reload_interval
+        self.index = {}
+        self.mtime = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.windows = {}
+        self.load()
+
+    def load(self):
+        """
+        (Re)build the index. A broken file, a malformed entry or two callers
+        sharing a key keep the previous index, or the static callers alone
+        when there is none yet.
+        """
+        try:
+            static_index = build_index(self.static)
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            print(f"Error loading static caller keys: {e!r}")
+            static_index = {}
+        entries = dict(self.static)
+        mtime = None
+        try:
+            if self.path and os.path.exists(self.path):
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, "r", encoding="utf-8") as f:
+                    entries.update(json.load(f).get("callers", {}))
+            index = build_index(entries)
+        except (OSError, ValueError, AttributeError, KeyError, TypeError) as e:
+            print(f"Error loading caller keys from {self.path}: {e!r}")
+            if not self.index:
+                self.index = static_index
+            return False
+        # Swap in one assignment so concurrent lookups never see a partial index
+        self.index = index
+        self.mtime = mtime
+        return True
+
+    def maybe_reload(self):
+        """Reload if the file changed; stats it at most once per reload_interval."""
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return False
+        self.checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return False
+        return self.load()
+
+    def lookup(self, raw_key):
+        """Return the caller for raw_key, or None."""
+        if not raw_key:
+            return None
+        digest = hash_key(raw_key)
+        caller = self.index.get(digest)
+        if caller is None or not hmac.compare_digest(caller.key_hash, digest):
+            return None
+        return caller
+
+    def admit(self, caller, nickname):
+        """
+        Check nickname access and limits, reserving a concurrency slot.
+        Returns (status_code, detail, headers) on rejection, None when admitted;
+        429s carry Retry-After (seconds until a slot or the next minute window).
+        Every admitted call must be paired with release().
+        """
+        if not allows(caller, nickname):
+            return 403, f"Caller {caller.name} may not use {nickname}", None
+        with self.lock:
+            active = self.inflight.get(caller.name, 0)
+            if caller.max_concurrency and active >= caller.max_concurrency:
+                return 429, f"Caller {caller.name} exceeded {caller.max_concurrency} concurrent requests", {"Retry-After": "1"}
+            if caller.requests_per_minute:
+                now = time.time()
+                window = int(now // 60)
+                start, count = self.windows.get(caller.name, (window, 0))
+                if start != window:
+                    count = 0
+                if count >= caller.requests_per_minute:
+                    retry_after = max(1, math.ceil((window + 1) * 60 - now))
+                    return 429, f"Caller {caller.name} exceeded {caller.requests_per_minute} requests per minute", {"Retry-After": str(retry_after)}
+                self.windows[caller.name] = (window, count + 1)
+            self.inflight[caller.name] = active + 1
+        return None
+
+    def release(self, caller):
+        with self.lock:
+            self.inflight[caller.name] = max(0, self.inflight.get(caller.name, 0) - 1)
+
+if __name__ == "__main__":
+    # Print the digest to paste into callers.json
+    for raw in sys.argv[1:] or [sys.stdin.read().strip()]:
+        print(hash_key(raw))
@@ -29,8 +29,29 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 import time
 import random
-
-def get_response(cfg, payload_builder, *builder_args, verify=True):
+from . import rqs
+
+# ChatOpenAI instances (and their HTTP pools) per (class, base URL, key, model, sampling)
+MODELS = rqs.LRUCache(32)
+
+def chat_model(cfg, payload):
+    """The cached ChatOpenAI for cfg's gateway and the payload's model and sampling params."""
+    temperature = payload.get("temperature", 0.7)
+    max_tokens = payload.get("max_tokens", None)
+    key = (ChatOpenAI, cfg.projectConfig.gateway_url, cfg.secret_k, payload["model"], temperature, max_tokens)
+    return MODELS.get(key, lambda: ChatOpenAI(
+        openai_api_base=cfg.projectConfig.gateway_url,
+        openai_api_key=cfg.secret_k,
+        model=payload["model"],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        # Add more parameters as needed, e.g.:
+        # top_p=payload.get("top_p", 1.0),
+        # frequency_penalty=payload.get("frequency_penalty", 0.0),
+        # presence_penalty=payload.get("presence_penalty", 0.0),
+    ))
+
+def get_response(cfg, payload_builder, *builder_args, verify=True, params=None):
     """
     Use langchain_openai - Send Message to Server
     Orchestrates config loading, and API calls.
@@ -61,18 +82,8 @@ def get_response(cfg, payload_builder, *builder_args, verify=True):
             else:
                 raise ValueError(f"Invalid message: {msg}")
 
-        # Create ChatOpenAI instance with parameters from payload
-        llm = ChatOpenAI(
-            openai_api_base=cfg.projectConfig.gateway_url,
-            openai_api_key=cfg.secret_k,
-            model=payload["model"],
-            temperature=payload.get("temperature", 0.7),
-            max_tokens=payload.get("max_tokens", None),
-            # Add more parameters as needed, e.g.:
-            # top_p=payload.get("top_p", 1.0),
-            # frequency_penalty=payload.get("frequency_penalty", 0.0),
-            # presence_penalty=payload.get("presence_penalty", 0.0),
-        )
+        # Reuse the ChatOpenAI instance for these parameters from payload
+        llm = chat_model(cfg, payload)
 
         # Invoke the model
         response = llm.invoke(lc_messages)
@@ -128,3 +139,23 @@ def parse_response(cfg, payload_builder, *builder_args, verify=True):
 
     except (KeyError, IndexError, TypeError) as e:
         return f"Error parsing JSON response: {str(e)}", True
+
+def get_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True):
+    """
+    Use langchain_openai - get_response for each builder args in args_list on a bounded
+    thread pool, in input order; see rqs.run_many.
+    """
+    return rqs.run_many(
+        get_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify,
+    )
+
+def parse_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True):
+    """
+    Use langchain_openai - parse_response for each builder args in args_list on a bounded
+    thread pool, in input order; see rqs.run_many.
+    """
+    return rqs.run_many(
+        parse_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify,
+    )
@@ -0,0 +1,122 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# pcache.py
+# Automatic Bedrock prompt caching. Every Converse request is cut at its
+# natural prefix boundaries (end of the tool definitions, end of the system
+# prompt, end of each message) and a running hash is taken at each one.
+# Boundaries already seen for the same caller and model within the cache
+# TTL, and long enough to be cacheable, get a cachePoint block, so repeated
+# system prompts, tool sets and growing conversation histories are read
+# from Bedrock's prompt cache instead of being processed again.
+#
+# vg_cfg.json, on a provider with "api": "bedrock":
+# "prompt_cache": {"min_tokens": 1024, "ttl": 300}     (or just true)
+
+import collections, hashlib, json, threading, time
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Bedrock allows at most 4 cache checkpoints per request
+MAX_POINTS = 4
+
+def raw(value):
+    """json default: hash binary image bytes instead of serializing them."""
+    if isinstance(value, (bytes, bytearray)):
+        return hashlib.sha256(value).hexdigest()
+    raise TypeError(f"Cannot hash {type(value).__name__}")
+
+def estimate_tokens(blocks):
+    """~4 characters per token of text; other blocks count by their JSON size."""
+    total = 0
+    for block in blocks:
+        if "text" in block:
+            total += len(block["text"])
+        else:
+            total += len(json.dumps(block, default=raw))
+    return total // 4
+
+class PrefixTracker:
+    """Recently seen prefix hashes per (caller, model) scope, bounded and expiring."""
+
+    def __init__(self, ttl=300, capacity=20000):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.seen = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.placed = 0
+
+    def boundaries(self, request):
+        """[(kind, index, digest, tokens)] in Bedrock's prefix order: tools, system, messages."""
+        digest = hashlib.sha256(request.get("modelId", "").encode("utf-8"))
+        tokens, out = 0, []
+
+        def cut(kind, index, blocks):
+            nonlocal tokens
+            digest.update(json.dumps(blocks, sort_keys=True, separators=(",", ":"), default=raw).encode("utf-8"))
+            tokens += estimate_tokens(blocks)
+            out.append((kind, index, digest.copy().hexdigest(), tokens))
+
+        tools = (request.get("toolConfig") or {}).get("tools")
+        if tools:
+            cut("tools", None, tools)
+        if request.get("system"):
+            cut("system", None, request["system"])
+        for i, msg in enumerate(request.get("messages", [])):
+            cut("message", i, [{"role": msg["role"]}] + msg["content"])
+        return out
+
+    def place(self, request, scope, min_tokens=1024, ttl=None, now=None):
+        """Insert cache points into a Converse request in place; returns how many were added."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic() if now is None else now
+        cuts = self.boundaries(request)
+        with self.lock:
+            eligible = []
+            for kind, index, digest, tokens in cuts:
+                key = (scope, digest)
+                last = self.seen.get(key)
+                if last is not None and now - last <= ttl and tokens >= min_tokens:
+                    eligible.append((kind, index))
+                self.seen[key] = now
+                self.seen.move_to_end(key)
+            while len(self.seen) > self.capacity:
+                self.seen.popitem(last=False)
+
+        # Keep the tools/system points and the longest repeated history prefix
+        chosen = [c for c in eligible if c[0] != "message"]
+        history = [c for c in eligible if c[0] == "message"]
+        if history:
+            chosen.append(history[-1])
+        chosen = chosen[-MAX_POINTS:]
+        for kind, index in chosen:
+            if kind == "tools":
+                request["toolConfig"]["tools"].append(dict(CACHE_POINT))
+            elif kind == "system":
+                request["system"].append(dict(CACHE_POINT))
+            else:
+                request["messages"][index]["content"].append(dict(CACHE_POINT))
+        self.placed += len(chosen)
+        return len(chosen)
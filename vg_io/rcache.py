@@ -0,0 +1,158 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# rcache.py
+# Client-side response cache for vg_io.rqs. Repeated requests (same gateway,
+# nickname and canonical payload) are answered from a local SQLite file
+# instead of the gateway, which keeps notebook and CI loops fast and cheap.
+# Enable it in the client cfg:
+#
+#   "projectConfig": {..., "cache": {"path": "~/.cache/vg_io/responses.sqlite", "max_mb": 256}}
+#
+# Entries are evicted least recently used first once the stored responses
+# exceed max_mb. hits/misses are counted per process; stats() reports them
+# with the current size.
+
+import hashlib, json, os, sqlite3, threading, time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+def request_key(url, nickname, payload):
+    """sha256 of the gateway url, nickname and payload in canonical JSON form."""
+    canonical = json.dumps([url, nickname, payload], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class ResponseCache:
+    """SQLite-backed response store capped at max_bytes, evicting least recently used entries."""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.con = sqlite3.connect(self.path, check_same_thread=False)
+        self.con.executescript(SCHEMA)
+        self.size = self.con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """The cached response json for key, or None."""
+        with self.lock:
+            row = self.con.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.con.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+            self.con.commit()
+        return json.loads(row[0])
+
+    def put(self, key, data):
+        body = json.dumps(data, separators=(",", ":"))
+        size = len(body.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            old = self.con.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.size -= old[0] if old else 0
+            self.con.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, created, used) VALUES (?, ?, ?, ?, ?)",
+                (key, body, size, now, now),
+            )
+            self.size += size
+            if self.size > self.max_bytes:
+                self.evict()
+            self.con.commit()
+
+    def evict(self, batch=64):
+        """
+        Drop least recently used entries until the cache fits max_bytes (lock held).
+        Reads the oldest rows a batch at a time off the used index, so a put at
+        the cap costs a few rows rather than a scan of the whole table.
+        """
+        while self.size > self.max_bytes:
+            rows = self.con.execute("SELECT key, size FROM responses ORDER BY used LIMIT ?", (batch,)).fetchall()
+            if not rows:
+                self.size = 0
+                break
+            doomed = []
+            for key, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                self.size -= size
+            self.con.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self.lock:
+            self.con.execute("DELETE FROM responses")
+            self.con.commit()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            entries = self.con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self.lock:
+            self.con.close()
+
+# Shared caches per database path
+CACHES = {}
+CACHES_LOCK = threading.Lock()
+
+def cache_for(cfg):
+    """The shared ResponseCache configured in cfg.projectConfig.cache, or None when disabled."""
+    options = getattr(cfg.projectConfig, "cache", None)
+    path = getattr(options, "path", None)
+    if not isinstance(path, str) or getattr(options, "enabled", True) is False:
+        return None
+    path = os.path.expanduser(path)
+    with CACHES_LOCK:
+        cache = CACHES.get(path)
+        if cache is None:
+            cache = CACHES[path] = ResponseCache(path, int(getattr(options, "max_mb", 256) * 1024 * 1024))
+    return cache
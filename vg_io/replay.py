@@ -0,0 +1,306 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# replay.py
+# Record-and-replay of upstream traffic. While capture is enabled every
+# chat exchange is appended to a JSONL log: the request, the status, the
+# response body or the stream chunks with their delays, and the latency.
+# A provider with "api": "replay" serves a log back with the original
+# original timing played back "speed" times as fast (2.0 halves the delays,
+# 0 disables them), and
+#
+#   python -m vg_io.replay drive capture.jsonl --url https://localhost:8443 --key KEY
+#
+# re-sends the captured requests to a gateway at their original pace.
+# Streams the client abandoned are logged with status 499 and
+# "disconnected": true, and are never served back.
+#
+# vg_cfg.json
+# "capture": {"enabled": true, "path": "vg_cfg/capture.jsonl", "nicknames": ["groq-llama8"]}
+# "providers": {
+#   "groq-llama8-replay": {"api": "replay", "path": "vg_cfg/capture.jsonl", "nickname": "groq-llama8", "speed": 1.0}
+# }
+
+import argparse, asyncio, collections, concurrent.futures, hashlib, itertools, json, os, sys, threading, time
+
+# Request fields that don't change what the upstream answers
+IGNORED_FIELDS = ("model", "stream_options", "user")
+
+# Status recorded for a stream the client disconnected from (nginx's "client closed request")
+DISCONNECTED_STATUS = 499
+
+def request_key(payload):
+    """Stable hash of a chat payload; model and bookkeeping fields are ignored."""
+    body = {k: v for k, v in payload.items() if k not in IGNORED_FIELDS}
+    body["stream"] = bool(body.get("stream"))
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:32]
+
+class Recorder:
+    """Buffers captured exchanges and appends them to a JSONL log in the background."""
+
+    def __init__(self, path=None, nicknames=None, flush_interval=1.0):
+        self.lock = threading.Lock()
+        self.pending = []
+        self.task = None
+        self.configure(path, nicknames, flush_interval)
+
+    def configure(self, path=None, nicknames=None, flush_interval=1.0):
+        self.path = path
+        self.nicknames = frozenset(nicknames) if nicknames else None
+        self.flush_interval = flush_interval
+
+    def wants(self, nickname):
+        return self.path is not None and (self.nicknames is None or nickname in self.nicknames)
+
+    def record(self, nickname, payload, status, response=None, chunks=None, latency_ms=0.0, disconnected=False):
+        row = {
+            "ts": round(time.time(), 3), "nickname": nickname, "key": request_key(payload),
+            "request": payload, "status": status, "latency_ms": round(latency_ms, 1),
+        }
+        if disconnected:
+            row["disconnected"] = True
+        if chunks is not None:
+            row["chunks"] = chunks
+        else:
+            row["response"] = response
+        with self.lock:
+            self.pending.append(row)
+        return row
+
+    def capture_stream(self, nickname, payload, chunks, started):
+        """
+        Pass chunks through, recording each with its delay (ms) since the previous one.
+        A stream closed before its end (the client went away) is recorded as disconnected.
+        """
+        captured, last, status = [], started, 200
+        try:
+            for chunk in chunks:
+                now = time.monotonic()
+                captured.append([round((now - last) * 1000, 1), chunk])
+                last = now
+                yield chunk
+        except GeneratorExit:
+            status = DISCONNECTED_STATUS
+            raise
+        except Exception:
+            status = 502
+            raise
+        finally:
+            self.record(nickname, payload, status, chunks=captured, latency_ms=(time.monotonic() - started) * 1000,
+                        disconnected=status == DISCONNECTED_STATUS)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch or self.path is None:
+            return 0
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row, separators=(",", ":")) + "\n" for row in batch)
+        except Exception as e:
+            print(f"Error writing capture batch of {len(batch)}: {e}")
+        return len(batch)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        if self.task is None and self.path is not None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.to_thread(self.flush)
+
+def read_log(path, nickname=None):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if nickname is None or row.get("nickname") == nickname:
+                rows.append(row)
+    return rows
+
+class Replayer:
+    """
+    Serves captured exchanges back; logs are indexed once per file mtime,
+    skipping streams the client disconnected from.
+    """
+
+    def __init__(self):
+        self.logs = {}
+
+    def index(self, path, nickname=None):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.logs.get((path, nickname))
+        if cached is None or cached[0] != mtime:
+            by_key = collections.defaultdict(list)
+            by_stream = {True: [], False: []}
+            for row in read_log(path, nickname):
+                if row.get("disconnected"):
+                    continue
+                by_key[row["key"]].append(row)
+                by_stream["chunks" in row].append(row)
+            # Round-robin over repeated requests and over the whole log
+            cached = (mtime, {k: itertools.cycle(v) for k, v in by_key.items()},
+                      {k: itertools.cycle(v) if v else None for k, v in by_stream.items()})
+            self.logs[(path, nickname)] = cached
+        return cached[1], cached[2]
+
+    def pick(self, path, payload, nickname=None, fallback=True):
+        """The recording for this request, else (with fallback) the next one of the same kind."""
+        by_key, by_stream = self.index(path, nickname)
+        return self.select(by_key, by_stream, payload, fallback)
+
+    @staticmethod
+    def select(by_key, by_stream, payload, fallback=True):
+        rows = by_key.get(request_key(payload))
+        if rows is not None:
+            return next(rows)
+        if fallback:
+            rows = by_stream[bool(payload.get("stream"))]
+            if rows is not None:
+                return next(rows)
+        return None
+
+    @staticmethod
+    def stream(row, speed):
+        for delay_ms, chunk in row["chunks"]:
+            if speed:
+                time.sleep(delay_ms / 1000 / speed)
+            yield chunk
+
+    async def forward(self, provider, payload, base="."):
+        """(content, status) like forward_chat; streams come back as a chunk generator."""
+        path = os.path.join(base, provider.path)
+        speed = getattr(provider, "speed", 1.0)
+        # Reading and indexing a large log blocks, so it happens off the event loop
+        by_key, by_stream = await asyncio.to_thread(self.index, path, getattr(provider, "nickname", None))
+        row = self.select(by_key, by_stream, payload, getattr(provider, "fallback", True))
+        if row is None:
+            return {"error": {"message": "No recording matches this request", "type": "replay_miss"}}, 404
+        if "chunks" in row:
+            return self.stream(row, speed), row["status"]
+        if speed:
+            await asyncio.sleep(row.get("latency_ms", 0) / 1000 / speed)
+        return row["response"], row["status"]
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+def drive(path, url, key, nickname=None, speed=1.0, concurrency=16, verify=True, as_nickname=None):
+    """Re-send captured requests to a gateway at their recorded pace; returns a latency report."""
+    import requests
+    rows = sorted(read_log(path, nickname), key=lambda r: r["ts"])
+    if not rows:
+        return {"requests": 0}
+    session = requests.Session()
+    session.mount(url, requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency))
+    headers = {"Authorization": f"Bearer {key}"}
+    latencies, statuses = [], collections.Counter()
+
+    def send(row):
+        started = time.monotonic()
+        try:
+            resp = session.post(
+                f"{url.rstrip('/')}/chat/completions",
+                params={"nickname": as_nickname or row["nickname"]},
+                json=row["request"], headers=headers, timeout=300, verify=verify,
+                stream=bool(row["request"].get("stream")),
+            )
+            for _ in resp.iter_content(65536):
+                pass
+            status = resp.status_code
+        except Exception as e:
+            status = type(e).__name__
+        return (time.monotonic() - started) * 1000, status
+
+    first, began = rows[0]["ts"], time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        futures = []
+        for row in rows:
+            if speed:
+                wait = (row["ts"] - first) / speed - (time.monotonic() - began)
+                if wait > 0:
+                    time.sleep(wait)
+            futures.append(pool.submit(send, row))
+        for future in futures:
+            ms, status = future.result()
+            latencies.append(ms)
+            statuses[status] += 1
+    elapsed = time.monotonic() - began
+    return {
+        "requests": len(rows), "elapsed_s": round(elapsed, 2), "rps": round(len(rows) / elapsed, 2) if elapsed else None,
+        "p50_ms": percentile(latencies, 0.5), "p95_ms": percentile(latencies, 0.95), "p99_ms": percentile(latencies, 0.99),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m vg_io.replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+    d = sub.add_parser("drive", help="re-send captured requests to a gateway")
+    d.add_argument("log")
+    d.add_argument("--url", default="https://localhost:8443")
+    d.add_argument("--key", required=True, help="gateway caller key")
+    d.add_argument("--nickname", help="only replay requests captured for this nickname")
+    d.add_argument("--as-nickname", help="send them to this nickname instead")
+    d.add_argument("--speed", type=float, default=1.0, help="playback rate; 2 is twice as fast, 0 sends as fast as possible")
+    d.add_argument("--concurrency", type=int, default=16)
+    d.add_argument("--insecure", action="store_true", help="skip TLS verification")
+    s = sub.add_parser("stats", help="summarize a capture log")
+    s.add_argument("log")
+    args = parser.parse_args(argv)
+    if args.command == "drive":
+        report = drive(args.log, args.url, args.key, args.nickname, args.speed, args.concurrency,
+                       not args.insecure, args.as_nickname)
+    else:
+        rows = read_log(args.log)
+        report = {
+            "exchanges": len(rows),
+            "streams": sum("chunks" in r for r in rows),
+            "disconnected": sum(bool(r.get("disconnected")) for r in rows),
+            "nicknames": dict(collections.Counter(r["nickname"] for r in rows)),
+            "p50_ms": percentile([r["latency_ms"] for r in rows], 0.5),
+            "p95_ms": percentile([r["latency_ms"] for r in rows], 0.95),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -25,7 +25,7 @@
 
 # reslv.py
 
-import os, re, types, typing, inspect, json, pydantic, jinja2
+import os, re, types, typing, inspect, json, pydantic, jinja2, collections, time
 import pathspec
 # import vg_io
 import subprocess, threading, re, os, sys, inspect, shutil, argparse, random, math, json, fnmatch, requests, json, types, smart_open
@@ -35,6 +35,8 @@ def str2file(text, file_path):
     try:
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(text)
+        # The next re_solve must see this text even if mtime and size did not move
+        invalidate(file_path)
         return f"Successfully wrote to {file_path}", False
     except Exception as e:
         return f"Error writing file: {str(e)}", True
@@ -94,6 +96,157 @@ def build_dependency_tree(file_path: str, visited: typing.Set[str] = None) -> Fi
 
     return node
 
+# Compiled templates: each source is tokenized once into literal, include and
+# variable segments, and render() joins them in a single pass, so rendering
+# is linear in the output and substituted values are never re-scanned.
+TAG_PATTERN = re.compile(r'\{\{\{(path|var_str):"([^"]+)"\}\}\}')
+LITERAL, INCLUDE, VAR = 0, 1, 2
+
+class Template:
+    """A compiled source: (kind, value, raw_tag) segments, with includes compiled in place."""
+    __slots__ = ("name", "segments")
+
+    def __init__(self, name, segments):
+        self.name = name
+        self.segments = segments
+
+    def render(self, context):
+        """Text with includes expanded and var_str tags taken from context (missing ones left as tags)."""
+        parts = []
+        self.render_into(parts, context)
+        return "".join(parts)
+
+    def render_into(self, parts, context):
+        for kind, value, raw_tag in self.segments:
+            if kind == LITERAL:
+                parts.append(value)
+            elif kind == INCLUDE:
+                value.render_into(parts, context)
+            else:
+                parts.append(str(context.get(value, raw_tag)))
+
+def tokenize(content, base_dir, visited, files):
+    """Segments for content, compiling {{{path:...}}} includes relative to base_dir."""
+    segments = []
+    position = 0
+    for match in TAG_PATTERN.finditer(content):
+        if match.start() > position:
+            segments.append((LITERAL, content[position:match.start()], None))
+        kind, target = match.groups()
+        if kind == "path":
+            child = compile_file(os.path.abspath(os.path.join(base_dir, target)), visited, files)
+            segments.append((INCLUDE, child, match.group(0)))
+        else:
+            segments.append((VAR, target, match.group(0)))
+        position = match.end()
+    if position < len(content):
+        segments.append((LITERAL, content[position:], None))
+    return segments
+
+def file_stamp(path):
+    """(mtime_ns, size) of path, or None if it can't be stat'ed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def compile_file(file_path, visited=frozenset(), files=None):
+    """
+    Template for a file; a missing file compiles to its error message. Raises ValueError on cycles.
+    Every file read is appended to files as (abs_path, file_stamp) when given.
+    """
+    abs_path = os.path.abspath(file_path)
+    if abs_path in visited:
+        raise ValueError(f"Circular dependency detected: {file_path}")
+    if files is not None:
+        files.append((abs_path, file_stamp(abs_path)))
+    content, error = Load_Plaintxt(file_path)
+    if error:
+        # The error message becomes the content so it's visible in the output
+        return Template(file_path, [(LITERAL, content, None)])
+    return Template(file_path, tokenize(content, os.path.dirname(abs_path), visited | {abs_path}, files))
+
+def is_raw_text(file_path):
+    # Principle 1: Explicitly identify raw text vs file path
+    return "\n" in file_path or "{" in file_path or "}" in file_path
+
+def compile_template(file_path, files=None):
+    """Template for a file path, or for raw template text (anything with a newline or brace)."""
+    if is_raw_text(file_path):
+        return Template("raw_input", tokenize(file_path, os.getcwd(), frozenset(), files))
+    return compile_file(file_path, files=files)
+
+class TemplateCache:
+    """
+    Compiled templates per absolute path (or raw text and cwd), least recently
+    used evicted past capacity. An entry is reused while every file it read
+    keeps its (mtime, size), stat'ed on every get by default. A positive
+    check_interval skips the stats for that many seconds after a check, trading
+    seeing edits late for no filesystem I/O at all.
+    """
+
+    def __init__(self, capacity=256, check_interval=0.0):
+        self.capacity = capacity
+        self.check_interval = check_interval
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_path):
+        if is_raw_text(file_path):
+            return ("raw_input", os.getcwd(), file_path)
+        return ("file", os.path.abspath(file_path))
+
+    def get(self, file_path, now=None):
+        """The compiled Template for file_path, recompiling if any file it read has changed."""
+        now = time.monotonic() if now is None else now
+        key = self.key(file_path)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            template, files, checked = entry
+            if now - checked < self.check_interval or all(file_stamp(path) == stamp for path, stamp in files):
+                with self.lock:
+                    if now - checked >= self.check_interval:
+                        entry[2] = now
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                    self.hits += 1
+                return template
+        files = []
+        template = compile_template(file_path, files)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = [template, files, now]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return template
+
+    def invalidate(self, path=None):
+        """Drop every entry that read path (any file or raw text), or everything when path is None."""
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                return
+            abs_path = os.path.abspath(path)
+            for key in [k for k, (template, files, checked) in self.entries.items()
+                        if any(f == abs_path for f, stamp in files)]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+# Process-wide compiled templates used by re_solve
+TEMPLATES = TemplateCache()
+
+def invalidate(path=None):
+    """Forget compiled templates that include path (all templates when path is None)."""
+    TEMPLATES.invalidate(path)
+
 def re_solve(file_path, context=None):
     """
     Resolves recursive file dependencies and string variables 
@@ -116,31 +269,13 @@ def re_solve(file_path, context=None):
         context = caller_frame.f_locals
 
     try:
-        tree = build_dependency_tree(file_path)
+        template = TEMPLATES.get(file_path)
     except Exception as e:
         # Only print error if it's an actual crash, 
         # not a "file not found" handled inside the tree.
         return f"Resolution Error: {e}"
 
-    def resolve_node(node):
-        text = node.content
-        
-        # 1. Resolve Path Dependencies
-        for sub in node.subtrees:
-            if sub.raw_tag:
-                text = text.replace(sub.raw_tag, resolve_node(sub))
-        
-        # 2. Resolve String Variables
-        var_pattern = r'\{\{\{var_str:"([^"]+)"\}\}\}'
-        for var_name in re.findall(var_pattern, text):
-            raw_tag = f'{{{{{{var_str:"{var_name}"}}}}}}'
-            # Pull from the captured context
-            replacement = str(context.get(var_name, raw_tag))
-            text = text.replace(raw_tag, replacement)
-            
-        return text
-
-    return resolve_node(tree)
+    return template.render(context)
 
 def sws_re_solve(file_path):
     """
@@ -0,0 +1,199 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# route.py
+# Automatic routing for virtual nicknames. Live per-nickname statistics
+# (EWMA latency and deviation, EWMA error rate, in-flight requests) are
+# updated as requests finish; a virtual nickname's targets are sorted by
+# price once per config version, so choosing a target is a walk over a
+# handful of precomputed candidates. Statistics age out: the error rate
+# halves every half_life_s without traffic and a p95 older than that is
+# forgotten, so an excluded target is retried instead of starving forever.
+#
+# vg_cfg.json
+# "providers": {
+#   "auto-chat": {
+#     "api": "router",
+#     "targets": ["groq-llama8", "aws-nova-micro", "openai-gpt4"],
+#     "slo_p95_ms": 2500,
+#     "max_error_rate": 0.2,
+#     "max_queue": 16
+#   }
+# }
+# Targets use their "price" ({"input": $, "output": $} per million tokens)
+# and "context_length" (tokens) entries; unpriced targets sort last and
+# targets without a context_length fit any prompt.
+
+import threading, time, types
+
+def estimate_tokens(payload):
+    """Rough prompt size: ~4 characters per token plus per-message overhead."""
+    chars = 0
+    messages = payload.get("messages") or []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    return chars // 4 + 4 * len(messages)
+
+def blended_price(provider):
+    price = getattr(provider, "price", None)
+    if price is None:
+        return float("inf")
+    if not isinstance(price, dict):
+        price = vars(price)
+    return price.get("input", 0) + price.get("output", 0)
+
+class RouteStats:
+    """Live latency, error rate and queue depth per nickname."""
+
+    def __init__(self, alpha=0.2, half_life_s=30.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.half_life_s = half_life_s
+        self.clock = clock
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def get(self, nickname):
+        entry = self.stats.get(nickname)
+        if entry is None:
+            entry = self.stats.setdefault(nickname, types.SimpleNamespace(
+                latency_ms=0.0, deviation_ms=0.0, error_rate=0.0, inflight=0, samples=0, updated=None,
+            ))
+        return entry
+
+    def start(self, nickname):
+        with self.lock:
+            self.get(nickname).inflight += 1
+
+    def observe(self, nickname, latency_ms, ok, started=True):
+        """Fold one finished request into the averages."""
+        with self.lock:
+            entry = self.get(nickname)
+            if started:
+                entry.inflight = max(0, entry.inflight - 1)
+            now = self.clock()
+            error_rate, stale = self.aged(entry, now)
+            entry.error_rate = error_rate
+            if entry.samples == 0 or stale:
+                entry.latency_ms = latency_ms
+                entry.deviation_ms = 0.0
+            else:
+                delta = latency_ms - entry.latency_ms
+                entry.latency_ms += self.alpha * delta
+                entry.deviation_ms += self.alpha * (abs(delta) - entry.deviation_ms)
+            entry.error_rate += self.alpha * ((0.0 if ok else 1.0) - entry.error_rate)
+            entry.samples += 1
+            entry.updated = now
+
+    def aged(self, entry, now=None):
+        """(error_rate decayed to now, whether the latency samples are stale)."""
+        if entry.updated is None:
+            return entry.error_rate, False
+        idle = max(0.0, (self.clock() if now is None else now) - entry.updated)
+        return entry.error_rate * 0.5 ** (idle / self.half_life_s), idle >= self.half_life_s
+
+    def health(self, entry):
+        """(error_rate, p95) as of now; p95 is None before any sample or once stale."""
+        error_rate, stale = self.aged(entry)
+        return error_rate, None if stale else self.p95(entry)
+
+    @staticmethod
+    def p95(entry):
+        """p95 estimate from the EWMA mean and mean absolute deviation; None before any sample."""
+        if entry.samples == 0:
+            return None
+        return entry.latency_ms + 2.5 * entry.deviation_ms
+
+    def snapshot(self):
+        snap = {}
+        for nickname, entry in list(self.stats.items()):
+            error_rate, p95 = self.health(entry)
+            snap[nickname] = {
+                "latency_ms": round(entry.latency_ms, 1),
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "error_rate": round(error_rate, 4),
+                "inflight": entry.inflight,
+                "samples": entry.samples,
+            }
+        return snap
+
+class Router:
+    """Picks a target for a virtual nickname from RouteStats."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.plans = {}
+
+    def plan(self, nickname, route, providers, version=None):
+        """[(target, provider, context_length)] cheapest first, cached per config version."""
+        key = (nickname, version)
+        plan = self.plans.get(key) if version is not None else None
+        if plan is None:
+            candidates = []
+            for target in route.targets:
+                provider = getattr(providers, target, None)
+                if provider is None or provider.api == "router":
+                    continue
+                candidates.append((blended_price(provider), target, provider, getattr(provider, "context_length", None)))
+            candidates.sort(key=lambda c: c[0])
+            plan = [c[1:] for c in candidates]
+            if version is not None:
+                self.plans = {k: v for k, v in self.plans.items() if k[0] != nickname}
+                self.plans[key] = plan
+        return plan
+
+    def choose(self, nickname, route, providers, payload, version=None, allowed=None):
+        """
+        Return (target, provider): the cheapest target that fits the prompt and
+        currently meets the SLO, else the fitting target with the best p95.
+        allowed, when given, limits the choice to those target nicknames.
+        None when no target can hold the prompt.
+        """
+        slo = getattr(route, "slo_p95_ms", None)
+        max_error_rate = getattr(route, "max_error_rate", 0.5)
+        max_queue = getattr(route, "max_queue", 0)
+        needed = estimate_tokens(payload) + (payload.get("max_tokens") or 0)
+        fallback, fallback_p95 = None, None
+        for target, provider, context_length in self.plan(nickname, route, providers, version):
+            if context_length and needed > context_length:
+                continue
+            if allowed is not None and target not in allowed:
+                continue
+            entry = self.stats.get(target)
+            error_rate, p95 = self.stats.health(entry)
+            healthy = (
+                error_rate <= max_error_rate
+                and (not max_queue or entry.inflight < max_queue)
+                and (slo is None or p95 is None or p95 <= slo)
+            )
+            if healthy:
+                return target, provider
+            score = float("inf") if p95 is None else p95 * (1 + error_rate)
+            if fallback is None or score < fallback_p95:
+                fallback, fallback_p95 = (target, provider), score
+        return fallback
@@ -35,49 +35,211 @@
 # cwfd = os.path.dirname(cwf) # Current Working File Path
 # #    vg_cfg = os.path.join(home_cfg_dir, "vg_cfg/rq_test_cfg.json")
 
-import json, requests, types, os
+import json, requests, types, os, ssl, threading, time, urllib.parse
+import collections, collections.abc, concurrent.futures
+import requests.adapters, urllib3.util.retry
+from . import rcache
+
+# Responses worth re-sending a POST for, and only when they carry Retry-After:
+# the server turned the request away. The gateway's own admission 429s
+# (caller rate and concurrency limits) do; upstream statuses it passes through
+# don't, so those are returned rather than retried. A 502/504 is never
+# retried: the completion may already have run (and been billed).
+RETRY_STATUSES = (429, 503)
+
+def should_retry(status, headers):
+    """True when a POST answered with status/headers was refused and can be re-sent."""
+    return status in RETRY_STATUSES and "Retry-After" in headers
+
+def retry_delay(headers, backoff):
+    """Seconds to wait before the next attempt: Retry-After when given in seconds, else backoff."""
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return backoff
+
+class PostRetry(urllib3.util.retry.Retry):
+    """urllib3 Retry that only re-sends a POST on connect errors or should_retry() statuses."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST" and not (status_code in RETRY_STATUSES and has_retry_after):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+# SSL contexts per CA bundle, so the CA file is read once rather than per connection
+SSL_CONTEXTS = {}
+
+def ssl_context(verify):
+    """Cached SSLContext for a CA bundle path (reloaded if the file changes); None otherwise."""
+    if not isinstance(verify, str):
+        return None
+    key = (verify, os.stat(verify).st_mtime_ns)
+    context = SSL_CONTEXTS.get(key)
+    if context is None:
+        if os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        else:
+            context = ssl.create_default_context(cafile=verify)
+        SSL_CONTEXTS[key] = context
+    return context
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that verifies with a prebuilt SSLContext instead of re-reading the CA bundle."""
+
+    def __init__(self, context=None, **kwargs):
+        self.context = context
+        super().__init__(**kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if self.context is not None and verify is not False:
+            pool_kwargs.pop("ca_certs", None)
+            pool_kwargs.pop("ca_cert_dir", None)
+            pool_kwargs["ssl_context"] = self.context
+        return host_params, pool_kwargs
+
+class Client:
+    """
+    Keep-alive connection pool to one gateway. Reuse one Client (or let
+    client_for() hand out a shared one) so calls skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, verify=True, pool_size=16, retries=2, backoff=0.2, timeout=30):
+        self.verify = verify
+        self.timeout = timeout
+        retry = PostRetry(
+            total=retries, connect=retries, read=0, status=retries,
+            backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(("GET", "POST")), raise_on_status=False,
+        )
+        self.retry = retry
+        self.session = requests.Session()
+        self.mount(pool_size)
+
+    def mount(self, pool_size):
+        """(Re)mount the pooled adapter with pool_size connections per host."""
+        self.pool_size = pool_size
+        self.adapter = PooledAdapter(
+            context=ssl_context(self.verify), pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self.retry,
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def ensure_pool(self, pool_size):
+        """Grow the pool to at least pool_size; the old pool's idle connections are closed."""
+        if pool_size > self.pool_size:
+            old = self.adapter
+            self.mount(pool_size)
+            old.close()
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("verify", self.verify)
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Shared clients per (gateway origin, verify)
+CLIENTS = {}
+CLIENTS_LOCK = threading.Lock()
+
+def client_for(url, verify=True, **options):
+    """
+    The shared Client for this gateway origin. options apply when it is first
+    created, except pool_size, which grows an existing pool that is smaller.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    key = (parsed.scheme, parsed.netloc, verify)
+    client = CLIENTS.get(key)
+    if client is None or client.pool_size < options.get("pool_size", 0):
+        with CLIENTS_LOCK:
+            client = CLIENTS.get(key)
+            if client is None:
+                client = CLIENTS[key] = Client(verify=verify, **options)
+            else:
+                client.ensure_pool(options.get("pool_size", 0))
+    return client
+
+def client_options(cfg):
+    """Pool settings from cfg.projectConfig (pool_size, retries, timeout), if present."""
+    project = cfg.projectConfig
+    return {
+        name: getattr(project, name)
+        for name in ("pool_size", "retries", "backoff", "timeout")
+        if hasattr(project, name)
+    }
+
+def prepare(cfg, payload_builder, *builder_args):
+    """
+    Build the gateway request for cfg as ((url, headers, payload, params), err).
+    params (nickname and model parameters) go both in the URL and the body.
+    """
+    # Extract params (vg_io.cfg Parameters are a mapping; plain namespaces still work)
+    parameters = cfg.projectConfig.parameters
+    params = dict(parameters) if isinstance(parameters, collections.abc.Mapping) else vars(parameters).copy()
+    params['nickname'] = cfg.projectConfig.nickname
+    # Use gateway_url from config instead of a hardcoded API_URL
+    target_url = cfg.projectConfig.gateway_url
+
+    payload, err = payload_builder(cfg, *builder_args)
+    if err: return payload, True
+
+    # Merge the extracted params into the payload
+    if params:
+        payload.update(params)
+
+    headers = {
+        "Authorization": f"Bearer {cfg.secret_k}",
+        "Content-Type": "application/json"
+    }
+    return (target_url, headers, payload, params), False
 
 # def get_response(cfg, payload_builder, *builder_args, verify=True, params=None):
-def get_response(cfg, payload_builder, *builder_args, verify=True):
+def get_response(cfg, payload_builder, *builder_args, verify=True, client=None, cache=None):
     """
     Use requests lib - Send Message to Server
     Orchestrates config loading, and API calls.
     Now requires cfg as first argument.
+    Requests go through client, else the shared pooled Client for the gateway.
+    cache is a rcache.ResponseCache, False to bypass, or None for the one in cfg (if any).
     """
-    # Extract params
-    params = vars(cfg.projectConfig.parameters).copy()
-    params['nickname'] = cfg.projectConfig.nickname
     try:
-        # Use gateway_url from config instead of a hardcoded API_URL
-        target_url = cfg.projectConfig.gateway_url
-        
-        payload, err = payload_builder(cfg, *builder_args)
-        if err: return payload, True
-
-        # Merge the extracted params into the payload
-        if params:
-            payload.update(params)
-
-        headers = {
-            "Authorization": f"Bearer {cfg.secret_k}",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(
+        request, err = prepare(cfg, payload_builder, *builder_args)
+        if err: return request, True
+        target_url, headers, payload, params = request
+
+        if cache is None:
+            cache = rcache.cache_for(cfg)
+        if cache:
+            key = rcache.request_key(target_url, params['nickname'], payload)
+            data = cache.get(key)
+            if data is not None:
+                return data, False
+
+        client = client or client_for(target_url, verify, **client_options(cfg))
+        response = client.post(
             target_url,
             headers=headers,
             json=payload,
             params=params, # URL encodes nickname and parameters
-            timeout=30,
-            verify=verify
         )
         response.raise_for_status()
-        return response.json(), False
+        data = response.json()
+        if cache:
+            cache.put(key, data)
+        return data, False
     except Exception as e:
         return f"Error: {str(e)}", True
 
-def parse_response(cfg, payload_builder, *builder_args, verify=True):
-    data, err = get_response(cfg, payload_builder, *builder_args, verify=verify)
+def parse_response(cfg, payload_builder, *builder_args, verify=True, client=None, cache=None):
+    data, err = get_response(cfg, payload_builder, *builder_args, verify=verify, client=client, cache=cache)
     """
     Use requests lib - Receive Response from server
     Now requires cfg as first argument.
@@ -85,19 +247,266 @@ def parse_response(cfg, payload_builder, *builder_args, verify=True):
     # data, err = get_response(cfg, payload_builder, *builder_args, verify=verify)
     if err:
         return data, True
+    return parse_content(data)
 
-    try:
-        message = data['choices'][0]['message']
-        content = message.get('content', '').strip()
+def strip_fences(content):
+    """content stripped, without a surrounding ``` code fence."""
+    content = content.strip()
 
-        if content.startswith("```"):
-            lines = content.splitlines()
-            if len(lines) >= 2:
-                content = "\n".join(lines[1:-1]).strip()
-            else:
-                content = content.replace("```", "").strip()
+    if content.startswith("```"):
+        lines = content.splitlines()
+        if len(lines) >= 2:
+            content = "\n".join(lines[1:-1]).strip()
+        else:
+            content = content.replace("```", "").strip()
 
-        return content, False
+    return content
+
+def parse_content(data):
+    """Assistant content of a chat completion with any code fence stripped, as (content, err)."""
+    try:
+        message = data['choices'][0]['message']
+        return strip_fences(message.get('content', '')), False
 
     except (KeyError, IndexError, TypeError) as e:
         return f"Error parsing JSON response: {str(e)}", True
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, factory):
+        """The cached value for key, else factory() stored under key."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        value = factory()
+        with self.lock:
+            value = self.entries.setdefault(key, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+# Streaming: stream_response sends stream: true and returns a Stream that
+# yields content deltas as the gateway's server-sent events arrive:
+#
+#   stream, err = vg_io.rqs.stream_response(cfg, payload_builder, prompt)
+#   with stream:
+#       for delta in stream:
+#           print(delta, end="")
+#   content, err = stream.result()   # assembled, code fence stripped
+#
+# Closing the stream early (break out of the with block) drops the connection,
+# so the gateway stops generating.
+
+class Assembler:
+    """Incremental SSE parser: feed() raw lines, get content deltas, keep the parts for the end."""
+
+    def __init__(self):
+        self.parts = []
+        self.usage = None
+        self.finish_reason = None
+        self.error = None
+        self.done = False
+
+    def feed(self, line):
+        """Content delta carried by one SSE line ("" when none); sets done on [DONE] or an error."""
+        if not line.startswith(b"data:"):
+            return ""
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            self.done = True
+            return ""
+        chunk = json.loads(data)
+        if "error" in chunk:
+            self.error = f"Error: {chunk['error'].get('message', chunk['error'])}"
+            self.done = True
+            return ""
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or ():
+            if choice.get("index", 0) != 0:
+                continue
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                self.parts.append(delta)
+                return delta
+        return ""
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def result(self):
+        """(content with any code fence stripped, err)"""
+        if self.error:
+            return self.error, True
+        return strip_fences(self.text), False
+
+class Stream:
+    """Iterator of content deltas over a streaming gateway response; close() ends it early."""
+
+    def __init__(self, response):
+        self.response = response
+        self.assembler = Assembler()
+        self.closed = False
+
+    def __iter__(self):
+        if self.closed:
+            return
+        assembler = self.assembler
+        try:
+            for line in self.response.iter_lines():
+                delta = assembler.feed(line)
+                if delta:
+                    yield delta
+                if assembler.done:
+                    break
+        except Exception as e:
+            assembler.error = assembler.error or f"Error: {str(e)}"
+        finally:
+            self.close()
+
+    @property
+    def text(self):
+        """Content received so far, as sent."""
+        return self.assembler.text
+
+    @property
+    def usage(self):
+        return self.assembler.usage
+
+    @property
+    def finish_reason(self):
+        return self.assembler.finish_reason
+
+    def result(self):
+        """
+        Consume the rest of the stream; (content with any code fence stripped, err).
+        After an early close this is the content received up to that point.
+        """
+        for _ in self:
+            pass
+        return self.assembler.result()
+
+    def close(self):
+        self.closed = True
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def stream_response(cfg, payload_builder, *builder_args, verify=True, client=None):
+    """
+    Use requests lib - Send a streaming request; (Stream, err).
+    Errors before the first event come back as (message, True).
+    """
+    try:
+        request, err = prepare(cfg, payload_builder, *builder_args)
+        if err: return request, True
+        target_url, headers, payload, params = request
+        payload["stream"] = True
+
+        client = client or client_for(target_url, verify, **client_options(cfg))
+        response = client.post(target_url, headers=headers, json=payload, params=params, stream=True)
+        if response.status_code >= 400:
+            try:
+                response.raise_for_status()
+            finally:
+                response.close()
+        return Stream(response), False
+    except Exception as e:
+        return f"Error: {str(e)}", True
+
+# Batches: get_response_many / parse_response_many run a list of builder args
+# on a bounded thread pool over one shared connection pool, returning per-item
+# (value, err) in input order:
+#
+#   results = vg_io.rqs.parse_response_many(cfg, payload_builder, [(a,), (b,)],
+#       max_workers=8, rate=5, progress=lambda done, total, index, result: ...)
+
+class RateLimiter:
+    """Spaces call starts at most rate per second across threads; rate None or 0 is unlimited."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def run_many(call, cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, **kwargs):
+    """
+    Run call(cfg, payload_builder, *args, **kwargs) for every args in args_list on a
+    bounded thread pool; a list of (value, err) in args_list order.
+    Each args is a tuple of builder args (anything else is passed as the single arg).
+    progress(done, total, index, result) is called in the caller's thread as items finish.
+    rate caps request starts per second across the pool.
+    """
+    items = [args if isinstance(args, tuple) else (args,) for args in args_list]
+    limiter = RateLimiter(rate)
+    results = [None] * len(items)
+
+    def one(args):
+        limiter.wait()
+        try:
+            return call(cfg, payload_builder, *args, **kwargs)
+        except Exception as e:
+            return f"Error: {str(e)}", True
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(one, args): index for index, args in enumerate(items)}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            index = futures[future]
+            results[index] = future.result()
+            if progress:
+                progress(done, len(items), index, results[index])
+    return results
+
+def shared_client(cfg, verify=True, max_workers=8):
+    """The shared Client for cfg's gateway, with at least max_workers pooled connections."""
+    options = client_options(cfg)
+    options["pool_size"] = max(options.get("pool_size", 16), max_workers)
+    return client_for(cfg.projectConfig.gateway_url, verify, **options)
+
+def get_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True, client=None):
+    """get_response for each builder args in args_list; see run_many."""
+    client = client or shared_client(cfg, verify, max_workers)
+    return run_many(
+        get_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify, client=client,
+    )
+
+def parse_response_many(cfg, payload_builder, args_list, max_workers=8, progress=None, rate=None, verify=True, client=None):
+    """parse_response for each builder args in args_list; see run_many."""
+    client = client or shared_client(cfg, verify, max_workers)
+    return run_many(
+        parse_response, cfg, payload_builder, args_list, max_workers=max_workers,
+        progress=progress, rate=rate, verify=verify, client=client,
+    )
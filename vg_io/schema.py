@@ -0,0 +1,251 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# schema.py
+# Inbound /chat/completions validation. The chat completions shape is
+# compiled once into a table of small checker functions, so validating a
+# body is a single pass over the fields that are present and costs less
+# than parsing it. Unknown top-level fields pass through untouched.
+# provider_error() adds the per-provider capability checks (what each api
+# can actually forward), so requests an upstream would reject or silently
+# mangle are refused before any upstream work.
+#
+#   python -m vg_io.schema    # benchmark parse vs validate
+
+import json, timeit
+
+ROLES = frozenset(("system", "developer", "user", "assistant", "tool", "function"))
+PART_TYPES = frozenset(("text", "image_url", "input_audio", "file"))
+TOOL_CHOICES = frozenset(("none", "auto", "required"))
+
+def number(low=None, high=None):
+    def check(value):
+        if type(value) not in (int, float):
+            return "must be a number"
+        if (low is not None and value < low) or (high is not None and value > high):
+            return f"must be between {low} and {high}"
+        return None
+    return check
+
+def integer(low=None, high=None):
+    def check(value):
+        if type(value) is not int:
+            return "must be an integer"
+        if (low is not None and value < low) or (high is not None and value > high):
+            return f"must be between {low} and {high}" if high is not None else f"must be at least {low}"
+        return None
+    return check
+
+def of_type(kind, name):
+    def check(value):
+        return None if type(value) is kind else f"must be {name}"
+    return check
+
+def check_stop(value):
+    if type(value) is str:
+        return None
+    if type(value) is list and len(value) <= 4 and all(type(s) is str for s in value):
+        return None
+    return "must be a string or a list of up to 4 strings"
+
+def check_part(part):
+    if type(part) is not dict:
+        return "must be an object"
+    kind = part.get("type")
+    if kind not in PART_TYPES:
+        return f"has unsupported type {kind!r}"
+    if kind == "text" and type(part.get("text")) is not str:
+        return "text must be a string"
+    if kind == "image_url":
+        image = part.get("image_url")
+        url = image.get("url") if type(image) is dict else image
+        if type(url) is not str:
+            return "image_url.url must be a string"
+    return None
+
+def check_tool_call(call):
+    if type(call) is not dict or type(call.get("id")) is not str:
+        return "must be an object with a string id"
+    function = call.get("function")
+    if type(function) is not dict or type(function.get("name")) is not str:
+        return "function.name must be a string"
+    if type(function.get("arguments", "")) is not str:
+        return "function.arguments must be a string"
+    return None
+
+def check_message(msg):
+    if type(msg) is not dict:
+        return "must be an object"
+    role = msg.get("role")
+    if role not in ROLES:
+        return f"has invalid role {role!r}"
+    content = msg.get("content")
+    if type(content) is list:
+        for i, part in enumerate(content):
+            error = check_part(part)
+            if error:
+                return f"content[{i}] {error}"
+    elif content is None:
+        if role != "assistant":
+            return "content is required"
+    elif type(content) is not str:
+        return "content must be a string or a list of parts"
+    if role == "tool" and type(msg.get("tool_call_id")) is not str:
+        return "tool_call_id must be a string"
+    calls = msg.get("tool_calls")
+    if calls is not None:
+        if type(calls) is not list:
+            return "tool_calls must be a list"
+        for i, call in enumerate(calls):
+            error = check_tool_call(call)
+            if error:
+                return f"tool_calls[{i}] {error}"
+    return None
+
+def check_messages(messages):
+    if type(messages) is not list or not messages:
+        return "must be a non-empty list"
+    for i, msg in enumerate(messages):
+        error = check_message(msg)
+        if error:
+            return f"[{i}] {error}"
+    return None
+
+def check_tools(tools):
+    if type(tools) is not list:
+        return "must be a list"
+    for i, tool in enumerate(tools):
+        if type(tool) is not dict or tool.get("type", "function") != "function":
+            return f"[{i}] must be a function tool"
+        function = tool.get("function")
+        if type(function) is not dict or type(function.get("name")) is not str:
+            return f"[{i}] function.name must be a string"
+        if type(function.get("parameters", {})) is not dict:
+            return f"[{i}] function.parameters must be an object"
+    return None
+
+def check_tool_choice(choice):
+    if type(choice) is str:
+        return None if choice in TOOL_CHOICES else f"must be one of {sorted(TOOL_CHOICES)}"
+    if type(choice) is dict and type((choice.get("function") or {}).get("name")) is str:
+        return None
+    return "must be a string or {\"type\": \"function\", \"function\": {\"name\": ...}}"
+
+# field -> checker, built once at import
+CHAT_FIELDS = {
+    "messages": check_messages,
+    "model": of_type(str, "a string"),
+    "stream": of_type(bool, "a boolean"),
+    "temperature": number(0, 2),
+    "top_p": number(0, 1),
+    "max_tokens": integer(1),
+    "max_completion_tokens": integer(1),
+    "n": integer(1, 128),
+    "stop": check_stop,
+    "presence_penalty": number(-2, 2),
+    "frequency_penalty": number(-2, 2),
+    "tools": check_tools,
+    "tool_choice": check_tool_choice,
+    "response_format": of_type(dict, "an object"),
+    "stream_options": of_type(dict, "an object"),
+    "logprobs": of_type(bool, "a boolean"),
+    "top_logprobs": integer(0, 20),
+    "seed": integer(),
+    "user": of_type(str, "a string"),
+}
+
+def chat_error(payload):
+    """First problem with a /chat/completions body as a string, or None if it is valid."""
+    if type(payload) is not dict:
+        return "body must be a JSON object"
+    if "messages" not in payload:
+        return "messages is required"
+    for name, value in payload.items():
+        check = CHAT_FIELDS.get(name)
+        if check is not None and value is not None:
+            error = check(value)
+            if error:
+                return f"{name}{'' if error.startswith('[') else ' '}{error}"
+    return None
+
+def parts(payload):
+    for msg in payload["messages"]:
+        if type(msg.get("content")) is list:
+            yield from msg["content"]
+
+def provider_error(provider, payload):
+    """What this provider cannot forward from a valid chat body, or None."""
+    api = provider.api
+    caps = getattr(provider, "capabilities", None)
+    if caps is not None:
+        if "chat" not in caps:
+            return f"{api} provider does not serve chat completions"
+        if payload.get("tools") and "tools" not in caps:
+            return "provider does not support tools"
+        if "vision" not in caps and any(p.get("type") == "image_url" for p in parts(payload)):
+            return "provider does not accept images"
+    if api == "langchain_aws":
+        for i, msg in enumerate(payload["messages"]):
+            if msg["role"] not in ("system", "user", "assistant"):
+                return f"messages[{i}] role {msg['role']} is not supported by langchain_aws"
+            if type(msg.get("content")) is not str:
+                return f"messages[{i}] content must be a string for langchain_aws"
+        if payload.get("tools"):
+            return "tools are not supported by langchain_aws, use the bedrock api"
+    elif api == "bedrock":
+        if (payload.get("n") or 1) > 1:
+            return "n > 1 is not supported by Bedrock"
+        for part in parts(payload):
+            if part["type"] not in ("text", "image_url"):
+                return f"content part {part['type']} is not supported by Bedrock"
+            if part["type"] == "image_url":
+                image = part["image_url"]
+                url = image.get("url") if type(image) is dict else image
+                if not url.startswith("data:"):
+                    return "Bedrock only accepts base64 data: image urls"
+    return None
+
+def sample_body(messages=8, chars=400):
+    payload = {
+        "model": "groq-llama8", "temperature": 0.2, "max_tokens": 512, "stream": False,
+        "messages": [{"role": "system", "content": "You are terse. " * (chars // 15)}] + [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "lorem ipsum " * (chars // 12)}
+            for i in range(messages - 1)
+        ],
+    }
+    return json.dumps(payload).encode("utf-8")
+
+def bench(body=None, number=20000):
+    """(parse_us, validate_us) per body."""
+    body = body or sample_body()
+    payload = json.loads(body)
+    parse = timeit.timeit(lambda: json.loads(body), number=number) / number * 1e6
+    validate = timeit.timeit(lambda: chat_error(payload), number=number) / number * 1e6
+    return round(parse, 2), round(validate, 2)
+
+if __name__ == "__main__":
+    for messages, chars in ((2, 100), (8, 400), (32, 2000)):
+        parse_us, validate_us = bench(sample_body(messages, chars))
+        print(f"{messages:3d} messages x {chars:5d} chars: parse {parse_us:8.2f} us, validate {validate_us:6.2f} us")
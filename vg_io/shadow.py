@@ -0,0 +1,159 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# shadow.py
+# Shadow traffic mirroring. A sampled share of a nickname's requests is
+# also sent to a shadow provider in the background; the caller only ever
+# sees the primary answer. Shadow calls are bounded per shadow target and
+# across all targets (MAX_INFLIGHT, so they never hold more than a few of
+# the worker threads primary requests run on) and dropped (not queued) when
+# a bound is reached, so they cannot pile up behind or starve primary
+# traffic. Each finished pair is compared on latency, status, token usage
+# and answer similarity, the similarity in a worker thread off the event loop.
+#
+# vg_cfg.json
+# "groq-llama8": {
+#   ...
+#   "shadow": {"target": "aws-nova-micro", "sample": 0.05, "max_concurrency": 4}
+# }
+
+import asyncio, collections, difflib, random, time
+
+from .usage import normalize_usage
+
+# Similarity is computed on a bounded prefix to keep comparisons cheap
+COMPARE_CHARS = 2000
+
+# Shadow calls in flight across all targets
+MAX_INFLIGHT = 8
+
+def answer_text(content):
+    try:
+        return content["choices"][0]["message"].get("content") or ""
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return ""
+
+def similarity(a, b):
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a[:COMPARE_CHARS], b[:COMPARE_CHARS]).ratio()
+
+class Mirror:
+    """Sampled, bounded shadow requests and the comparisons they produce."""
+
+    def __init__(self, capacity=1000, max_inflight=MAX_INFLIGHT):
+        self.max_inflight = max_inflight
+        self.records = collections.deque(maxlen=capacity)
+        self.totals = {}
+        self.inflight = {}
+        self.dropped = 0
+        self.tasks = set()
+
+    def admit(self, shadow):
+        """Sample the request and reserve a shadow slot; False to skip mirroring."""
+        if random.random() >= getattr(shadow, "sample", 0.0):
+            return False
+        target = shadow.target
+        if (self.inflight.get(target, 0) >= getattr(shadow, "max_concurrency", 4)
+                or sum(self.inflight.values()) >= self.max_inflight):
+            self.dropped += 1
+            return False
+        self.inflight[target] = self.inflight.get(target, 0) + 1
+        return True
+
+    def mirror(self, nickname, target, call):
+        """
+        Start call() (a coroutine function returning (content, status)) in the
+        background. Returns a future the caller resolves with the primary's
+        (content, status, latency_ms) once it has answered.
+        """
+        primary = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self.run(nickname, target, call, primary))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return primary
+
+    async def run(self, nickname, target, call, primary):
+        started = time.monotonic()
+        content, status = None, 500
+        try:
+            content, status = await call()
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+        finally:
+            shadow_ms = (time.monotonic() - started) * 1000
+            self.inflight[target] -= 1
+        primary_content, primary_status, primary_ms = await primary
+        score = None
+        if primary_status == 200 and status == 200:
+            score = await asyncio.to_thread(similarity, answer_text(primary_content), answer_text(content))
+        self.record(nickname, target, primary_content, primary_status, primary_ms, content, status, shadow_ms, score)
+
+    def record(self, nickname, target, primary_content, primary_status, primary_ms, shadow_content, shadow_status, shadow_ms, score=None):
+        """Store one pair; score is the answers' similarity, computed here when not given."""
+        p_in, p_out = normalize_usage(primary_content.get("usage") if isinstance(primary_content, dict) else None)
+        s_in, s_out = normalize_usage(shadow_content.get("usage") if isinstance(shadow_content, dict) else None)
+        both_ok = primary_status == 200 and shadow_status == 200
+        if both_ok and score is None:
+            score = similarity(answer_text(primary_content), answer_text(shadow_content))
+        row = {
+            "ts": time.time(), "nickname": nickname, "shadow": target,
+            "primary_ms": round(primary_ms, 1), "shadow_ms": round(shadow_ms, 1),
+            "primary_status": primary_status, "shadow_status": shadow_status,
+            "primary_tokens": [p_in, p_out], "shadow_tokens": [s_in, s_out],
+            "similarity": round(score, 4) if both_ok else None,
+        }
+        self.records.append(row)
+        t = self.totals.setdefault((nickname, target), {
+            "pairs": 0, "primary_errors": 0, "shadow_errors": 0, "primary_ms": 0.0, "shadow_ms": 0.0,
+            "primary_completion_tokens": 0, "shadow_completion_tokens": 0, "similarity": 0.0, "compared": 0,
+        })
+        t["pairs"] += 1
+        t["primary_errors"] += primary_status != 200
+        t["shadow_errors"] += shadow_status != 200
+        t["primary_ms"] += primary_ms
+        t["shadow_ms"] += shadow_ms
+        t["primary_completion_tokens"] += p_out
+        t["shadow_completion_tokens"] += s_out
+        if row["similarity"] is not None:
+            t["similarity"] += row["similarity"]
+            t["compared"] += 1
+        return row
+
+    def summary(self):
+        out = {}
+        for (nickname, target), t in list(self.totals.items()):
+            pairs = t["pairs"]
+            out[f"{nickname}/{target}"] = {
+                "pairs": pairs,
+                "primary_errors": t["primary_errors"],
+                "shadow_errors": t["shadow_errors"],
+                "avg_primary_ms": round(t["primary_ms"] / pairs, 1),
+                "avg_shadow_ms": round(t["shadow_ms"] / pairs, 1),
+                "primary_completion_tokens": t["primary_completion_tokens"],
+                "shadow_completion_tokens": t["shadow_completion_tokens"],
+                "avg_similarity": round(t["similarity"] / t["compared"], 4) if t["compared"] else None,
+            }
+        return {"pairs": out, "inflight": sum(self.inflight.values()), "dropped": self.dropped}
@@ -0,0 +1,265 @@
+
+# coding=utf-8
+# Copyright (C) 2023-2026 Roy Pfund. All rights reserved.
+#
+# Permission is  hereby  granted,  free  of  charge,  to  any  person
+# obtaining a copy of  this  software  and  associated  documentation
+# files  (the  "Software"),  to  deal   in   the   Software   without
+# restriction, including without limitation the rights to use,  copy,
+# modify, merge, publish, distribute, sublicense, and/or sell  copies
+# of the Software, and to permit persons  to  whom  the  Software  is
+# furnished to do so.
+#
+# The above copyright notice and  this  permission  notice  shall  be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT  WARRANTY  OF  ANY  KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES  OF
+# MERCHANTABILITY,   FITNESS   FOR   A   PARTICULAR    PURPOSE    AND
+# NONINFRINGEMENT.  IN  NO  EVENT  SHALL  THE  AUTHORS  OR  COPYRIGHT
+# OWNER(S) BE LIABLE FOR  ANY  CLAIM,  DAMAGES  OR  OTHER  LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING  FROM,
+# OUT OF OR IN CONNECTION WITH THE  SOFTWARE  OR  THE  USE  OR  OTHER
+# DEALINGS IN THE SOFTWARE.
+###################################
+
+# usage.py
+# Per-request usage accounting for the gateway. record() only appends to an
+# in-memory ring buffer and bumps running totals; a background task drains
+# the buffer and writes it out in batches (JSONL with rotation, or SQLite),
+# so no file I/O happens on the request path. A batch that fails to write
+# goes back on the buffer and is retried on the next tick.
+
+import asyncio, collections, json, os, sqlite3, threading, time
+
+SINKS = ("jsonl", "sqlite")
+COLUMNS = ("ts", "caller", "nickname", "api", "model", "status", "latency_ms",
+           "prompt_tokens", "completion_tokens", "total_tokens", "cost",
+           "cache_read_tokens", "cache_write_tokens")
+
+def normalize_usage(usage):
+    """
+    Return (prompt_tokens, completion_tokens) from an OpenAI style usage block
+    or a Bedrock/Anthropic style one (input_tokens/output_tokens).
+    """
+    if not isinstance(usage, dict):
+        return 0, 0
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+    completion = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    return int(prompt), int(completion)
+
+def cache_usage(usage):
+    """
+    (cache_read_tokens, cache_write_tokens) from a Bedrock/Anthropic style usage
+    block, or an OpenAI one's prompt_tokens_details.cached_tokens.
+    """
+    if not isinstance(usage, dict):
+        return 0, 0
+    read = usage.get("cache_read_input_tokens")
+    if read is None and isinstance(usage.get("prompt_tokens_details"), dict):
+        read = usage["prompt_tokens_details"].get("cached_tokens")
+    return int(read or 0), int(usage.get("cache_creation_input_tokens") or 0)
+
+def price_of(price, prompt_tokens, completion_tokens, cache_read=0, cache_write=0):
+    """
+    price is the provider's {"input": $, "output": $} per million tokens, with
+    optional "cache_read"/"cache_write" (default 0.1x and 1.25x input).
+    """
+    if price is None:
+        return 0.0
+    if not isinstance(price, dict):
+        price = vars(price)
+    per_input = price.get("input", 0)
+    return (
+        prompt_tokens * per_input + completion_tokens * price.get("output", 0)
+        + cache_read * price.get("cache_read", per_input * 0.1)
+        + cache_write * price.get("cache_write", per_input * 1.25)
+    ) / 1e6
+
+class UsageLog:
+    """
+    Ring buffer of usage records plus running totals.
+    sink: None (totals only, nothing is buffered), "jsonl" or "sqlite".
+    """
+
+    def __init__(self, sink=None, path=None, capacity=10000, flush_interval=2.0,
+                 max_bytes=64 * 1024 * 1024, backups=5):
+        self.buffer = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.task = None
+        self.flushing = None
+        self.configure(sink, path, flush_interval=flush_interval, max_bytes=max_bytes, backups=backups)
+
+    def configure(self, sink=None, path=None, flush_interval=2.0, max_bytes=64 * 1024 * 1024, backups=5, capacity=None):
+        if sink is not None and sink not in SINKS:
+            raise ValueError(f"Unknown usage sink {sink}, expected one of {SINKS}")
+        self.sink = sink
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        if capacity and capacity != self.buffer.maxlen:
+            self.buffer = collections.deque(self.buffer, maxlen=capacity)
+        if sink is None:
+            self.buffer.clear()
+
+    def record(self, caller, nickname, api=None, model=None, usage=None, latency_ms=0.0, status=200, price=None):
+        """
+        Buffer one request. prompt_tokens counts every input token, cached or
+        not: OpenAI's prompt_tokens already does, Anthropic's input_tokens
+        leaves cache reads and writes out, so they are added back in.
+        """
+        prompt, completion = normalize_usage(usage)
+        cache_read, cache_write = cache_usage(usage)
+        if isinstance(usage, dict) and "prompt_tokens" in usage:
+            uncached = max(0, prompt - cache_read - cache_write)
+        else:
+            uncached, prompt = prompt, prompt + cache_read + cache_write
+        row = {
+            "ts": time.time(), "caller": caller, "nickname": nickname, "api": api, "model": model,
+            "status": status, "latency_ms": round(latency_ms, 3),
+            "prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion,
+            "cache_read_tokens": cache_read, "cache_write_tokens": cache_write,
+            "cost": price_of(price, uncached, completion, cache_read, cache_write),
+        }
+        with self.lock:
+            # Without a sink nothing drains the buffer, so rows are not kept at all
+            if self.sink is not None:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append(row)
+            total = self.totals.setdefault((caller, nickname), {
+                "requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "total_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0, "cost": 0.0, "latency_ms": 0.0,
+            })
+            total["requests"] += 1
+            total["errors"] += status >= 400
+            total["prompt_tokens"] += prompt
+            total["completion_tokens"] += completion
+            total["total_tokens"] += prompt + completion
+            total["cache_read_tokens"] += cache_read
+            total["cache_write_tokens"] += cache_write
+            total["cost"] += row["cost"]
+            total["latency_ms"] += row["latency_ms"]
+        return row
+
+    def drain(self):
+        with self.lock:
+            batch = list(self.buffer)
+            self.buffer.clear()
+        return batch
+
+    def requeue(self, batch):
+        """Put an unwritten batch back ahead of newer rows; the oldest past capacity are dropped."""
+        with self.lock:
+            rows = batch + list(self.buffer)
+            overflow = len(rows) - self.buffer.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                rows = rows[overflow:]
+            self.buffer.clear()
+            self.buffer.extend(rows)
+
+    def summary(self, group_by="caller", caller=None):
+        """
+        Aggregate totals by "caller", "nickname" or "caller,nickname".
+        caller restricts the result to one caller's rows.
+        """
+        keys = [k.strip() for k in group_by.split(",")]
+        for k in keys:
+            if k not in ("caller", "nickname"):
+                raise ValueError(f"Cannot group usage by {k}")
+        out = {}
+        with self.lock:
+            items = [(c, n, dict(t)) for (c, n), t in self.totals.items()]
+        for c, n, t in items:
+            if caller is not None and c != caller:
+                continue
+            fields = {"caller": c, "nickname": n}
+            key = "/".join(fields[k] for k in keys)
+            agg = out.setdefault(key, dict.fromkeys(t, 0))
+            for name, value in t.items():
+                agg[name] += value
+        for agg in out.values():
+            agg["avg_latency_ms"] = round(agg.pop("latency_ms") / agg["requests"], 3) if agg["requests"] else 0.0
+            agg["cost"] = round(agg["cost"], 6)
+        return out
+
+    def write(self, batch):
+        """Persist a batch with the configured sink (blocking, run off the loop)."""
+        if not batch or self.sink is None:
+            return
+        if self.sink == "jsonl":
+            self.rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row) + "\n" for row in batch))
+        elif self.sink == "sqlite":
+            con = sqlite3.connect(self.path)
+            try:
+                con.execute(f"CREATE TABLE IF NOT EXISTS usage ({', '.join(COLUMNS)})")
+                # Tables created before a column was added get it (NULL for old rows)
+                existing = {info[1] for info in con.execute("PRAGMA table_info(usage)")}
+                for column in COLUMNS:
+                    if column not in existing:
+                        con.execute(f"ALTER TABLE usage ADD COLUMN {column}")
+                con.executemany(
+                    f"INSERT INTO usage ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [tuple(row[c] for c in COLUMNS) for row in batch],
+                )
+                con.commit()
+            finally:
+                con.close()
+
+    def rotate(self):
+        """usage.jsonl -> usage.jsonl.1 -> ... -> usage.jsonl.<backups> once max_bytes is reached."""
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self):
+        """Write out the buffer; returns the number of rows written."""
+        batch = self.drain()
+        try:
+            self.write(batch)
+        except Exception as e:
+            print(f"Error writing usage batch of {len(batch)}, keeping it for the next flush: {e}")
+            self.requeue(batch)
+            return 0
+        return len(batch)
+
+    async def run(self):
+        """Background flusher; stop() cancels it and flushes once more."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Shielded so cancelling the loop never abandons a write half-way
+            self.flushing = asyncio.ensure_future(asyncio.to_thread(self.flush))
+            await asyncio.shield(self.flushing)
+
+    def start(self):
+        if self.task is None and self.sink is not None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.flushing is not None:
+            await self.flushing
+            self.flushing = None
+        await asyncio.to_thread(self.flush)